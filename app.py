@@ -1,7 +1,80 @@
-from views import app
+import click
+from flask import Flask
+
 from models import db
 
+
+def create_app(config=None):
+    """
+    Cria e configura a aplicação Flask.
+
+    Nada é conectado nem criado no banco aqui: o Flask-SQLAlchemy só abre
+    conexões na primeira consulta e o schema é gerenciado pelas migrações.
+    Extensões e blueprints são importados dentro da função para que importar
+    este módulo seja barato.
+
+    Args:
+        config (dict, opcional): Valores aplicados ao `app.config` antes da
+            inicialização (por exemplo `APP_ENV` ou `SQLALCHEMY_DATABASE_URI`).
+
+    Returns:
+        Flask: Aplicação configurada.
+    """
+    from flask_cors import CORS
+    from character_cache import init_character_cache
+    from config import init_database
+    from db_routing import init_db_routing, replica_router
+    from sharding import init_sharding
+    from json_provider import init_json
+    from views import bp
+    from xp_buffer import init_xp_buffer
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if config:
+        app.config.from_mapping(config)
+    init_json(app)
+    init_character_cache(app)
+
+    CORS(app, resources={r"/*": {"origins": "*"}})
+    init_database(app, db)
+    init_db_routing(app, db)
+    init_sharding(app, db)
+
+    if app.config.get('INSTRUMENTATION_ENABLED', True):
+        from instrumentation import init_instrumentation, metrics
+        init_instrumentation(app, db)
+        metrics.add_collector(replica_router.collect)
+
+    # Depois do banco: a recuperação dos spills já escreve nele
+    init_xp_buffer(app)
+
+    # O Flask-Migrate (e o Alembic) só são necessários nos comandos `flask db ...`;
+    # fora da CLI, como em workers do servidor, a importação é evitada
+    if app.config.get('ENABLE_MIGRATE', click.get_current_context(silent=True) is not None):
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    from bulk_io import bulk_cli
+    from completion_log import completions_cli
+    from rollover import rollover_cli
+    from sharding import shards_cli
+    from xp_buffer import xp_buffer_cli
+    app.cli.add_command(bulk_cli)
+    app.cli.add_command(completions_cli)
+    app.cli.add_command(rollover_cli)
+    app.cli.add_command(shards_cli)
+    app.cli.add_command(xp_buffer_cli)
+
+    app.register_blueprint(bp)
+    return app
+
+
 if __name__ == '__main__':
+    app = create_app()
+    from sharding import engine_for, shards
     with app.app_context():
-        db.create_all()
-    app.run(port=5000, debug=True)
+        # O primário e cada shard; as réplicas recebem o schema pela replicação
+        for shard in shards.shards:
+            db.metadata.create_all(engine_for(shard))
+    app.run(host='0.0.0.0', port=5000, debug=True)
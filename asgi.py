@@ -0,0 +1,7 @@
+from async_api import create_asgi_app
+
+# Ponto de entrada para servidores ASGI, por exemplo:
+#   uvicorn asgi:app --workers 4
+#   hypercorn asgi:app --workers 4
+#   gunicorn -c gunicorn.conf.py  (com SERVER_MODE=asgi)
+app = create_asgi_app()
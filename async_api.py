@@ -0,0 +1,391 @@
+import re
+from urllib.parse import parse_qsl, unquote
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.http import parse_etags, quote_etag
+
+from app import create_app
+from character_cache import character_cache, character_etag, payload_variant, version_statement
+from character_snapshot import serialize_character, snapshot_statement
+from config import async_database_uri, async_engine_options, install_engine_hooks
+from daily_update import character_rollover_statement, claim_rollover_statement, rollover_gap
+from instrumentation import (
+    DEFAULT_N_PLUS_ONE_THRESHOLD, DEFAULT_SLOW_QUERY_MS, RequestStats, finish_request_stats, instrument_engine,
+    metrics, request_stats
+)
+from leaderboard import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RANKINGS, count_above_statement, leaderboard_entries, leaderboard_statement,
+    rank_index, rank_result, rank_statement
+)
+from mission_listing import (
+    ATTRIBUTE_FILTERS, DEFAULT_PAGE_SIZE as LISTING_PAGE_SIZE, FETCH_SIZE, MAX_PAGE_SIZE as LISTING_MAX_PAGE_SIZE,
+    missions_query, serialize_mission_row, split_page
+)
+from models import utc_today, Character
+from xp_buffer import xp_buffer
+
+CORS_HEADER = (b"access-control-allow-origin", b"*")
+# Threads por processo para as rotas atendidas pelo Flask
+DEFAULT_THREADS = 10
+
+
+def _etag_header(etag):
+    return (b"etag", quote_etag(etag).encode("latin-1"))
+
+
+class AsyncRequest:
+    """Método, caminho e query string de uma requisição ASGI."""
+
+    __slots__ = ("method", "path", "args", "headers")
+
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = dict(scope.get("headers", ()))
+        self.args = {}
+        # Como no Flask, vale o primeiro valor de cada parâmetro
+        for key, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True):
+            self.args.setdefault(key, value)
+
+    def arg_int(self, name, default=None):
+        """Equivalente a `request.args.get(name, default, type=int)`."""
+        try:
+            return int(self.args[name])
+        except (KeyError, ValueError):
+            return default
+
+
+class AsyncResponse:
+    """
+    Resposta com corpo em bytes ou gerado por um iterador assíncrono de str.
+
+    Sem `content_type` (como em um 304), o cabeçalho não é enviado;
+    `headers` são pares (nome, valor) em bytes acrescentados à resposta.
+    """
+
+    __slots__ = ("status", "body", "content_type", "headers")
+
+    def __init__(self, body, status=200, content_type="application/json", headers=()):
+        self.body = body
+        self.status = status
+        self.content_type = content_type
+        self.headers = headers
+
+
+class AsyncAPI:
+    """
+    Aplicação ASGI que serve as rotas de leitura mais consultadas direto no
+    driver assíncrono e repassa as demais ao app Flask.
+
+    As rotas nativas (personagem, listagem de missões e ranking) usam as
+    mesmas consultas de `character_snapshot`, `mission_listing` e
+    `leaderboard`, executadas em um `AsyncEngine` com os modelos de
+    `models.py`, e respondem no mesmo formato que as rotas do Flask. Enquanto
+    uma consulta espera o banco, o event loop atende outras requisições.
+
+    As demais rotas (escritas, importação, virada diária, `/metrics`...) rodam
+    no Flask por meio do `WSGIMiddleware` do a2wsgi, em um pool de
+    `ASGI_THREADS` threads por processo.
+
+    Configurações lidas de `app.config`:
+        ASGI_NATIVE_ROUTES: se False, todas as rotas vão para o Flask (padrão True).
+        ASGI_THREADS: threads do pool das rotas do Flask (padrão 10).
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.native = flask_app.config.get("ASGI_NATIVE_ROUTES", True)
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get("ASGI_THREADS", DEFAULT_THREADS))
+
+        settings = flask_app.config["DATABASE_SETTINGS"]
+        # As rotas nativas usam um único engine assíncrono, sem o roteamento por shard
+        if settings.get("shard_uris"):
+            raise RuntimeError("The ASGI app does not support SHARD_URIS")
+        self.engine = create_async_engine(
+            async_database_uri(settings["database_uri"]), **async_engine_options(settings)
+        )
+        install_engine_hooks(self.engine.sync_engine, settings)
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        self.instrumented = flask_app.config.get("INSTRUMENTATION_ENABLED", True)
+        self.n_plus_one_threshold = flask_app.config.get("N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD)
+        if self.instrumented:
+            instrument_engine(
+                self.engine.sync_engine, metrics, flask_app.logger,
+                flask_app.config.get("SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS) / 1000.0
+            )
+
+        # (método, padrão do caminho, handler, nome do endpoint nas métricas)
+        self.routes = [
+            ("GET", re.compile(r"/character/([^/]+)"), self.get_character, "api.get_character"),
+            ("GET", re.compile(r"/character/([^/]+)/missions"), self.list_character_missions,
+             "api.list_character_missions"),
+            ("GET", re.compile(r"/leaderboard"), self.get_leaderboard, "api.get_leaderboard"),
+            ("GET", re.compile(r"/leaderboard/rank/([^/]+)"), self.get_leaderboard_rank, "api.get_leaderboard_rank"),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
+        if scope["type"] == "http" and self.native:
+            for method, pattern, handler, endpoint in self.routes:
+                if scope["method"] != method:
+                    continue
+                match = pattern.fullmatch(scope["path"])
+                if match:
+                    params = [unquote(group) for group in match.groups()]
+                    await self._dispatch(scope, send, handler, endpoint, params)
+                    return
+
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _dispatch(self, scope, send, handler, endpoint, params):
+        request = AsyncRequest(scope)
+        stats = RequestStats() if self.instrumented else None
+        token = request_stats.set(stats)
+        try:
+            # A sessão fica aberta até o fim do corpo, para as respostas em streaming
+            async with self.sessionmaker() as session:
+                try:
+                    response = await handler(session, request, *params)
+                except Exception:
+                    self.flask_app.logger.exception("Error in %s %s", request.method, request.path)
+                    response = self.json({"error": "Internal server error"}, 500)
+
+                if stats is not None:
+                    stats.status = response.status
+                await self._send(send, response)
+        finally:
+            request_stats.reset(token)
+            if stats is not None:
+                finish_request_stats(
+                    stats, endpoint, request.method, metrics, self.n_plus_one_threshold, self.flask_app.logger
+                )
+
+    async def _send(self, send, response):
+        headers = [CORS_HEADER, *response.headers]
+        if response.content_type is not None:
+            headers.insert(0, (b"content-type", response.content_type.encode("latin-1")))
+        if response.status == 304:
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if isinstance(response.body, bytes):
+            headers.append((b"content-length", str(len(response.body)).encode("latin-1")))
+            await send({"type": "http.response.start", "status": response.status, "headers": headers})
+            await send({"type": "http.response.body", "body": response.body})
+            return
+
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        async for chunk in response.body:
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    def json(self, obj, status=200):
+        # Mesmo provider (e formato) do `jsonify` do Flask
+        return AsyncResponse(self.flask_app.json.response(obj).get_data(), status)
+
+    async def _catch_up(self, session, character_id, last_rollover_date):
+        """
+        Versão assíncrona de `daily_update.catch_up_character`.
+
+        Returns:
+            bool: True se havia virada pendente (aplicada aqui ou por outra requisição).
+        """
+        today = utc_today()
+        days = rollover_gap(last_rollover_date, today)
+        if not days:
+            return False
+        version = (await session.execute(claim_rollover_statement(character_id, last_rollover_date, today))).scalar()
+        if version is None:
+            await session.rollback()
+        else:
+            await session.execute(character_rollover_statement(character_id, days))
+            await session.commit()
+        return True
+
+    async def get_character(self, session, request, name):
+        compact = request.args.get('fields') == 'compact'
+        omit_missions = request.args.get('missions') == 'none'
+        missions_limit = request.arg_int('missions_limit')
+        if missions_limit is not None:
+            missions_limit = min(max(missions_limit, 1), LISTING_MAX_PAGE_SIZE)
+        variant = payload_variant(compact, omit_missions, missions_limit)
+
+        # Mesma sequência da rota do Flask: versão, 304, cache e só então o snapshot
+        current = (await session.execute(version_statement(name))).one_or_none()
+        if current is None:
+            return self.json({"error": "Character not found"}, 404)
+        if await self._catch_up(session, current.id, current.last_rollover_date):
+            current = (await session.execute(version_statement(name))).one()
+
+        # Com XP pendente no buffer deste processo, sem 304 nem cache (ver a rota do Flask)
+        pending = xp_buffer.view(current.id)
+
+        etag = character_etag(current.id, current.version, variant)
+        if_none_match = request.headers.get(b"if-none-match")
+        if (not pending and if_none_match is not None
+                and parse_etags(if_none_match.decode("latin-1")).contains(etag)):
+            return AsyncResponse(b"", 304, content_type=None, headers=[_etag_header(etag)])
+
+        body = None if pending else character_cache.get(name, current.version, variant)
+        if body is not None:
+            return AsyncResponse(body, headers=[_etag_header(etag)])
+
+        result = await session.execute(snapshot_statement(
+            name, compact=compact, include_missions=not omit_missions and missions_limit is None
+        ))
+        character = result.unique().scalar_one_or_none()
+        if not character:
+            return self.json({"error": "Character not found"}, 404)
+
+        if not character.attributes:
+            return self.json({"error": "Character attributes not found"}, 404)
+
+        attribute_xp = None
+        if pending:
+            attribute_xp, _ = pending.merge((await session.execute(pending.statement())).one())
+
+        if omit_missions:
+            data = serialize_character(character, compact=compact, missions=(), attribute_xp=attribute_xp)
+            del data["missions"]
+        elif missions_limit is not None:
+            rows = (await session.execute(missions_query(character.id, missions_limit))).all()
+            missions, next_cursor = split_page(rows, missions_limit)
+            data = serialize_character(character, compact=compact, missions=missions, attribute_xp=attribute_xp)
+            data["missions_next_cursor"] = next_cursor
+        else:
+            data = serialize_character(character, compact=compact, attribute_xp=attribute_xp)
+
+        response = self.json(data)
+        if not pending:
+            character_cache.set(name, character.version, variant, response.body)
+        response.headers = [_etag_header(character_etag(character.id, character.version, variant))]
+        return response
+
+    async def list_character_missions(self, session, request, name):
+        row = (await session.execute(
+            select(Character.id, Character.last_rollover_date).where(Character.name == name)
+        )).one_or_none()
+        if row is None:
+            return self.json({"error": "Character not found"}, 404)
+        character_id = row.id
+        await self._catch_up(session, character_id, row.last_rollover_date)
+
+        limit = min(max(request.arg_int('limit', LISTING_PAGE_SIZE), 1), LISTING_MAX_PAGE_SIZE)
+        after_id = request.arg_int('cursor')
+
+        completed = request.args.get('completed')
+        if completed is not None:
+            completed = completed.lower() in ('1', 'true', 'yes')
+
+        attribute = request.args.get('attribute')
+        if attribute is not None:
+            if attribute not in ATTRIBUTE_FILTERS:
+                return self.json({"error": "Invalid attribute"}, 400)
+            attribute = ATTRIBUTE_FILTERS[attribute]
+
+        stmt = missions_query(
+            character_id, limit, after_id=after_id, completed=completed,
+            difficulty=request.args.get('difficulty'), attribute=attribute
+        )
+
+        if request.args.get('format') == 'ndjson':
+            return AsyncResponse(self._stream_ndjson(session, stmt, limit), content_type='application/x-ndjson')
+        return AsyncResponse(self._stream_json(session, stmt, limit))
+
+    async def _page_rows(self, session, stmt, limit):
+        # Mesmo protocolo de `mission_listing._page_rows`, sobre `session.stream`
+        result = await session.stream(stmt.execution_options(yield_per=FETCH_SIZE))
+        emitted, last_id = 0, None
+        async for row in result:
+            if emitted == limit:
+                await result.close()
+                yield None, str(last_id)
+                return
+            emitted += 1
+            last_id = row.id
+            yield row, None
+        yield None, None
+
+    async def _stream_json(self, session, stmt, limit):
+        dumps = self.flask_app.json.dumps
+        yield '{"missions":['
+        first = True
+        async for row, next_cursor in self._page_rows(session, stmt, limit):
+            if row is None:
+                yield '],"next_cursor":' + dumps(next_cursor) + '}'
+                return
+            yield ('' if first else ',') + dumps(serialize_mission_row(row), separators=(",", ":"))
+            first = False
+
+    async def _stream_ndjson(self, session, stmt, limit):
+        dumps = self.flask_app.json.dumps
+        async for row, next_cursor in self._page_rows(session, stmt, limit):
+            if row is None:
+                yield dumps({"next_cursor": next_cursor}, separators=(",", ":")) + "\n"
+                return
+            yield dumps(serialize_mission_row(row), separators=(",", ":")) + "\n"
+
+    async def get_leaderboard(self, session, request):
+        by = request.args.get('by', 'total')
+        if by not in RANKINGS:
+            return self.json({"error": f"Invalid ranking, expected one of {sorted(RANKINGS)}"}, 400)
+
+        limit = min(max(request.arg_int('limit', DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+
+        try:
+            stmt, state = leaderboard_statement(by, limit=limit, cursor=request.args.get('cursor'))
+        except ValueError:
+            return self.json({"error": "Invalid cursor"}, 400)
+
+        entries, next_cursor = leaderboard_entries((await session.execute(stmt)).all(), limit, state)
+        return self.json({
+            "by": by,
+            "entries": entries,
+            "next_cursor": next_cursor
+        })
+
+    async def get_leaderboard_rank(self, session, request, name):
+        by = request.args.get('by', 'total')
+        if by not in RANKINGS:
+            return self.json({"error": f"Invalid ranking, expected one of {sorted(RANKINGS)}"}, 400)
+
+        row = (await session.execute(rank_statement(name, by))).one_or_none()
+        if row is None:
+            return self.json({"error": "Character not found"}, 404)
+
+        xp, level = row
+        # O índice em memória é o mesmo das rotas do Flask; o carregamento roda em outra thread
+        rank = rank_index.rank(by, xp or 0, app=self.flask_app)
+        if rank is not None:
+            return self.json(rank_result(name, by, xp, level, rank, "index"))
+        rank = (await session.execute(count_above_statement(by, xp))).scalar() + 1
+        return self.json(rank_result(name, by, xp, level, rank, "count"))
+
+
+def create_asgi_app(config=None):
+    """
+    Cria a aplicação ASGI sobre o app Flask de `create_app`.
+
+    Args:
+        config (dict, opcional): Repassado a `create_app`.
+
+    Returns:
+        AsyncAPI: Aplicação ASGI.
+    """
+    return AsyncAPI(create_app(config))
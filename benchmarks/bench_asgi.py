@@ -0,0 +1,218 @@
+"""
+Compara a concorrência do modo ASGI (rotas de leitura no driver assíncrono,
+ver `async_api`) com o modo WSGI (todas as rotas no Flask, em um pool de
+threads) com o mesmo número de processos do servidor.
+
+Os dois modos rodam no uvicorn com `--workers` processos; no modo 'wsgi' as
+rotas nativas ficam desligadas (`ASGI_NATIVE_ROUTES=False`) e o Flask atende
+tudo em `--threads` threads por processo, como um worker gthread do gunicorn.
+Para cada nível de `--concurrency` são feitas `--requests` requisições
+alternando personagem, listagem de missões e ranking.
+
+O banco padrão é um SQLite temporário; como ele responde em microssegundos,
+`--db-latency-ms` acrescenta uma espera por instrução (time.sleep no engine
+síncrono, asyncio.sleep no assíncrono) para simular a ida e volta até um
+Postgres remoto. Com --database-url apontando para um Postgres real, use
+--db-latency-ms 0. Cuidado: as tabelas do banco indicado são apagadas.
+
+Uso:
+    python benchmarks/bench_asgi.py --concurrency 1 16 64 256 --output asgi.json
+    python benchmarks/bench_asgi.py --workers 2 --threads 8 --db-latency-ms 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import run_metadata, seed_missions, timed, write_results
+
+from bench_endpoints import HttpCaller, Scenario, run_scenario
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def add_simulated_latency(engine, seconds, asynchronous):
+    """
+    Espera `seconds` antes de cada instrução SQL do engine.
+
+    No engine assíncrono o evento roda no greenlet do SQLAlchemy, então a
+    espera é um `asyncio.sleep` que libera o event loop, como faria o driver
+    esperando a rede.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+
+    if asynchronous:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _wait(*args):
+            await_only(asyncio.sleep(seconds))
+    else:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _wait(*args):
+            time.sleep(seconds)
+
+
+def server_app():
+    """Fábrica usada pelo uvicorn no processo do servidor (configurada por variáveis de ambiente)."""
+    from async_api import AsyncAPI
+    from app import create_app
+    from models import db
+
+    mode = os.environ["BENCH_SERVER_MODE"]
+    flask_app = create_app({
+        "SQLALCHEMY_DATABASE_URI": os.environ["BENCH_SERVER_DATABASE_URL"],
+        "ASGI_NATIVE_ROUTES": mode == "asgi",
+        "ASGI_THREADS": int(os.environ["BENCH_SERVER_THREADS"]),
+        "ROLLOVER_WORKER": "external",
+    })
+    api = AsyncAPI(flask_app)
+
+    latency = float(os.environ.get("BENCH_DB_LATENCY_MS", "0")) / 1000.0
+    if latency:
+        with flask_app.app_context():
+            add_simulated_latency(db.engine, latency, asynchronous=False)
+        add_simulated_latency(api.engine.sync_engine, latency, asynchronous=True)
+    return api
+
+
+def serve(args):
+    import uvicorn
+    uvicorn.run(
+        "bench_asgi:server_app", factory=True, app_dir=HERE, host="127.0.0.1", port=args.port,
+        workers=args.workers, log_level="warning", backlog=4096
+    )
+
+
+def start_server(args, mode):
+    """Sobe o servidor em outro processo e espera ele responder."""
+    env = dict(
+        os.environ,
+        BENCH_SERVER_MODE=mode,
+        BENCH_SERVER_DATABASE_URL=args.database_url,
+        BENCH_SERVER_THREADS=str(args.threads),
+        BENCH_DB_LATENCY_MS=str(args.db_latency_ms),
+        # O mesmo pool nos dois modos; sem overflow, para o limite ser o mesmo
+        DB_POOL_SIZE=str(args.pool_size),
+        DB_MAX_OVERFLOW="0",
+        DB_POOL_TIMEOUT="60",
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+         "--workers", str(args.workers)],
+        env=env
+    )
+    call = HttpCaller(f"http://127.0.0.1:{args.port}")
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{mode} server exited with code {process.returncode}")
+        try:
+            if call("GET", "/", None)[0] == 200:
+                return process, call
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"{mode} server did not start")
+
+
+def read_scenario(characters):
+    paths = (
+        lambda i: f"/character/bench_{i % characters + 1}?missions_limit=20",
+        lambda i: f"/character/bench_{i % characters + 1}/missions?limit=50",
+        lambda i: "/leaderboard?by=total&limit=50",
+        lambda i: f"/leaderboard/rank/bench_{i % characters + 1}?by=total",
+    )
+    return Scenario("reads", None, "GET", lambda ctx, i: (paths[i % len(paths)](i // len(paths)), None))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"),
+                        help="padrão: BENCH_DATABASE_URL ou um arquivo SQLite temporário")
+    parser.add_argument("--characters", type=int, default=1000)
+    parser.add_argument("--missions-per-character", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="requisições por nível de concorrência")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--modes", nargs="+", choices=("asgi", "wsgi"), default=["asgi", "wsgi"])
+    parser.add_argument("--workers", type=int, default=1, help="processos do servidor (iguais nos dois modos)")
+    parser.add_argument("--threads", type=int, default=8, help="threads do Flask por processo")
+    parser.add_argument("--pool-size", type=int, default=64, help="conexões por processo")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="latência simulada por instrução")
+    parser.add_argument("--port", type=int, default=8077)
+    parser.add_argument("--output", default=None, help="arquivo JSON de resultados ('-' para stdout)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    if args.database_url is None:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_asgi_")
+        os.close(fd)
+        args.database_url = f"sqlite:///{path}?timeout=60"
+
+    from app import create_app
+    from models import db
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        _, elapsed = timed(
+            seed_missions, args.characters * args.missions_per_character,
+            missions_per_character=args.missions_per_character
+        )
+        print(f"seeded {args.characters} characters and "
+              f"{args.characters * args.missions_per_character} missions in {elapsed:.1f}s")
+        dialect = db.engine.dialect.name
+        db.engine.dispose()
+
+    scenario = read_scenario(args.characters)
+    results = {
+        "meta": run_metadata(
+            database=dialect, characters=args.characters, missions_per_character=args.missions_per_character,
+            requests=args.requests, workers=args.workers, threads=args.threads, pool_size=args.pool_size,
+            db_latency_ms=args.db_latency_ms
+        ),
+        "concurrency": {},
+    }
+
+    print(f"{'mode':<6} {'conc':>5} {'req':>6} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}  status")
+    for mode in args.modes:
+        process, call = start_server(args, mode)
+        try:
+            # Aquece conexões do pool e o índice do ranking fora da medição
+            run_scenario(call, scenario, 20, 4)
+            for concurrency in args.concurrency:
+                summary = run_scenario(call, scenario, max(args.requests, concurrency), concurrency)
+                results["concurrency"].setdefault(mode, {})[str(concurrency)] = summary
+                print(f"{mode:<6} {concurrency:>5} {summary['requests']:>6} "
+                      f"{summary.get('throughput_rps') or 0:>9.1f} {summary.get('p50_ms') or 0:>9.2f} "
+                      f"{summary.get('p95_ms') or 0:>9.2f} {summary.get('p99_ms') or 0:>9.2f}  "
+                      f"{summary['status']}{' errors=' + str(summary['errors']) if 'errors' in summary else ''}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    by_mode = results["concurrency"]
+    if "asgi" in by_mode and "wsgi" in by_mode:
+        print("throughput asgi/wsgi: " + ", ".join(
+            f"{c}: {by_mode['asgi'][c]['throughput_rps'] / by_mode['wsgi'][c]['throughput_rps']:.2f}x"
+            for c in by_mode["asgi"]
+            if by_mode["wsgi"].get(c, {}).get("throughput_rps") and by_mode["asgi"][c].get("throughput_rps")
+        ))
+
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Mede latência e número de consultas de `GET /character/<name>`: caminho
+original (consulta + lazy loads) contra o snapshot carregado em um round-trip.
+
+Uso:
+    python benchmarks/bench_character_snapshot.py --missions 500 --repeat 200 --rtt-ms 20
+
+`--rtt-ms` adiciona uma espera por consulta para simular a latência de rede
+até o Postgres remoto; com SQLite local o custo de round-trip é quase zero.
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import event
+
+from common import make_app, seed_missions, timed
+
+from models import db, Character
+from character_snapshot import load_character_snapshot, serialize_character
+
+
+def legacy_get_character(name):
+    """Reproduz a leitura original: filter_by + lazy load de attributes e missions."""
+    character = Character.query.filter_by(name=name).first()
+    return {
+        "name": character.name,
+        "attributes": {
+            "Força": {"xp": character.attributes.strength_xp},
+            "Disciplina": {"xp": character.attributes.discipline_xp},
+            "Saúde": {"xp": character.attributes.health_xp},
+            "Inteligência": {"xp": character.attributes.intelligence_xp},
+        },
+        "missions": [
+            {
+                "title": mission.title,
+                "description": mission.description,
+                "xp_reward": mission.xp_reward,
+                "difficulty": mission.difficulty,
+                "related_attributes": [
+                    attr for attr, flag in [
+                        ("Força", mission.strength),
+                        ("Disciplina", mission.discipline),
+                        ("Saúde", mission.health),
+                        ("Inteligência", mission.intelligence)
+                    ] if flag
+                ],
+                "completed": mission.completed
+            }
+            for mission in character.missions
+        ]
+    }
+
+
+def snapshot_get_character(name, compact=False):
+    character = load_character_snapshot(name, compact=compact)
+    return serialize_character(character, compact=compact)
+
+
+def measure(label, fn, repeat, rtt_ms=0.0):
+    statements = []
+    counter = {"n": 0}
+
+    def count(*_):
+        counter["n"] += 1
+        if rtt_ms:
+            time.sleep(rtt_ms / 1000)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    samples = []
+    try:
+        for _ in range(repeat):
+            counter["n"] = 0
+            db.session.expire_all()
+            _, elapsed = timed(fn)
+            samples.append(elapsed * 1000)
+            statements.append(counter["n"])
+            db.session.remove()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<20} median={statistics.median(samples):8.3f}ms "
+          f"p95={p95:8.3f}ms queries={max(statements)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        seed_missions(args.missions, missions_per_character=args.missions)
+        name = "bench_1"
+        measure("legacy", lambda: legacy_get_character(name), args.repeat, args.rtt_ms)
+        measure("snapshot", lambda: snapshot_get_character(name), args.repeat, args.rtt_ms)
+        measure("snapshot_compact", lambda: snapshot_get_character(name, compact=True),
+                args.repeat, args.rtt_ms)
+
+
+if __name__ == "__main__":
+    main()
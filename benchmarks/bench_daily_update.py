@@ -0,0 +1,102 @@
+"""
+Compara o loop ORM original do /daily-update com a varredura de UPDATEs em massa.
+
+A varredura só altera personagens com missões completadas ou com streak;
+`--dormant-fraction` deixa essa fração dos personagens sem nenhuma das duas
+(inativos), como acontece em produção.
+
+Uso:
+    python benchmarks/bench_daily_update.py --sizes 10000 100000 1000000 --chunk-size 1000
+    python benchmarks/bench_daily_update.py --sizes 1000000 --dormant-fraction 0.9 --skip-legacy-above 0
+"""
+import argparse
+import os
+from datetime import timedelta
+
+from common import make_app, seed_missions, timed
+
+from sqlalchemy import update
+
+from models import db, utc_today, CharacterMission
+from services import get_xp_by_difficulty
+from daily_update import run_daily_update
+
+
+def legacy_check_missions():
+    """Reproduz o corpo original de `check_missions` (uma linha por vez no ORM)."""
+    missions = CharacterMission.query.all()
+    results = []
+
+    for mission in missions:
+        if mission.completed:
+            mission.streak += 1
+        else:
+            mission.streak = 0
+
+        mission.xp_reward = get_xp_by_difficulty(mission.difficulty)
+        mission.completed = False
+
+        results.append({
+            'mission_id': mission.id,
+            'mission_title': mission.title,
+            'xp_reward': mission.xp_reward,
+            'current_streak': mission.streak
+        })
+
+    db.session.commit()
+    return results
+
+
+def make_dormant(fraction):
+    """Zera completadas e streaks de uma fração dos personagens (os inativos)."""
+    if fraction <= 0:
+        return
+    db.session.execute(
+        update(CharacterMission)
+        .where(CharacterMission.character_id % 100 < int(fraction * 100))
+        .values(completed=False, streak=0)
+    )
+    db.session.commit()
+
+
+def run(size, chunk_size, skip_legacy, dormant_fraction):
+    rows = []
+    # Os personagens semeados já viraram hoje; a varredura medida é a de amanhã
+    tomorrow = utc_today() + timedelta(days=1)
+    variants = [("bulk", lambda: run_daily_update(run_date=tomorrow)),
+                (f"bulk_chunked({chunk_size})", lambda: run_daily_update(chunk_size=chunk_size, run_date=tomorrow))]
+    if not skip_legacy:
+        variants.insert(0, ("legacy_loop", legacy_check_missions))
+
+    for label, fn in variants:
+        app = make_app()
+        with app.app_context():
+            seed_missions(size)
+            make_dormant(dormant_fraction)
+            _, elapsed = timed(fn)
+            rows.append((size, label, elapsed))
+            db.session.remove()
+            path = db.engine.url.database
+        os.remove(path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--chunk-size", type=int, default=1000, help="personagens por faixa")
+    parser.add_argument("--dormant-fraction", type=float, default=0.0,
+                        help="fração dos personagens sem missões completadas nem streak")
+    parser.add_argument("--skip-legacy-above", type=int, default=None,
+                        help="não roda o loop original acima deste número de missões")
+    args = parser.parse_args()
+
+    print(f"{'missions':>10}  {'variant':<24} {'seconds':>10}")
+    for size in args.sizes:
+        skip_legacy = args.skip_legacy_above is not None and size > args.skip_legacy_above
+        for size_, label, elapsed in run(size, args.chunk_size, skip_legacy, args.dormant_fraction):
+            print(f"{size_:>10}  {label:<24} {elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Benchmark de todas as rotas da API: cada cenário é executado pelo test
+client do Flask (sequencial, sem rede) e por um gerador de carga HTTP com
+várias threads contra um servidor local, medindo p50/p95/p99 e vazão.
+
+O banco (SQLite temporário por padrão, ou o Postgres de --database-url /
+BENCH_DATABASE_URL) é recriado e populado com personagens, missões e
+templates sintéticos. Cuidado: as tabelas do banco indicado são apagadas.
+
+Uso:
+    python benchmarks/bench_endpoints.py --characters 2000 --requests 200 --output results.json
+    python benchmarks/bench_endpoints.py --mode http --threads 16 --compare baseline.json
+    python benchmarks/bench_endpoints.py --target http://localhost:8000 --database-url postgresql://...
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from common import (
+    compare_results, run_metadata, seed_missions, seed_templates, summarize_latencies, timed, write_results
+)
+
+# `weight` multiplica --requests (rotas pesadas rodam menos vezes); `setup` é
+# chamado uma vez antes de cada modo, fora da medição, e devolve o contexto
+Scenario = namedtuple("Scenario", "name endpoint method path weight setup")
+Scenario.__new__.__defaults__ = (1.0, None)
+
+
+def build_scenarios(characters, missions_per_character, templates):
+    total_missions = characters * missions_per_character
+    counters = {}
+
+    def counter(name):
+        # Contadores persistem entre os modos, para que escritas não repitam nomes e títulos
+        return counters.setdefault(name, itertools.count())
+
+    def character(i):
+        return f"bench_{i % characters + 1}"
+
+    def reset_missions(client):
+        client("POST", "/reset_missions", None)
+
+    def enqueue_rollover(client):
+        _, body = client("POST", "/daily-update", None)
+        return {"job_id": json.loads(body)["job"]["id"]}
+
+    def next_mission(name):
+        # As missões semeadas se chamam "Missão {k}" e pertencem ao personagem k // missões_por_personagem + 1
+        k = next(counter(name)) % total_missions
+        return f"bench_{k // missions_per_character + 1}", f"Missão {k}"
+
+    def complete_one(ctx, i):
+        name, title = next_mission("complete")
+        return f"/character/{name}/complete_mission", {"mission_title": title}
+
+    def complete_batch(ctx, i):
+        base = next(counter("complete_batch")) * 5 % total_missions
+        name = f"bench_{base // missions_per_character + 1}"
+        titles = [
+            f"Missão {k}" for k in range(base, base + 5)
+            if k // missions_per_character + 1 == base // missions_per_character + 1
+        ]
+        return f"/character/{name}/complete_missions", {"mission_titles": titles}
+
+    def add_mission(ctx, i):
+        n = next(counter("add_mission"))
+        return f"/character/{character(n)}/mission", {
+            "title": f"Nova missão {n}", "difficulty": "Médio", "related_attributes": ["Força", "Saúde"]
+        }
+
+    def add_from_template(ctx, i):
+        n = next(counter("add_template"))
+        return f"/character/bench_{(n // templates) % characters + 1}/mission/template", {
+            "template_id": n % templates + 1
+        }
+
+    def create_character(ctx, i):
+        return "/character", {"name": f"new_{next(counter('create'))}"}
+
+    def bulk_import(ctx, i):
+        n = next(counter("import"))
+        lines = [
+            json.dumps({"name": f"import_{n}_{j}", "missions": [{"title": f"Importada {j}"}]})
+            for j in range(10)
+        ]
+        return "/bulk/import", ("\n".join(lines) + "\n").encode()
+
+    def fixed(path):
+        return lambda ctx, i: (path, None)
+
+    return [
+        Scenario("home", "api.home", "GET", fixed("/")),
+        Scenario("get_character", "api.get_character", "GET",
+                 lambda ctx, i: (f"/character/{character(i)}", None)),
+        Scenario("get_character_compact", "api.get_character", "GET",
+                 lambda ctx, i: (f"/character/{character(i)}?fields=compact&missions=none", None)),
+        Scenario("list_character_missions", "api.list_character_missions", "GET",
+                 lambda ctx, i: (f"/character/{character(i)}/missions?limit=100", None)),
+        Scenario("list_character_missions_ndjson", "api.list_character_missions", "GET",
+                 lambda ctx, i: (f"/character/{character(i)}/missions?limit=100&format=ndjson", None)),
+        Scenario("character_history", "api.get_character_history", "GET",
+                 lambda ctx, i: (f"/character/{character(i)}/history?period=day&days=30", None)),
+        Scenario("character_calendar", "api.get_character_calendar", "GET",
+                 lambda ctx, i: (f"/character/{character(i)}/calendar?days=90", None)),
+        Scenario("mission_templates", "api.list_mission_templates", "GET", fixed("/missions/templates")),
+        Scenario("leaderboard", "api.get_leaderboard", "GET", fixed("/leaderboard?by=total&limit=50")),
+        Scenario("leaderboard_rank", "api.get_leaderboard_rank", "GET",
+                 lambda ctx, i: (f"/leaderboard/rank/{character(i)}?by=total", None)),
+        Scenario("create_character", "api.create_character", "POST", create_character),
+        Scenario("add_mission", "api.add_mission", "POST", add_mission),
+        Scenario("add_mission_from_template", "api.add_mission_from_template", "POST", add_from_template),
+        Scenario("complete_mission", "api.complete_mission", "POST", complete_one, setup=reset_missions),
+        Scenario("complete_missions", "api.complete_missions", "POST", complete_batch, setup=reset_missions),
+        Scenario("bulk_import", "api.bulk_import", "POST", bulk_import, weight=0.1),
+        Scenario("bulk_export", "api.bulk_export", "GET", fixed("/bulk/export"), weight=0.02),
+        Scenario("reset_missions", "api.reset_all_missions", "POST", fixed("/reset_missions"), weight=0.1),
+        Scenario("daily_update_enqueue", "api.check_missions", "POST", fixed("/daily-update")),
+        Scenario("daily_update_status", "api.daily_update_status", "GET",
+                 lambda ctx, i: (f"/daily-update/{ctx['job_id']}", None), setup=enqueue_rollover),
+        Scenario("metrics", "metrics", "GET", fixed("/metrics")),
+    ]
+
+
+def _content_type(body):
+    return "application/x-ndjson" if isinstance(body, bytes) else "application/json"
+
+
+def _encode(body):
+    if body is None or isinstance(body, bytes):
+        return body
+    return json.dumps(body).encode()
+
+
+def test_client_caller(app):
+    client = app.test_client()
+
+    def call(method, path, body):
+        response = client.open(path, method=method, data=_encode(body), content_type=_content_type(body))
+        return response.status_code, response.get_data()
+    return call
+
+
+class HttpCaller:
+    """Cliente HTTP/1.1 com uma conexão keep-alive por thread."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self._local = threading.local()
+
+    def __call__(self, method, path, body):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        payload = _encode(body)
+        headers = {"Content-Type": _content_type(body)} if payload is not None else {}
+        try:
+            connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+def start_local_server(app):
+    """Sobe o servidor de desenvolvimento do Werkzeug (com threads) em uma porta livre."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, name="bench-http", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run_scenario(call, scenario, requests, threads):
+    """
+    Executa `requests` chamadas do cenário com `threads` threads e resume as latências.
+    """
+    ctx = scenario.setup(call) if scenario.setup else None
+    plans = [scenario.path(ctx, i) for i in range(requests)]
+    latencies, statuses, errors = [], Counter(), Counter()
+    lock = threading.Lock()
+    sequence = itertools.count()
+
+    def worker():
+        local_latencies, local_statuses, local_errors = [], Counter(), Counter()
+        for i in iter(lambda: next(sequence), None):
+            if i >= requests:
+                break
+            path, body = plans[i]
+            start = time.perf_counter()
+            try:
+                status, _ = call(scenario.method, path, body)
+                local_statuses[status] += 1
+            except Exception as e:
+                local_errors[type(e).__name__] += 1
+                continue
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            errors.update(local_errors)
+
+    start = time.perf_counter()
+    if threads <= 1:
+        worker()
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for future in [pool.submit(worker) for _ in range(threads)]:
+                future.result()
+    summary = summarize_latencies(latencies, time.perf_counter() - start)
+    summary["status"] = {str(code): count for code, count in sorted(statuses.items())}
+    if errors:
+        summary["errors"] = dict(errors)
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"),
+                        help="padrão: BENCH_DATABASE_URL ou um arquivo SQLite temporário")
+    parser.add_argument("--characters", type=int, default=1000)
+    parser.add_argument("--missions-per-character", type=int, default=50)
+    parser.add_argument("--templates", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200, help="requisições por rota e modo")
+    parser.add_argument("--threads", type=int, default=8, help="threads do gerador de carga HTTP")
+    parser.add_argument("--mode", choices=("testclient", "http", "both"), default="both")
+    parser.add_argument("--target", default=None,
+                        help="URL de um servidor já em execução (usando o mesmo banco) para o modo HTTP")
+    parser.add_argument("--routes", nargs="*", default=None, help="executa só estes cenários")
+    parser.add_argument("--no-seed", action="store_true", help="usa os dados já existentes no banco")
+    parser.add_argument("--output", default=None, help="arquivo JSON de resultados ('-' para stdout)")
+    parser.add_argument("--compare", default=None, help="JSON de uma rodada anterior")
+    parser.add_argument("--metric", default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=0.25, help="piora tolerada na comparação")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.database_url is None:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_endpoints_")
+        os.close(fd)
+        args.database_url = f"sqlite:///{path}?timeout=60"
+
+    from app import create_app
+    from models import db
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": args.database_url,
+        # A virada enfileirada não deve rodar em paralelo com os outros cenários
+        "ROLLOVER_WORKER": "external",
+    })
+
+    with app.app_context():
+        if not args.no_seed:
+            db.drop_all()
+            db.create_all()
+            _, elapsed = timed(
+                seed_missions, args.characters * args.missions_per_character,
+                missions_per_character=args.missions_per_character
+            )
+            seed_templates(args.templates)
+            print(f"seeded {args.characters} characters, "
+                  f"{args.characters * args.missions_per_character} missions and "
+                  f"{args.templates} templates in {elapsed:.1f}s")
+        dialect = db.engine.dialect.name
+
+    scenarios = build_scenarios(args.characters, args.missions_per_character, args.templates)
+    routes = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint != "static"}
+    uncovered = sorted(routes - {s.endpoint for s in scenarios})
+    if args.routes:
+        scenarios = [s for s in scenarios if s.name in args.routes]
+
+    modes = ["testclient", "http"] if args.mode == "both" else [args.mode]
+    callers = {}
+    if "testclient" in modes:
+        callers["testclient"] = (test_client_caller(app), 1)
+    server = None
+    if "http" in modes:
+        base_url = args.target
+        if base_url is None:
+            server, base_url = start_local_server(app)
+        callers["http"] = (HttpCaller(base_url), args.threads)
+
+    results = {
+        "meta": run_metadata(
+            database=dialect, characters=args.characters, missions_per_character=args.missions_per_character,
+            templates=args.templates, requests=args.requests, threads=args.threads
+        ),
+        "routes": {},
+    }
+
+    print(f"{'scenario':<32} {'mode':<10} {'req':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  status")
+    for scenario in scenarios:
+        requests = max(3, int(args.requests * scenario.weight))
+        for mode, (call, threads) in callers.items():
+            summary = run_scenario(call, scenario, requests, threads)
+            results["routes"].setdefault(scenario.name, {})[mode] = summary
+            print(f"{scenario.name:<32} {mode:<10} {summary['requests']:>5} "
+                  f"{summary.get('throughput_rps') or 0:>8.1f} {summary.get('p50_ms') or 0:>8.2f} "
+                  f"{summary.get('p95_ms') or 0:>8.2f} {summary.get('p99_ms') or 0:>8.2f}  "
+                  f"{summary['status']}{' errors=' + str(summary['errors']) if 'errors' in summary else ''}")
+
+    if server is not None:
+        server.shutdown()
+
+    if uncovered:
+        print(f"warning: routes without a scenario: {', '.join(uncovered)}")
+
+    if args.output:
+        write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare_results(args.compare, results, args.metric, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Mede o tempo de importação e de `create_app()` com `python -X importtime`
+e falha se o total passar do orçamento.
+
+Uso:
+    python benchmarks/bench_import_time.py --budget-ms 1500
+    python benchmarks/bench_import_time.py --statement "import app" --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_STATEMENT = (
+    "from app import create_app; "
+    "create_app({'APP_ENV': 'test', 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})"
+)
+
+
+def import_times(statement):
+    """
+    Executa `statement` em um interpretador novo com `-X importtime`.
+
+    Returns:
+        list: (módulo, tempo próprio em µs, tempo acumulado em µs, profundidade)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"statement failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--statement", default=DEFAULT_STATEMENT)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3,
+                        help="usa a melhor de N execuções para reduzir ruído")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        rows = import_times(args.statement)
+        total_us = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+        if best is None or total_us < best[0]:
+            best = (total_us, rows)
+
+    total_us, rows = best
+    print(f"statement: {args.statement}")
+    print(f"top-level import time: {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"{'cumulative ms':>14}  module")
+    for name, _, cumulative, depth in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {'  ' * depth}{name}")
+
+    eager = sorted({name.split(".")[0] for name, *_ in rows} & {"alembic", "flask_migrate", "psycopg2"})
+    if eager:
+        print(f"note: imported eagerly: {', '.join(eager)}")
+
+    if total_us / 1000 > args.budget_ms:
+        print("FAILED: import time over budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compara a serialização das respostas em lista pelo caminho anterior
+(dicionários + encoder da stdlib do Flask) com os formatos de
+`json_provider` codificados pelo provider rápido (orjson/msgspec), e
+confere que os dois produzem o mesmo JSON (após decodificar).
+
+Uso:
+    python benchmarks/bench_json.py --missions 500 --templates 500 --output json.json
+"""
+import argparse
+import json
+import random
+import timeit
+
+from common import run_metadata, write_results
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import (
+    PROVIDERS, AttributePayload, MissionPayload, MissionRowPayload, TemplatePayload, available_backend
+)
+from services import related_attributes
+
+DIFFICULTIES = ("Fácil", "Médio", "Difícil")
+
+
+def random_flags(rng):
+    return tuple(rng.random() < 0.5 for _ in range(4))
+
+
+def build_payloads(missions, templates, rng):
+    """
+    Monta cada resposta nos dois formatos.
+
+    Returns:
+        dict: nome -> (payload em dicionários, payload com os formatos de `json_provider`)
+    """
+    attributes = {
+        label: (rng.randint(0, 50000), rng.randint(1, 30))
+        for label in ("Força", "Disciplina", "Saúde", "Inteligência")
+    }
+    rows = [
+        (i, f"Missão {i}", "Missão sintética de benchmark", 50, rng.choice(DIFFICULTIES),
+         related_attributes(*random_flags(rng)), rng.random() < 0.4, rng.randint(0, 10))
+        for i in range(missions)
+    ]
+    template_rows = [
+        (i, f"Template {i}", "Template sintético", 30, rng.choice(DIFFICULTIES), related_attributes(*random_flags(rng)))
+        for i in range(templates)
+    ]
+
+    character_dicts = {
+        "name": "bench",
+        "attributes": {label: {"xp": xp, "level": level} for label, (xp, level) in attributes.items()},
+        "total_level": sum(level for _, level in attributes.values()),
+        "missions": [
+            {"title": t, "xp_reward": x, "difficulty": d, "related_attributes": r, "completed": c, "description": desc}
+            for _, t, desc, x, d, r, c, _ in rows
+        ],
+    }
+    character_payloads = dict(character_dicts, attributes={
+        label: AttributePayload(xp, level) for label, (xp, level) in attributes.items()
+    }, missions=[MissionPayload(t, x, d, r, c, desc) for _, t, desc, x, d, r, c, _ in rows])
+
+    listing_dicts = {"missions": [
+        {"id": i, "title": t, "description": desc, "xp_reward": x, "difficulty": d,
+         "related_attributes": r, "completed": c, "streak": s}
+        for i, t, desc, x, d, r, c, s in rows
+    ], "next_cursor": None}
+    listing_payloads = {"missions": [MissionRowPayload(*row) for row in rows], "next_cursor": None}
+
+    template_dicts = [
+        {"id": i, "title": t, "description": desc, "xp_reward": x, "difficulty": d, "related_attributes": r}
+        for i, t, desc, x, d, r in template_rows
+    ]
+    template_payloads = [TemplatePayload(*row) for row in template_rows]
+
+    return {
+        "get_character": (character_dicts, character_payloads),
+        "list_character_missions": (listing_dicts, listing_payloads),
+        "list_mission_templates": (template_dicts, template_payloads),
+    }
+
+
+def best_us(fn, number, repeat):
+    return round(min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--missions", type=int, default=500)
+    parser.add_argument("--templates", type=int, default=500)
+    parser.add_argument("--number", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="arquivo JSON de resultados ('-' para stdout)")
+    args = parser.parse_args()
+
+    backend = available_backend()
+    app = Flask("bench_json")
+    baseline = DefaultJSONProvider(app)
+    fast = PROVIDERS[backend](app)
+    payloads = build_payloads(args.missions, args.templates, random.Random(42))
+
+    results = {"meta": run_metadata(backend=backend, missions=args.missions, templates=args.templates), "json": {}}
+    print(f"backend: {backend}")
+    print(f"{'response':<26} {'baseline us':>12} {'fast us':>10} {'speedup':>8}")
+    with app.test_request_context():
+        for name, (dicts, shaped) in payloads.items():
+            before = baseline.response(dicts).get_data()
+            after = fast.response(shaped).get_data()
+            if json.loads(before) != json.loads(after):
+                raise SystemExit(f"{name}: serialized payloads differ")
+
+            baseline_us = best_us(lambda: baseline.response(dicts), args.number, args.repeat)
+            fast_us = best_us(lambda: fast.response(shaped), args.number, args.repeat)
+            results["json"][name] = {
+                "baseline_us": baseline_us, "fast_us": fast_us,
+                "speedup": round(baseline_us / fast_us, 2), "bytes": len(after),
+            }
+            print(f"{name:<26} {baseline_us:>12.1f} {fast_us:>10.1f} {baseline_us / fast_us:>7.1f}x")
+
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Latência do ranking em diferentes profundidades: keyset (cursor) contra
+OFFSET, e "meu rank" pelo índice em memória contra COUNT no banco.
+
+Uso:
+    python benchmarks/bench_leaderboard.py --characters 1000000 --by total
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import select
+
+from common import make_app, seed_characters, timed
+
+from models import db, Character, CharacterAttribute
+from leaderboard import RANKINGS, encode_cursor, leaderboard_page, rank_index, rank_of
+
+
+def offset_page(by, limit, offset):
+    """Página equivalente usando OFFSET, para comparação."""
+    xp_column, level_column = RANKINGS[by]
+    return db.session.execute(
+        select(CharacterAttribute.character_id, Character.name, xp_column, level_column)
+        .join(Character, Character.id == CharacterAttribute.character_id)
+        .order_by(xp_column.desc(), CharacterAttribute.character_id.desc())
+        .limit(limit).offset(offset)
+    ).all()
+
+
+def median_ms(fn, repeat):
+    return statistics.median(timed(fn)[1] for _ in range(repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--characters", type=int, default=1000000)
+    parser.add_argument("--by", default="total", choices=sorted(RANKINGS))
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        _, elapsed = timed(seed_characters, args.characters)
+        print(f"seeded {args.characters} characters in {elapsed:.1f}s")
+
+        depths = [0, 1000, 10000, 100000, args.characters // 2, args.characters - args.limit]
+        print(f"{'depth':>10} {'keyset ms':>10} {'offset ms':>10}")
+        for depth in sorted({d for d in depths if 0 <= d < args.characters}):
+            cursor = None
+            if depth:
+                # Monta o cursor da linha anterior à profundidade (fora da medição)
+                character_id, _, xp, _ = offset_page(args.by, 1, depth - 1)[0]
+                cursor = encode_cursor(xp, character_id, depth, depth)
+            keyset = median_ms(lambda: leaderboard_page(args.by, args.limit, cursor), args.repeat)
+            offset = median_ms(lambda: offset_page(args.by, args.limit, depth), args.repeat)
+            print(f"{depth:>10} {keyset:>10.2f} {offset:>10.2f}")
+
+        names = [f"bench_{i}" for i in (1, args.characters // 2, args.characters)]
+        count_ms = median_ms(lambda: [rank_of(n, args.by) for n in names], args.repeat) / len(names)
+
+        rank_index.rank(args.by, 0, app=app)
+        while rank_index.rank(args.by, 0) is None:
+            time.sleep(0.1)
+        index_ms = median_ms(lambda: [rank_of(n, args.by) for n in names], args.repeat) / len(names)
+        print(f"my rank: count={count_ms:.2f}ms index={index_ms:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Micro-benchmarks das funções quentes: cálculo de nível, XP por dificuldade
+e serialização JSON das respostas (personagem e ranking).
+
+Uso:
+    python benchmarks/bench_micro.py --output micro.json
+    python benchmarks/bench_micro.py --compare micro.json --threshold 0.2
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+
+from common import compare_results, run_metadata, write_results
+
+from flask import Flask
+
+from json_provider import init_json
+from level_curve import levels_for_batch
+from services import ATTRIBUTE_LABELS, calculate_level_and_next, get_xp_by_difficulty, related_attributes
+
+
+def measure(fn, number, repeat):
+    """
+    Returns:
+        dict: Nanossegundos por operação (melhor e mediana das repetições).
+    """
+    runs = sorted(timeit.repeat(fn, number=number, repeat=repeat))
+    return {
+        "ns_per_op": round(runs[0] / number * 1e9, 1),
+        "median_ns_per_op": round(runs[len(runs) // 2] / number * 1e9, 1),
+        "number": number,
+    }
+
+
+def character_payload(missions, rng):
+    """Monta uma resposta de `GET /character/<name>` com `missions` missões."""
+    attributes = {}
+    total_level = 0
+    for _, label in ATTRIBUTE_LABELS:
+        xp = rng.randint(0, 50000)
+        level = calculate_level_and_next(xp)[0]
+        attributes[label] = {"xp": xp, "level": level}
+        total_level += level
+    return {
+        "name": "bench",
+        "attributes": attributes,
+        "total_level": total_level,
+        "missions": [
+            {
+                "id": i,
+                "title": f"Missão {i}",
+                "description": "Missão sintética de benchmark",
+                "xp_reward": 50,
+                "difficulty": "Médio",
+                "related_attributes": list(related_attributes(*(rng.random() < 0.5 for _ in range(4)))),
+                "completed": rng.random() < 0.4,
+                "streak": rng.randint(0, 10),
+            }
+            for i in range(missions)
+        ]
+    }
+
+
+def leaderboard_payload(entries):
+    return {
+        "by": "total",
+        "entries": [
+            {"rank": i + 1, "character_id": i + 1, "name": f"bench_{i + 1}", "xp": 100000 - i, "level": 20}
+            for i in range(entries)
+        ],
+        "next_cursor": "99950.50.50.50",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="chamadas por repetição nas funções baratas")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--missions", type=int, default=200, help="missões no payload do personagem")
+    parser.add_argument("--output", default=None, help="arquivo JSON de resultados ('-' para stdout)")
+    parser.add_argument("--compare", default=None, help="JSON de uma rodada anterior")
+    parser.add_argument("--threshold", type=float, default=0.25, help="piora tolerada na comparação")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    xps = [rng.randint(0, 2000000) for _ in range(1024)]
+    difficulties = [rng.choice(("Fácil", "Médio", "Difícil", "Outra")) for _ in range(1024)]
+    character = character_payload(args.missions, rng)
+    leaderboard = leaderboard_payload(50)
+    # Mesmo provider JSON da API (ver `create_app`), não o padrão do Flask
+    app = Flask("bench_micro")
+    json_backend = init_json(app)
+
+    xp_cycle = iter(xps * (args.number * args.repeat // len(xps) + 2))
+    difficulty_cycle = iter(difficulties * (args.number * args.repeat // len(difficulties) + 2))
+    json_number = max(1, args.number // 200)
+
+    results = {
+        "meta": run_metadata(
+            number=args.number, repeat=args.repeat, missions=args.missions, json_backend=json_backend
+        ),
+        "micro": {
+            "calculate_level_and_next": measure(
+                lambda: calculate_level_and_next(next(xp_cycle)), args.number, args.repeat
+            ),
+            "levels_for_batch_1024": measure(lambda: levels_for_batch(xps), max(1, args.number // 1000), args.repeat),
+            "get_xp_by_difficulty": measure(
+                lambda: get_xp_by_difficulty(next(difficulty_cycle)), args.number, args.repeat
+            ),
+            "json_stdlib_character": measure(
+                lambda: json.dumps(character, ensure_ascii=False), json_number, args.repeat
+            ),
+            "json_app_character": measure(lambda: app.json.dumps(character), json_number, args.repeat),
+            "json_app_leaderboard": measure(lambda: app.json.dumps(leaderboard), json_number, args.repeat),
+        },
+    }
+
+    print(f"{'benchmark':<28} {'ns/op':>12} {'median':>12}")
+    for name, result in results["micro"].items():
+        print(f"{name:<28} {result['ns_per_op']:>12.1f} {result['median_ns_per_op']:>12.1f}")
+
+    if args.output:
+        write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare_results(args.compare, results, "ns_per_op", args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Confere que as consultas do caminho quente usam os índices de
+`character_missions` e `character_relics` em vez de varredura sequencial.
+
+Sai com código 1 se algum plano não mencionar o índice esperado.
+
+Uso:
+    python benchmarks/check_query_plans.py
+    python benchmarks/check_query_plans.py --database-url postgresql://localhost/rpg_plans
+"""
+import argparse
+import sys
+
+from sqlalchemy import func, select, text
+
+from common import make_app
+
+from models import db, CharacterMission, CharacterRelic
+
+
+def hot_path_queries():
+    """Retorna (descrição, consulta, índice esperado) de cada busca do caminho quente."""
+    return [
+        (
+            "complete_mission: busca pelo título normalizado",
+            select(CharacterMission.id).where(
+                CharacterMission.character_id == 1,
+                CharacterMission.title_key == func.lower("Correr"),
+                CharacterMission.completed == False
+            ),
+            "uq_character_missions_character_id_title_key",
+        ),
+        (
+            "add_mission_from_template: missão já existente",
+            select(CharacterMission.id).where(
+                CharacterMission.character_id == 1,
+                CharacterMission.title_key == func.lower("Ler")
+            ),
+            "uq_character_missions_character_id_title_key",
+        ),
+        (
+            "missões em aberto do personagem",
+            select(CharacterMission.id).where(
+                CharacterMission.character_id == 1,
+                CharacterMission.completed == False
+            ),
+            "ix_character_missions_character_id_completed",
+        ),
+        (
+            "relíquias do personagem",
+            select(CharacterRelic.id).where(CharacterRelic.character_id == 1),
+            "ix_character_relics_character_id",
+        ),
+    ]
+
+
+def explain(query):
+    dialect = db.engine.dialect
+    sql = str(query.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return "\n".join(str(row[-1]) for row in rows)
+    # Em tabelas pequenas o Postgres prefere seq scan; desliga para ver se o índice é elegível
+    db.session.execute(text("SET enable_seqscan = off"))
+    rows = db.session.execute(text(f"EXPLAIN {sql}")).all()
+    return "\n".join(row[0] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    failures = 0
+    with app.app_context():
+        for label, query, index_name in hot_path_queries():
+            plan = explain(query)
+            ok = index_name in plan
+            failures += not ok
+            print(f"[{'ok' if ok else 'FAIL'}] {label}\n    {plan.replace(chr(10), chr(10) + '    ')}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Confere o roteamento de leituras para réplicas com arquivos SQLite locais:
+um primário e réplicas somente leitura (cópias do arquivo do primário,
+abertas com `mode=ro`, que falham em qualquer escrita).
+
+Verifica que as rotas de leitura alternam entre as réplicas, que escritas
+e a virada preguiçosa de um GET vão ao primário, que o cliente que acabou
+de escrever lê do primário e que uma réplica indisponível sai da rotação
+sem derrubar a requisição. Sai com código 1 se alguma verificação falhar.
+
+Uso:
+    python benchmarks/check_replica_routing.py
+    python benchmarks/check_replica_routing.py --replicas 3 --show-metrics
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import timedelta
+
+import common  # noqa: F401 - coloca a raiz do repositório no sys.path
+
+from sqlalchemy import update
+
+from app import create_app
+from models import db, utc_today, Character
+
+NAME = "Replica"
+
+
+def replica_uri(path):
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+def bind_statements(client):
+    """Instruções SQL por bind, lidas do `/metrics`."""
+    text = client.get("/metrics").get_data(as_text=True)
+    return {
+        bind: int(count) for bind, count in
+        re.findall(r'^db_bind_statement_duration_seconds_count\{bind="([^"]+)"\} (\d+)$', text, re.MULTILINE)
+    }
+
+
+def delta(before, after):
+    return {bind: count - before.get(bind, 0) for bind, count in after.items() if count != before.get(bind, 0)}
+
+
+def replicate(primary, replicas):
+    for path in replicas:
+        shutil.copyfile(primary, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=2, help="Quantidade de réplicas (padrão: 2).")
+    parser.add_argument("--show-metrics", action="store_true", help="Imprime as métricas de roteamento ao final.")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="replicas_")
+    primary = os.path.join(directory, "primary.db")
+    replicas = [os.path.join(directory, f"replica_{i}.db") for i in range(1, max(args.replicas, 1) + 1)]
+    failures = []
+
+    def check(description, ok):
+        print(f"[{'ok' if ok else 'FAIL'}] {description}")
+        if not ok:
+            failures.append(description)
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}",
+        "DATABASE_REPLICA_URIS": [replica_uri(path) for path in replicas],
+        "XP_BUFFER_RECOVER": False,
+        "READ_YOUR_WRITES_SECONDS": 5,
+    })
+    with app.app_context():
+        db.create_all(bind_key=None)
+    client = app.test_client()
+    check("character created on the primary", client.post("/character", json={"name": NAME}).status_code == 201)
+    replicate(primary, replicas)
+    # Cliente novo, sem a marca de escrita recente da criação
+    client = app.test_client()
+
+    before = bind_statements(client)
+    for _ in range(2 * len(replicas)):
+        check("GET /character served", client.get(f"/character/{NAME}").status_code == 200)
+    used = delta(before, bind_statements(client))
+    check(f"reads spread over every replica {sorted(used)}",
+          all(f"replica_{i}" in used for i in range(1, len(replicas) + 1)))
+    check("reads skip the primary", "primary" not in used)
+
+    response = client.post(f"/character/{NAME}/mission", json={"title": "Ler"})
+    check("write served by the primary", response.status_code == 201)
+    check("write returns the read-your-writes marker", "X-Read-Your-Writes" in response.headers)
+    before = bind_statements(client)
+    titles = [m["title"] for m in client.get(f"/character/{NAME}").get_json()["missions"]]
+    check("client that wrote reads its own write", "Ler" in titles)
+    check("read after write goes to the primary", set(delta(before, bind_statements(client))) == {"primary"})
+
+    fresh = app.test_client()
+    titles = [m["title"] for m in fresh.get(f"/character/{NAME}").get_json()["missions"]]
+    check("other clients read the (stale) replica", "Ler" not in titles)
+
+    # Virada pendente nas réplicas: o GET aplica a virada no primário
+    with app.app_context():
+        db.session.execute(
+            update(Character).where(Character.name == NAME)
+            .values(last_rollover_date=utc_today() - timedelta(days=1))
+        )
+        db.session.commit()
+    replicate(primary, replicas)
+    check("lazy rollover on GET succeeds", fresh.get(f"/character/{NAME}").status_code == 200)
+    with app.app_context():
+        rolled = db.session.query(Character.last_rollover_date).filter_by(name=NAME).scalar()
+    check("lazy rollover written to the primary", rolled == utc_today())
+
+    # Réplica indisponível: a requisição é refeita no primário e a réplica sai da rotação
+    os.remove(replicas[0])
+    with app.app_context():
+        db.engines["replica_1"].dispose()
+    # A virada acima também marcou o cliente como recente: usa outro
+    reader = app.test_client()
+    statuses = [reader.get(f"/character/{NAME}").status_code for _ in range(2 * len(replicas))]
+    check("reads survive a missing replica", statuses == [200] * len(statuses))
+    before = bind_statements(reader)
+    reader.get(f"/character/{NAME}")
+    check("missing replica left the rotation", "replica_1" not in delta(before, bind_statements(reader)))
+
+    if args.show_metrics:
+        text = client.get("/metrics").get_data(as_text=True)
+        print("\n".join(line for line in text.splitlines() if line.startswith(("db_route", "db_replica"))))
+
+    shutil.rmtree(directory, ignore_errors=True)
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Confere a divisão dos personagens em shards com arquivos SQLite locais: o
+banco padrão (shard 0) e um arquivo por shard adicional.
+
+Verifica que cada personagem e suas linhas (atributos, missões, conclusões)
+ficam no shard dono do nome, que os templates são copiados para todos os
+shards, que reset, virada diária, ranking e exportação cobrem todos os
+shards, que, após acrescentar um shard, `flask shards rebalance` move só
+os personagens que mudaram de dono sem perder missões, com a API
+respondendo durante o processo, e que personagens fora do registro impedem
+novas reservas até o `flask shards init`. Sai com código 1 se alguma
+verificação falhar.
+
+Uso:
+    python benchmarks/check_sharding.py
+    python benchmarks/check_sharding.py --shards 4 --characters 200
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import common  # noqa: F401 - coloca a raiz do repositório no sys.path
+
+from sqlalchemy import func, insert, select
+
+from app import create_app
+from models import db, Character, CharacterMission, CharacterRegistry, MissionCompletion, MissionTemplate
+from sharding import DEFAULT_SHARD, engine_for, shards, sync_templates
+
+
+def build_app(directory, count, rebalancing=False):
+    """Cria o app com `count` shards e o schema em todos; deixa um contexto de aplicação ativo."""
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(directory, 'shard_0.db')}",
+        "SHARD_URIS": [f"sqlite:///{os.path.join(directory, f'shard_{i}.db')}" for i in range(1, count)],
+        "SHARD_REBALANCING": rebalancing,
+        "XP_BUFFER_RECOVER": False,
+    })
+    app.app_context().push()
+    for shard in shards.shards:
+        db.metadata.create_all(engine_for(shard))
+    return app
+
+
+def rows_by_shard(model):
+    """Quantidade de linhas de `model` por shard."""
+    result = {}
+    for shard in shards.shards:
+        with engine_for(shard).connect() as conn:
+            result[shard] = conn.execute(select(func.count()).select_from(model)).scalar()
+    return result
+
+
+def orphan_missions():
+    """Missões cujo personagem não está no mesmo shard."""
+    orphans = 0
+    for shard in shards.shards:
+        with engine_for(shard).connect() as conn:
+            orphans += conn.execute(
+                select(func.count()).select_from(CharacterMission)
+                .where(CharacterMission.character_id.not_in(select(Character.id)))
+            ).scalar()
+    return orphans
+
+
+def registry():
+    with engine_for(DEFAULT_SHARD).connect() as conn:
+        return dict(conn.execute(select(CharacterRegistry.name, CharacterRegistry.shard)).all())
+
+
+def placement():
+    """{nome: shards onde o personagem tem linha}."""
+    found = {}
+    for shard in shards.shards:
+        with engine_for(shard).connect() as conn:
+            for name in conn.execute(select(Character.name)).scalars():
+                found.setdefault(name, []).append(shard)
+    return found
+
+
+def missions_by_name():
+    missions = {}
+    for shard in shards.shards:
+        with engine_for(shard).connect() as conn:
+            for name, title in conn.execute(
+                select(Character.name, CharacterMission.title)
+                .join(CharacterMission, CharacterMission.character_id == Character.id)
+            ):
+                missions.setdefault(name, set()).add(title)
+    return missions
+
+
+def wait_daily_update(client, response):
+    urls = response.get_json().get("status_urls", {})
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        statuses = [client.get(url).get_json()["status"] for url in urls.values()]
+        if all(status == "done" for status in statuses):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=3, help="Shards antes do rebalanceamento (padrão: 3).")
+    parser.add_argument("--characters", type=int, default=60, help="Personagens criados pela API (padrão: 60).")
+    args = parser.parse_args()
+    count = max(args.shards, 2)
+
+    directory = tempfile.mkdtemp(prefix="shards_")
+    failures = []
+
+    def check(description, ok):
+        print(f"[{'ok' if ok else 'FAIL'}] {description}")
+        if not ok:
+            failures.append(description)
+
+    app = build_app(directory, count)
+    client = app.test_client()
+    names = [f"Hero {i}" for i in range(args.characters)]
+
+    db.session.add(MissionTemplate(title="Meditar", difficulty="Fácil", discipline=True))
+    db.session.commit()
+    sync_templates()
+    check("templates replicated to every shard", set(rows_by_shard(MissionTemplate).values()) == {1})
+
+    statuses = [client.post("/character", json={"name": name}).status_code for name in names]
+    check("characters created", statuses == [201] * len(names))
+    check("duplicate name rejected across shards", client.post("/character", json={"name": names[0]}).status_code == 400)
+
+    located = placement()
+    check("each character lives on exactly its owner shard",
+          all(located.get(name) == [shards.owner(name)] for name in names))
+    check("characters spread over every shard", set(sum(located.values(), [])) == set(shards.shards))
+    ids = []
+    for shard in shards.shards:
+        with engine_for(shard).connect() as conn:
+            ids.extend(conn.execute(select(Character.id)).scalars())
+    check("registry records every character's shard", registry() == {name: shards.owner(name) for name in names})
+    check("character ids are unique across shards", len(ids) == len(set(ids)))
+
+    completed = 0
+    for i, name in enumerate(names):
+        client.post(f"/character/{name}/mission", json={"title": "Ler", "difficulty": "Médio"})
+        client.post(f"/character/{name}/mission/template", json={"template_id": 1})
+        if i % 2 == 0:
+            ok = client.post(f"/character/{name}/complete_mission", json={"mission_title": "Ler"}).status_code == 200
+            completed += ok
+    check("missions completed on their shards", completed == len(range(0, len(names), 2)))
+    check("completions logged", sum(rows_by_shard(MissionCompletion).values()) == completed)
+    check("missions colocated with their character",
+          sum(rows_by_shard(CharacterMission).values()) == 2 * len(names) and orphan_missions() == 0)
+    check("every character readable",
+          all(client.get(f"/character/{name}").status_code == 200 for name in names))
+
+    board, cursor = [], None
+    while True:
+        page = client.get("/leaderboard", query_string={"limit": 7, **({"cursor": cursor} if cursor else {})}).get_json()
+        board.extend(page["entries"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    keys = [(entry["xp"], entry["character_id"]) for entry in board]
+    check("leaderboard pages cover every shard", sorted(entry["name"] for entry in board) == sorted(names))
+    check("leaderboard merged in order", keys == sorted(keys, reverse=True))
+    rank = client.get(f"/leaderboard/rank/{names[0]}").get_json()
+    check("rank counts every shard", rank["rank"] == 1 + sum(1 for entry in board if entry["xp"] > rank["xp"]))
+
+    response = client.post("/reset_missions")
+    check("reset fans out to every shard", response.get_json()["reset_count"] == completed)
+
+    response = client.post("/daily-update")
+    body = response.get_json()
+    check("daily update enqueues one job per shard", response.status_code == 202 and set(body["jobs"]) == set(shards.shards))
+    check("daily update finishes on every shard", wait_daily_update(client, response))
+    check("unknown shard status is 404", client.get("/daily-update/1?shard=nope").status_code == 404)
+
+    imported = [{"name": f"Imported {i}", "missions": [{"title": "Correr"}]} for i in range(30)]
+    response = client.post("/bulk/import", data="\n".join(json.dumps(r) for r in imported),
+                           content_type="application/x-ndjson")
+    check("bulk import", response.get_json()["characters"] == len(imported))
+    located = placement()
+    check("bulk import places characters on their owners",
+          all(located.get(r["name"]) == [shards.owner(r["name"])] for r in imported))
+    exported = client.get("/bulk/export").get_data(as_text=True).splitlines()
+    check("export streams every shard", len(exported) == len(names) + len(imported))
+
+    # Acrescenta um shard: parte dos personagens passa a pertencer a ele
+    before_missions = missions_by_name()
+    app = build_app(directory, count + 1, rebalancing=True)
+    client = app.test_client()
+    sync_templates()
+    everyone = names + [r["name"] for r in imported]
+    misplaced = [name for name in everyone if shards.owner(name) != placement()[name][0]]
+    check(f"new shard takes over some characters ({len(misplaced)})", 0 < len(misplaced) < len(everyone))
+    check("new owners are only the new shard", {shards.owner(name) for name in misplaced} == {shards.shards[-1]})
+    check("misplaced characters readable before the move (registry lookup)",
+          all(client.get(f"/character/{name}").status_code == 200 for name in misplaced))
+
+    result = app.test_cli_runner().invoke(args=["shards", "rebalance"])
+    reports = json.loads(result.output)
+    check("rebalance moved every misplaced character",
+          result.exit_code == 0 and sum(r["moved"] for r in reports.values()) == len(misplaced))
+    located = placement()
+    check("every character now lives on its owner", all(located.get(name) == [shards.owner(name)] for name in everyone))
+    check("missions survived the move", missions_by_name() == before_missions)
+    check("registry updated", registry() == {name: shards.owner(name) for name in everyone})
+    check("no orphan rows left behind", orphan_missions() == 0)
+    check("moved characters readable",
+          all(client.get(f"/character/{name}").status_code == 200 for name in misplaced))
+    check("completing a moved character's mission works",
+          all(client.post(f"/character/{name}/complete_mission", json={"mission_title": "Meditar"}).status_code == 200
+              for name in misplaced if name in names))
+    status = json.loads(app.test_cli_runner().invoke(args=["shards", "status"]).output)
+    check("status reports nothing misplaced", all(s["misplaced"] == 0 for s in status.values()))
+
+    # Personagem criado sem shards e fora do registro: novas reservas recusam até o `shards init`
+    with engine_for(DEFAULT_SHARD).begin() as conn:
+        conn.execute(insert(Character), {"id": 1_000_000, "name": "Legacy"})
+    shards.registry_checked = False
+    check("creation refused while the registry is incomplete",
+          client.post("/character", json={"name": "Other"}).status_code == 500)
+    result = app.test_cli_runner().invoke(args=["shards", "init"])
+    check("shards init registers the legacy character", result.output.startswith("registered 1 characters"))
+    check("legacy name cannot be reused", client.post("/character", json={"name": "Legacy"}).status_code == 400)
+    check("creation works again", client.post("/character", json={"name": "Other"}).status_code == 201)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Utilitários compartilhados pelos benchmarks: app Flask isolado em SQLite e
+geração de dados sintéticos.
+
+Os scripts são executados a partir da raiz do repositório, por exemplo:
+    python benchmarks/bench_daily_update.py --sizes 10000 100000
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+
+from models import db, Character, CharacterAttribute, CharacterMission, MissionTemplate  # noqa: E402
+
+DIFFICULTIES = ("Fácil", "Médio", "Difícil")
+
+
+def make_app(database_uri=None):
+    """
+    Cria um app Flask mínimo ligado a um banco SQLite temporário.
+
+    Args:
+        database_uri (str, opcional): URI do banco; por padrão, um arquivo temporário.
+
+    Returns:
+        Flask: App com o `db` inicializado e as tabelas criadas.
+    """
+    if database_uri is None:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+        os.close(fd)
+        database_uri = f"sqlite:///{path}"
+
+    app = Flask("benchmarks")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_missions(total_missions, missions_per_character=50, batch_size=10000, seed=42):
+    """
+    Popula personagens, atributos e missões sintéticas usando inserts em lote.
+
+    Deve ser chamada dentro de um app context.
+
+    Args:
+        total_missions (int): Quantidade total de missões a criar.
+        missions_per_character (int): Missões por personagem.
+        batch_size (int): Linhas por INSERT em lote.
+        seed (int): Semente do gerador aleatório.
+    """
+    rng = random.Random(seed)
+    total_characters = max(1, -(-total_missions // missions_per_character))
+
+    characters = [{"id": i + 1, "name": f"bench_{i + 1}"} for i in range(total_characters)]
+    for start in range(0, len(characters), batch_size):
+        db.session.execute(Character.__table__.insert(), characters[start:start + batch_size])
+    db.session.execute(
+        CharacterAttribute.__table__.insert(),
+        [
+            {"character_id": c["id"], "strength_xp": 0, "discipline_xp": 0,
+             "health_xp": 0, "intelligence_xp": 0}
+            for c in characters
+        ]
+    )
+
+    batch = []
+    for i in range(total_missions):
+        batch.append({
+            "character_id": i // missions_per_character + 1,
+            "title": f"Missão {i}",
+            "description": "Missão sintética de benchmark",
+            "xp_reward": 0,
+            "difficulty": rng.choice(DIFFICULTIES),
+            "strength": rng.random() < 0.5,
+            "discipline": rng.random() < 0.5,
+            "health": rng.random() < 0.5,
+            "intelligence": rng.random() < 0.5,
+            "completed": rng.random() < 0.4,
+            "streak": rng.randint(0, 10),
+        })
+        if len(batch) >= batch_size:
+            db.session.execute(CharacterMission.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(CharacterMission.__table__.insert(), batch)
+    db.session.commit()
+
+
+def seed_characters(total_characters, batch_size=50000, seed=42, max_xp=200000):
+    """
+    Popula personagens com atributos de XP aleatório (sem missões), para
+    benchmarks de ranking. Deve ser chamada dentro de um app context.
+
+    Args:
+        total_characters (int): Quantidade de personagens.
+        batch_size (int): Linhas por INSERT em lote.
+        seed (int): Semente do gerador aleatório.
+        max_xp (int): XP máximo por atributo.
+    """
+    rng = random.Random(seed)
+    for start in range(0, total_characters, batch_size):
+        ids = range(start + 1, min(start + batch_size, total_characters) + 1)
+        db.session.execute(
+            Character.__table__.insert(), [{"id": i, "name": f"bench_{i}"} for i in ids]
+        )
+        rows = []
+        for i in ids:
+            xp = [rng.randint(0, max_xp) for _ in range(4)]
+            rows.append({
+                "character_id": i, "strength_xp": xp[0], "discipline_xp": xp[1],
+                "health_xp": xp[2], "intelligence_xp": xp[3], "total_xp": sum(xp),
+            })
+        db.session.execute(CharacterAttribute.__table__.insert(), rows)
+    db.session.commit()
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Executa `fn` e devolve (resultado, segundos decorridos).
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def seed_templates(total_templates, seed=42):
+    """
+    Popula o catálogo de missões pré-definidas. Deve ser chamada dentro de
+    um app context.
+
+    Args:
+        total_templates (int): Quantidade de templates.
+        seed (int): Semente do gerador aleatório.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(total_templates):
+        difficulty = rng.choice(DIFFICULTIES)
+        rows.append({
+            "title": f"Template {i + 1}",
+            "description": "Template sintético de benchmark",
+            "xp_reward": {"Fácil": 30, "Médio": 50, "Difícil": 70}[difficulty],
+            "difficulty": difficulty,
+            "strength": rng.random() < 0.5,
+            "discipline": rng.random() < 0.5,
+            "health": rng.random() < 0.5,
+            "intelligence": rng.random() < 0.5,
+        })
+    if rows:
+        db.session.execute(MissionTemplate.__table__.insert(), rows)
+    db.session.commit()
+
+
+def percentile(sorted_samples, fraction):
+    """Percentil pelo método do posto mais próximo, sobre amostras já ordenadas."""
+    if not sorted_samples:
+        return None
+    index = max(0, min(len(sorted_samples) - 1, int(round(fraction * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+def summarize_latencies(samples, wall_seconds):
+    """
+    Resume latências (em segundos) de uma rodada.
+
+    Args:
+        samples (list): Latência de cada requisição.
+        wall_seconds (float): Duração total da rodada, para a vazão.
+
+    Returns:
+        dict: Quantidade, vazão (req/s) e latências em ms (média, p50, p95, p99, máx.).
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {"requests": 0}
+
+    def ms(value):
+        return round(value * 1000, 3)
+
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / wall_seconds, 1) if wall_seconds else None,
+        "mean_ms": ms(sum(ordered) / len(ordered)),
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1]),
+    }
+
+
+def run_metadata(**extra):
+    """
+    Metadados gravados junto dos resultados, para comparar rodadas.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }, **extra)
+
+
+def write_results(path, results):
+    """Grava os resultados em JSON (ou imprime, se `path` for '-')."""
+    text = json.dumps(results, indent=2, ensure_ascii=False, sort_keys=True)
+    if path == "-":
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(text + "\n")
+    print(f"results written to {path}")
+
+
+def compare_results(baseline_path, results, metric, threshold):
+    """
+    Compara os resultados com uma rodada anterior e lista as regressões.
+
+    Percorre os dois JSONs em paralelo e compara toda chave igual a `metric`
+    (por exemplo 'p95_ms' ou 'ns_per_op'), onde maior é pior.
+
+    Args:
+        baseline_path (str): JSON de uma rodada anterior.
+        results (dict): Resultados da rodada atual.
+        metric (str): Chave comparada.
+        threshold (float): Piora relativa tolerada (0.2 = 20%).
+
+    Returns:
+        list: Descrições das regressões encontradas.
+    """
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+
+    regressions = []
+
+    def walk(old, new, path):
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            return
+        for key, new_value in new.items():
+            if key not in old:
+                continue
+            if key == metric and isinstance(new_value, (int, float)) and old[key]:
+                change = new_value / old[key] - 1
+                if change > threshold:
+                    regressions.append(f"{path}: {metric} {old[key]} -> {new_value} (+{change:.0%})")
+            else:
+                walk(old[key], new_value, f"{path}/{key}" if path else key)
+
+    walk(baseline, results, "")
+    return regressions
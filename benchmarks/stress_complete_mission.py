@@ -0,0 +1,118 @@
+"""
+Teste de estresse da conclusão de missões: centenas de requisições paralelas
+disputando as mesmas missões do mesmo personagem.
+
+Verifica que cada missão é completada exatamente uma vez e que o XP final de
+cada atributo é a soma exata das recompensas. Sai com código 1 se houver
+divergência. Com --write-behind, o XP passa pelo `xp_buffer` (com flushes
+durante a carga) e a conferência é feita após o último flush.
+
+Uso:
+    python benchmarks/stress_complete_mission.py --missions 100 --attempts 4 --threads 200
+    python benchmarks/stress_complete_mission.py --write-behind --flush-seconds 0.05
+    python benchmarks/stress_complete_mission.py --database-url postgresql://localhost/rpg_stress
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401  (ajusta o sys.path para a raiz do repositório)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=None,
+                        help="padrão: arquivo SQLite temporário")
+    parser.add_argument("--missions", type=int, default=100)
+    parser.add_argument("--attempts", type=int, default=4,
+                        help="requisições concorrentes por missão")
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--write-behind", action="store_true", help="ativa XP_WRITE_BEHIND")
+    parser.add_argument("--flush-seconds", type=float, default=0.05)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.database_url is None:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="stress_")
+        os.close(fd)
+        args.database_url = f"sqlite:///{path}?timeout=60"
+    from app import create_app
+    from models import db, Character, CharacterAttribute, CharacterMission
+    from services import ATTRIBUTE_LABELS
+
+    config = {"SQLALCHEMY_DATABASE_URI": args.database_url}
+    if args.write_behind:
+        config.update(XP_WRITE_BEHIND=True, XP_BUFFER_DIR=tempfile.mkdtemp(prefix="stress_xp_"),
+                      XP_BUFFER_FLUSH_SECONDS=args.flush_seconds)
+    app = create_app(config)
+
+    rng = random.Random(7)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        character = Character(name="stress")
+        db.session.add_all([character, CharacterAttribute(character=character)])
+        missions = []
+        for i in range(args.missions):
+            flags = {attr: rng.random() < 0.5 for attr, _ in ATTRIBUTE_LABELS}
+            missions.append(CharacterMission(
+                character=character, title=f"Missão {i}", xp_reward=rng.choice((30, 50, 70)),
+                difficulty="Fácil", completed=False, streak=0, **flags
+            ))
+        db.session.add_all(missions)
+        db.session.commit()
+        expected = {
+            attr: sum(m.xp_reward for m in missions if getattr(m, attr))
+            for attr, _ in ATTRIBUTE_LABELS
+        }
+        titles = [m.title for m in missions]
+
+    # Cada missão é disputada por várias requisições, metade pelo endpoint
+    # individual e metade pelo endpoint em lote
+    jobs = [(title, attempt % 2 == 0) for title in titles for attempt in range(args.attempts)]
+    rng.shuffle(jobs)
+
+    def fire(job):
+        title, single = job
+        client = app.test_client()
+        if single:
+            response = client.post("/character/stress/complete_mission", json={"mission_title": title})
+            return response.status_code, [title] if response.status_code == 200 else []
+        response = client.post("/character/stress/complete_missions", json={"mission_titles": [title]})
+        return response.status_code, response.get_json().get("completed", [])
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(fire, jobs))
+
+    server_errors = sum(1 for status, _ in results if status >= 500)
+    completions = [title for _, completed in results for title in completed]
+
+    with app.app_context():
+        if args.write_behind:
+            from xp_buffer import xp_buffer
+            xp_buffer.flush()
+        attributes = CharacterAttribute.query.one()
+        actual = {attr: getattr(attributes, f"{attr}_xp") or 0 for attr, _ in ATTRIBUTE_LABELS}
+        still_open = CharacterMission.query.filter_by(completed=False).count()
+
+    ok = (
+        server_errors == 0
+        and sorted(completions) == sorted(titles)
+        and actual == expected
+        and still_open == 0
+    )
+    print(f"requests={len(jobs)} threads={args.threads} 5xx={server_errors}")
+    print(f"completions={len(completions)} expected={len(titles)} still_open={still_open}")
+    print(f"xp actual={actual}")
+    print(f"xp expect={expected}")
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
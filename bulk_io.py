@@ -0,0 +1,527 @@
+import csv
+import io
+import json
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from json_provider import dumps_line
+from leaderboard import rank_index
+from level_curve import DEFAULT_CURVE
+from mission_completion import database_title_keys
+from models import db, Character, CharacterAttribute, CharacterMission
+from services import ATTRIBUTE_LABELS, get_xp_by_difficulty, related_attributes
+from sharding import fan_out_iter, release_characters, reserve_characters, shards, use_shard
+
+BATCH_SIZE = 1000
+# Linhas por INSERT de missões, abaixo do limite de parâmetros do SQLite
+MISSION_INSERT_CHUNK = 1000
+MAX_REPORTED_ERRORS = 100
+# Limites das colunas: Integer (com `total_xp` somando os quatro atributos) e String(200)/String(20)
+MAX_INTEGER = 2 ** 31 - 1
+MAX_TITLE_LENGTH = 200
+MAX_DIFFICULTY_LENGTH = 20
+
+ATTRIBUTES = tuple(attr for attr, _ in ATTRIBUTE_LABELS)
+CSV_FIELDS = (
+    "name", "strength_xp", "discipline_xp", "health_xp", "intelligence_xp",
+    "title", "description", "difficulty", "related_attributes", "completed", "streak",
+)
+
+
+# ---------------------------------------------------------------------------
+# Leitura
+# ---------------------------------------------------------------------------
+
+def read_ndjson(lines):
+    """
+    Lê registros NDJSON: um personagem por linha, no formato
+    `{"name": ..., "attributes": {"strength_xp": ...}, "missions": [...]}`.
+
+    Linhas inválidas viram registros com a chave `_error`.
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield {"_error": f"line {line_number}: invalid JSON"}
+            continue
+        if not isinstance(record, dict):
+            yield {"_error": f"line {line_number}: expected an object"}
+            continue
+        yield record
+
+
+def _parse_bool(value):
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def read_csv(lines):
+    """
+    Lê registros CSV com as colunas de `CSV_FIELDS`: uma linha por missão,
+    agrupadas por personagem (linhas consecutivas com o mesmo `name`). Uma
+    linha sem `title` cria só o personagem.
+
+    Um número inválido marca o personagem inteiro com a chave `_error`; as
+    demais linhas dele são ignoradas.
+    """
+    current = None
+    reader = csv.DictReader(lines)
+    for row in reader:
+        name = (row.get("name") or "").strip()
+        if current is None or current["name"] != name:
+            if current is not None:
+                yield current
+            current = {"name": name, "attributes": {}, "missions": []}
+            try:
+                current["attributes"] = {
+                    f"{attr}_xp": int(row.get(f"{attr}_xp") or 0) for attr in ATTRIBUTES
+                }
+            except ValueError:
+                current["_error"] = f"line {reader.line_num}: character '{name}': invalid XP"
+        if "_error" in current or not row.get("title"):
+            continue
+        try:
+            streak = int(row.get("streak") or 0)
+        except ValueError:
+            current["_error"] = f"line {reader.line_num}: character '{name}': invalid streak"
+            continue
+        current["missions"].append({
+            "title": row["title"],
+            "description": row.get("description") or "",
+            "difficulty": row.get("difficulty") or "Fácil",
+            "related_attributes": [a for a in (row.get("related_attributes") or "").split("|") if a],
+            "completed": _parse_bool(row.get("completed") or ""),
+            "streak": streak,
+        })
+    if current is not None:
+        yield current
+
+
+# ---------------------------------------------------------------------------
+# Importação
+# ---------------------------------------------------------------------------
+
+def _reject(report, reason):
+    report["rejected"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append(reason)
+
+
+def _integer(value, field, maximum=MAX_INTEGER):
+    # Aceita inteiros e strings numéricas (CSV); bool, float e outros tipos são rejeitados
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"invalid {field}: {value!r}")
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"invalid {field}: {value!r}") from None
+    if not 0 <= number <= maximum:
+        raise ValueError(f"{field} out of range: {number}")
+    return number
+
+
+def _optional_text(value, field, max_length=None):
+    if value is None:
+        return None
+    if not isinstance(value, str) or (max_length is not None and len(value) > max_length):
+        raise ValueError(f"invalid {field}: {value!r}")
+    return value
+
+
+def _clean_record(record, report):
+    """
+    Valida um registro antes do lote e normaliza os campos numéricos.
+
+    Problemas no personagem (atributos fora do formato, números inválidos)
+    rejeitam o registro inteiro; missões sem título ou com campos inválidos
+    são rejeitadas uma a uma (títulos repetidos ficam para
+    `_drop_duplicate_titles`).
+
+    Returns:
+        dict: Registro normalizado.
+
+    Raises:
+        ValueError: Se o registro inteiro deve ser rejeitado (a mensagem é o motivo).
+    """
+    name = record["name"]
+    attributes = record.get("attributes")
+    if attributes is None:
+        attributes = {}
+    if not isinstance(attributes, dict):
+        raise ValueError(f"character '{name}': attributes must be an object")
+    missions = record.get("missions")
+    if missions is None:
+        missions = []
+    if not isinstance(missions, list):
+        raise ValueError(f"character '{name}': missions must be a list")
+
+    try:
+        # O limite por atributo garante que `total_xp` também caiba na coluna
+        cleaned_attributes = {
+            f"{attr}_xp": _integer(attributes.get(f"{attr}_xp"), f"{attr}_xp", MAX_INTEGER // len(ATTRIBUTES))
+            for attr in ATTRIBUTES
+        }
+    except ValueError as e:
+        raise ValueError(f"character '{name}': {e}") from None
+
+    cleaned_missions = []
+    for mission in missions:
+        title = mission.get("title") if isinstance(mission, dict) else None
+        title = title.strip() if isinstance(title, str) else ""
+        if not title:
+            _reject(report, f"character '{name}': mission without title")
+            continue
+        try:
+            if len(title) > MAX_TITLE_LENGTH:
+                raise ValueError(f"title longer than {MAX_TITLE_LENGTH} characters")
+            related = mission.get("related_attributes") or ()
+            if isinstance(related, str) or not all(isinstance(attr, str) for attr in related):
+                raise ValueError(f"invalid related_attributes: {related!r}")
+            cleaned = dict(
+                mission,
+                title=title,
+                description=_optional_text(mission.get("description"), "description"),
+                difficulty=_optional_text(mission.get("difficulty"), "difficulty", MAX_DIFFICULTY_LENGTH),
+                related_attributes=list(related),
+                streak=_integer(mission.get("streak"), "streak"),
+            )
+        except (TypeError, ValueError) as e:
+            _reject(report, f"character '{name}': mission '{title[:50]}': {e}")
+            continue
+        cleaned_missions.append(cleaned)
+
+    return dict(record, attributes=cleaned_attributes, missions=cleaned_missions)
+
+
+def _attribute_row(character_id, attributes):
+    row = {"character_id": character_id}
+    total_xp, total_level = 0, 0
+    for attr in ATTRIBUTES:
+        xp = attributes[f"{attr}_xp"]
+        level = DEFAULT_CURVE.level_for(xp)[0]
+        row[f"{attr}_xp"] = xp
+        row[f"{attr}_level"] = level
+        total_xp += xp
+        total_level += level
+    row["total_xp"] = total_xp
+    row["total_level"] = total_level
+    return row
+
+
+def _mission_row(character_id, mission):
+    related = set(mission.get("related_attributes") or ())
+    difficulty = mission.get("difficulty") or "Fácil"
+    row = {
+        "character_id": character_id,
+        "title": mission["title"],
+        "description": mission.get("description") or "",
+        "xp_reward": get_xp_by_difficulty(difficulty),
+        "difficulty": difficulty,
+        "completed": bool(mission.get("completed", False)),
+        "streak": mission["streak"],
+    }
+    # Aceita tanto 'strength' quanto 'Força'
+    for attr, label in ATTRIBUTE_LABELS:
+        row[attr] = attr in related or label in related
+    return row
+
+
+def _insert_batch(batch, report):
+    """
+    Grava um lote de personagens válidos: personagens, atributos e missões
+    com INSERTs de várias linhas e um único commit.
+
+    Com shards, o lote é de um único shard (ver `_flush`) e os nomes são
+    reservados antes no registro global, que fornece os IDs.
+
+    Returns:
+        bool: False se houve conflito de unicidade (o lote foi desfeito).
+    """
+    names = [record["name"] for record in batch]
+    reserved = {}
+    if shards.enabled:
+        reserved = reserve_characters(names)
+        existing = set(names) - set(reserved)
+    else:
+        existing = set(db.session.scalars(select(Character.name).where(Character.name.in_(names))))
+    new_records = []
+    for record in batch:
+        if record["name"] in existing:
+            _reject(report, f"character '{record['name']}': already exists")
+        else:
+            new_records.append(record)
+    if not new_records:
+        return True
+
+    try:
+        if reserved:
+            ids = reserved
+            db.session.execute(insert(Character).values([
+                {"id": ids[record["name"]], "name": record["name"]} for record in new_records
+            ]))
+        else:
+            ids = dict(
+                (name, character_id) for character_id, name in db.session.execute(
+                    insert(Character)
+                    .values([{"name": record["name"]} for record in new_records])
+                    .returning(Character.id, Character.name)
+                )
+            )
+        db.session.execute(insert(CharacterAttribute).values([
+            _attribute_row(ids[record["name"]], record["attributes"]) for record in new_records
+        ]))
+
+        mission_rows = [
+            _mission_row(ids[record["name"]], mission) for record in new_records for mission in record["missions"]
+        ]
+
+        for start in range(0, len(mission_rows), MISSION_INSERT_CHUNK):
+            db.session.execute(insert(CharacterMission).values(mission_rows[start:start + MISSION_INSERT_CHUNK]))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        release_characters(reserved.values())
+        return False
+    except Exception:
+        db.session.rollback()
+        release_characters(reserved.values())
+        raise
+
+    report["characters"] += len(new_records)
+    report["missions"] += len(mission_rows)
+    return True
+
+
+def _drop_duplicate_titles(records, report):
+    """
+    Rejeita missões com título repetido no mesmo personagem.
+
+    As chaves vêm do `lower` do banco, a regra do índice único em
+    `title_key`; com o `lower` do Python, uma duplicata que só o banco
+    enxerga derrubaria o lote inteiro no INSERT.
+    """
+    titles = list(dict.fromkeys(mission["title"] for record in records for mission in record["missions"]))
+    keys = database_title_keys(titles)
+    for record in records:
+        seen_keys = set()
+        missions = []
+        for mission in record["missions"]:
+            key = keys[mission["title"]]
+            if key in seen_keys:
+                _reject(report, f"character '{record['name']}': duplicate mission '{mission['title']}'")
+                continue
+            seen_keys.add(key)
+            missions.append(mission)
+        record["missions"] = missions
+
+
+def _flush(batch, report):
+    if not batch:
+        return
+    groups = {None: batch}
+    if shards.enabled:
+        groups = {}
+        for record in batch:
+            groups.setdefault(shards.owner(record["name"]), []).append(record)
+    for shard, records in groups.items():
+        use_shard(shard)
+        _drop_duplicate_titles(records, report)
+        # Um conflito indica que outro processo criou um dos nomes entre a checagem e o
+        # INSERT; a segunda tentativa refaz a checagem e rejeita esse nome
+        if not _insert_batch(records, report) and not _insert_batch(records, report):
+            for record in records:
+                _reject(report, f"character '{record['name']}': conflict while inserting")
+    batch.clear()
+
+
+def import_records(records, batch_size=BATCH_SIZE):
+    """
+    Importa personagens (com atributos e missões) em lotes.
+
+    Cada lote faz uma consulta `IN` para detectar nomes já existentes, insere
+    personagens, atributos e missões com INSERTs de várias linhas e faz um
+    commit. Nomes repetidos na própria entrada são detectados com um conjunto.
+    Registros e missões com campos inválidos são contados como rejeitados,
+    sem interromper a importação.
+
+    Args:
+        records (iterable): Registros no formato de `read_ndjson`/`read_csv`.
+        batch_size (int): Personagens por lote.
+
+    Returns:
+        dict: Contagem de personagens e missões importados, rejeitados e
+            exemplos de erros.
+    """
+    report = {"characters": 0, "missions": 0, "rejected": 0, "errors": []}
+    seen_names = set()
+    batch = []
+
+    for record in records:
+        if "_error" in record:
+            _reject(report, record["_error"])
+            continue
+        name = record.get("name")
+        if not isinstance(name, str) or not name.strip() or len(name) > 100:
+            _reject(report, f"invalid character name: {name!r}")
+            continue
+        if name in seen_names:
+            _reject(report, f"character '{name}': duplicated in input")
+            continue
+        seen_names.add(name)
+        try:
+            record = _clean_record(record, report)
+        except ValueError as e:
+            _reject(report, str(e))
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _flush(batch, report)
+    _flush(batch, report)
+
+    if report["characters"]:
+        # XP importado não passou por `add_attribute_xp`; o ranking em memória é recarregado
+        rank_index.invalidate()
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Exportação
+# ---------------------------------------------------------------------------
+
+def iter_export_records(chunk_size=BATCH_SIZE):
+    """
+    Percorre todos os personagens em blocos por ID (keyset), carregando as
+    missões só do bloco atual, sem materializar as tabelas inteiras.
+
+    Com shards, os shards são lidos em paralelo e os registros saem
+    intercalados, sem ordem entre shards.
+
+    Yields:
+        dict: Registro no mesmo formato aceito por `read_ndjson`.
+    """
+    return fan_out_iter(lambda shard: _iter_shard_records(chunk_size))
+
+
+def _iter_shard_records(chunk_size):
+    xp_columns = [getattr(CharacterAttribute, f"{attr}_xp") for attr in ATTRIBUTES]
+    last_id = 0
+    while True:
+        characters = db.session.execute(
+            select(Character.id, Character.name, *xp_columns)
+            .outerjoin(CharacterAttribute, CharacterAttribute.character_id == Character.id)
+            .where(Character.id > last_id)
+            .order_by(Character.id)
+            .limit(chunk_size)
+        ).all()
+        if not characters:
+            return
+
+        missions = {}
+        for mission in db.session.execute(
+            select(CharacterMission)
+            .where(CharacterMission.character_id.in_([c.id for c in characters]))
+            .order_by(CharacterMission.character_id, CharacterMission.id)
+        ).scalars():
+            missions.setdefault(mission.character_id, []).append({
+                "title": mission.title,
+                "description": mission.description,
+                "difficulty": mission.difficulty,
+                "related_attributes": list(related_attributes(
+                    mission.strength, mission.discipline, mission.health, mission.intelligence
+                )),
+                "completed": bool(mission.completed),
+                "streak": mission.streak or 0,
+            })
+        db.session.expunge_all()
+
+        for character in characters:
+            yield {
+                "name": character.name,
+                "attributes": {
+                    f"{attr}_xp": xp or 0 for attr, xp in zip(ATTRIBUTES, character[2:])
+                },
+                "missions": missions.get(character.id, []),
+            }
+        last_id = characters[-1].id
+
+
+def ndjson_lines(records):
+    """Serializa registros como NDJSON, uma linha por personagem."""
+    for record in records:
+        yield dumps_line(record) + "\n"
+
+
+def csv_lines(records):
+    """Serializa registros como CSV, uma linha por missão (ver `read_csv`)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    writer.writerow(CSV_FIELDS)
+    yield flush()
+    for record in records:
+        xp = [record["attributes"].get(f"{attr}_xp", 0) for attr in ATTRIBUTES]
+        if not record["missions"]:
+            writer.writerow([record["name"], *xp, "", "", "", "", "", ""])
+        for mission in record["missions"]:
+            writer.writerow([
+                record["name"], *xp, mission["title"], mission["description"] or "",
+                mission["difficulty"], "|".join(mission["related_attributes"]),
+                "true" if mission["completed"] else "false", mission["streak"],
+            ])
+        yield flush()
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+WRITERS = {"ndjson": ndjson_lines, "csv": csv_lines}
+
+
+# ---------------------------------------------------------------------------
+# CLI: flask bulk import / flask bulk export
+# ---------------------------------------------------------------------------
+
+bulk_cli = AppGroup("bulk", help="Importação e exportação em massa de personagens e missões.")
+
+
+def _guess_format(path, fmt):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+@bulk_cli.command("import")
+@click.argument("path", type=click.Path(dir_okay=False, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(sorted(READERS)), default=None,
+              help="Formato do arquivo; padrão pela extensão (.csv) ou NDJSON.")
+@click.option("--batch-size", type=int, default=BATCH_SIZE, show_default=True)
+def import_command(path, fmt, batch_size):
+    """Importa personagens e missões de um arquivo NDJSON ou CSV ('-' para stdin)."""
+    fmt = _guess_format(path, fmt)
+    with click.open_file(path, "r", encoding="utf-8") as handle:
+        report = import_records(READERS[fmt](handle), batch_size=batch_size)
+    click.echo(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+@bulk_cli.command("export")
+@click.argument("path", type=click.Path(dir_okay=False, allow_dash=True), default="-")
+@click.option("--format", "fmt", type=click.Choice(sorted(WRITERS)), default=None,
+              help="Formato do arquivo; padrão pela extensão (.csv) ou NDJSON.")
+def export_command(path, fmt):
+    """Exporta personagens e missões para NDJSON ou CSV ('-' para stdout)."""
+    fmt = _guess_format(path, fmt)
+    with click.open_file(path, "w", encoding="utf-8") as handle:
+        for chunk in WRITERS[fmt](iter_export_records()):
+            handle.write(chunk)
@@ -0,0 +1,193 @@
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import select, update
+
+from models import db, Character
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependência opcional
+    redis = None
+
+DEFAULT_MAX_ENTRIES = 2048
+# Payloads maiores que isso não são guardados (personagens com milhares de missões)
+DEFAULT_MAX_ENTRY_BYTES = 256 * 1024
+DEFAULT_SHARED_TTL_SECONDS = 3600
+
+
+def bump_character_version(character_id):
+    """
+    Incrementa `Character.version` na transação atual (o commit fica com quem chama).
+
+    Toda escrita que muda o payload de `GET /character/<name>` chama esta
+    função (ou `bump_versions_for`), o que invalida o ETag e as
+    entradas do cache desse personagem.
+    """
+    db.session.execute(
+        update(Character)
+        .where(Character.id == character_id)
+        .values(version=Character.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_versions_for(character_ids):
+    """
+    Incrementa a versão de vários personagens com um único UPDATE (usado nas
+    escritas em massa).
+
+    Args:
+        character_ids (Select): Consulta dos IDs dos personagens afetados.
+    """
+    db.session.execute(
+        update(Character)
+        .where(Character.id.in_(character_ids))
+        .values(version=Character.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def version_statement(name):
+    """
+    Consulta barata (índice único do nome) do ID, da versão e da data da
+    última virada do personagem.
+    """
+    return select(Character.id, Character.version, Character.last_rollover_date).where(Character.name == name)
+
+
+def payload_variant(compact, omit_missions, missions_limit):
+    """Identifica a forma da resposta pedida pelos parâmetros da rota."""
+    variant = "compact" if compact else "full"
+    if omit_missions:
+        return variant + "-nomissions"
+    if missions_limit is not None:
+        return f"{variant}-limit{missions_limit}"
+    return variant
+
+
+def character_etag(character_id, version, variant):
+    """ETag forte de uma versão do payload (sem aspas)."""
+    return f"{character_id}.{version}.{variant}"
+
+
+class LocalBackend:
+    """
+    LRU em memória de bytes por chave; também serve como substituto local
+    do backend compartilhado.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_entry_bytes=DEFAULT_MAX_ENTRY_BYTES):
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """
+    Backend compartilhado entre processos no Redis.
+
+    Falhas do Redis não derrubam a leitura: a consulta cai no banco.
+    """
+
+    def __init__(self, url, ttl=DEFAULT_SHARED_TTL_SECONDS, prefix="character:"):
+        if redis is None:
+            raise RuntimeError("CHARACTER_CACHE_URL requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            return self.client.get(self.prefix + key)
+        except redis.RedisError:
+            return None
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, value, ex=self.ttl)
+        except redis.RedisError:
+            pass
+
+
+class CharacterPayloadCache:
+    """
+    Cache dos payloads serializados de `GET /character/<name>`.
+
+    As chaves incluem a versão do personagem, então uma escrita nunca
+    precisa apagar entradas: a próxima leitura procura a versão nova e as
+    antigas saem pelo LRU (ou pelo TTL do backend compartilhado).
+
+    Attributes:
+        local (LocalBackend): LRU do processo, consultado primeiro.
+        shared: Backend opcional com `get`/`set` (por exemplo `RedisBackend`).
+    """
+
+    def __init__(self, local=None, shared=None):
+        self.local = local or LocalBackend()
+        self.shared = shared
+
+    @staticmethod
+    def key(name, version, variant):
+        return f"{name}:{version}:{variant}"
+
+    def get(self, name, version, variant):
+        """
+        Returns:
+            bytes | None: Corpo JSON guardado para essa versão do personagem.
+        """
+        key = self.key(name, version, variant)
+        body = self.local.get(key)
+        if body is None and self.shared is not None:
+            body = self.shared.get(key)
+            if body is not None:
+                self.local.set(key, body)
+        return body
+
+    def set(self, name, version, variant, body):
+        key = self.key(name, version, variant)
+        self.local.set(key, body)
+        if self.shared is not None:
+            self.shared.set(key, body)
+
+
+character_cache = CharacterPayloadCache()
+
+
+def init_character_cache(app):
+    """
+    Configura o `character_cache` a partir de `app.config`:
+
+        CHARACTER_CACHE_SIZE: entradas do LRU local.
+        CHARACTER_CACHE_URL: URL do backend compartilhado ('redis://...'); sem ela, só o LRU local.
+        CHARACTER_CACHE_TTL: segundos de vida das entradas no backend compartilhado.
+
+    Args:
+        app (Flask): Aplicação.
+    """
+    character_cache.local = LocalBackend(app.config.get("CHARACTER_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+    url = app.config.get("CHARACTER_CACHE_URL")
+    character_cache.shared = RedisBackend(
+        url, ttl=app.config.get("CHARACTER_CACHE_TTL", DEFAULT_SHARED_TTL_SECONDS)
+    ) if url else None
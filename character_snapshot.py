@@ -0,0 +1,112 @@
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, noload
+
+from json_provider import AttributePayload, CompactMissionPayload, MissionPayload
+from models import db, Character, CharacterMission
+from level_curve import DEFAULT_CURVE
+from services import ATTRIBUTE_LABELS, related_attributes
+
+# Colunas da missão usadas no snapshot; `description` fica de fora no modo compacto
+MISSION_COLUMNS = (
+    CharacterMission.id,
+    CharacterMission.character_id,
+    CharacterMission.title,
+    CharacterMission.xp_reward,
+    CharacterMission.difficulty,
+    CharacterMission.strength,
+    CharacterMission.discipline,
+    CharacterMission.health,
+    CharacterMission.intelligence,
+    CharacterMission.completed,
+)
+
+
+def snapshot_statement(name, compact=False, include_missions=True):
+    """
+    Monta a consulta de `load_character_snapshot`; o resultado precisa de
+    `.unique()` por causa do JOIN com as missões.
+    """
+    if include_missions:
+        columns = MISSION_COLUMNS if compact else MISSION_COLUMNS + (CharacterMission.description,)
+        missions_option = joinedload(Character.missions).load_only(*columns)
+    else:
+        missions_option = noload(Character.missions)
+    return select(Character).options(
+        joinedload(Character.attributes),
+        missions_option
+    ).where(Character.name == name)
+
+
+def load_character_snapshot(name, compact=False, include_missions=True):
+    """
+    Carrega personagem, atributos e missões em um único round-trip.
+
+    Os dois relacionamentos são carregados via JOIN na mesma consulta
+    (`attributes` é um-para-um, então o JOIN não multiplica as linhas).
+
+    Args:
+        name (str): Nome do personagem.
+        compact (bool): Se True, não carrega a coluna `description` das missões.
+        include_missions (bool): Se False, as missões não são carregadas.
+
+    Returns:
+        Character | None: Personagem com os relacionamentos já carregados.
+    """
+    return db.session.execute(
+        snapshot_statement(name, compact, include_missions)
+    ).unique().scalar_one_or_none()
+
+
+def serialize_character(character, compact=False, missions=None, attribute_xp=None):
+    """
+    Serializa o snapshot do personagem no formato de `GET /character/<name>`.
+
+    Args:
+        character (Character): Personagem carregado por `load_character_snapshot`.
+        compact (bool): Se True, omite `description` das missões.
+        missions (iterable, opcional): Missões a embutir no lugar de
+            `character.missions` (por exemplo, só a primeira página).
+        attribute_xp (dict, opcional): XP por atributo a usar no lugar do
+            gravado (com o XP pendente do `xp_buffer`); os níveis são recalculados.
+
+    Returns:
+        dict: Payload pronto para `jsonify`; missões e atributos são formatos
+            de `json_provider`.
+    """
+    attributes = character.attributes
+    missions_data = []
+    for mission in (character.missions if missions is None else missions):
+        related = related_attributes(
+            mission.strength, mission.discipline, mission.health, mission.intelligence
+        )
+        if compact:
+            missions_data.append(CompactMissionPayload(
+                mission.title, mission.xp_reward, mission.difficulty, related, mission.completed
+            ))
+        else:
+            missions_data.append(MissionPayload(
+                mission.title, mission.xp_reward, mission.difficulty, related, mission.completed,
+                mission.description
+            ))
+
+    if attribute_xp is None:
+        attributes_data = {
+            "Força": AttributePayload(attributes.strength_xp, attributes.strength_level),
+            "Disciplina": AttributePayload(attributes.discipline_xp, attributes.discipline_level),
+            "Saúde": AttributePayload(attributes.health_xp, attributes.health_level),
+            "Inteligência": AttributePayload(attributes.intelligence_xp, attributes.intelligence_level),
+        }
+        total_level = attributes.total_level
+    else:
+        attributes_data = {
+            label: AttributePayload(attribute_xp[attr], DEFAULT_CURVE.level_for(attribute_xp[attr])[0])
+            for attr, label in ATTRIBUTE_LABELS
+        }
+        total_level = sum(payload.level for payload in attributes_data.values())
+
+    return {
+        "name": character.name,
+        "attributes": attributes_data,
+        "total_level": total_level,
+        "missions": missions_data
+    }
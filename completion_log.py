@@ -0,0 +1,216 @@
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select
+
+from models import db, dialect_insert, CompletionDaily, CompletionWeekly, MissionCompletion
+from services import ATTRIBUTE_LABELS
+from sharding import fan_out
+
+ATTRIBUTES = tuple(attr for attr, _ in ATTRIBUTE_LABELS)
+XP_COLUMNS = tuple(f"{attr}_xp" for attr in ATTRIBUTES)
+
+DEFAULT_RETENTION_DAYS = 90
+COMPACT_BATCH_SIZE = 10000
+MAX_HISTORY_DAYS = 366
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def week_start(day):
+    """Segunda-feira da semana de `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def _upsert_increment(model, key, increments):
+    """
+    Soma `increments` à linha de `key` no rollup, criando a linha se preciso,
+    com um único INSERT ... ON CONFLICT DO UPDATE.
+    """
+    stmt = dialect_insert(model).values(dict(key, **increments))
+    return stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in increments}
+    )
+
+
+def record_completions(character_id, completions, completed_at=None):
+    """
+    Grava os eventos de conclusão e atualiza os rollups diário e semanal,
+    na transação atual (o commit fica com quem chama).
+
+    São três instruções por chamada, independentemente do número de
+    missões: um INSERT de várias linhas no log e um upsert em cada rollup.
+
+    Args:
+        character_id (int): ID do personagem.
+        completions (list): Pares (mission_id, XP concedido por atributo).
+        completed_at (datetime, opcional): Momento (UTC) da conclusão; padrão agora.
+    """
+    if not completions:
+        return
+    completed_at = completed_at or _now()
+
+    rows = []
+    totals = dict.fromkeys(XP_COLUMNS, 0)
+    for mission_id, xp_by_attribute in completions:
+        row = {"character_id": character_id, "mission_id": mission_id, "completed_at": completed_at}
+        for attr, column in zip(ATTRIBUTES, XP_COLUMNS):
+            xp = xp_by_attribute.get(attr, 0)
+            row[column] = xp
+            totals[column] += xp
+        rows.append(row)
+    db.session.execute(insert(MissionCompletion).values(rows))
+
+    increments = dict(totals, missions=len(rows))
+    day = completed_at.date()
+    db.session.execute(_upsert_increment(CompletionDaily, {"character_id": character_id, "day": day}, increments))
+    db.session.execute(_upsert_increment(
+        CompletionWeekly, {"character_id": character_id, "week_start": week_start(day)}, increments
+    ))
+
+
+def _rollup_entry(period_start, row):
+    return {
+        "start": period_start.isoformat(),
+        "missions": row.missions,
+        "xp": {attr: getattr(row, column) for attr, column in zip(ATTRIBUTES, XP_COLUMNS)},
+        "total_xp": sum(getattr(row, column) for column in XP_COLUMNS),
+    }
+
+
+def xp_history(character_id, period="day", days=30, today=None):
+    """
+    XP e missões por dia ou por semana, lidos dos rollups.
+
+    Só períodos com alguma conclusão aparecem.
+
+    Args:
+        character_id (int): ID do personagem.
+        period (str): 'day' ou 'week'.
+        days (int): Quantos dias para trás (incluindo hoje).
+        today (date, opcional): Dia de referência (UTC); padrão hoje.
+
+    Returns:
+        list: Entradas {start, missions, xp, total_xp} em ordem cronológica.
+    """
+    today = today or _now().date()
+    since = today - timedelta(days=days - 1)
+    if period == "week":
+        model, column, since = CompletionWeekly, CompletionWeekly.week_start, week_start(since)
+    else:
+        model, column = CompletionDaily, CompletionDaily.day
+
+    rows = db.session.execute(
+        select(model).where(model.character_id == character_id, column >= since, column <= today).order_by(column)
+    ).scalars()
+    return [_rollup_entry(getattr(row, column.key), row) for row in rows]
+
+
+def streak_calendar(character_id, days=90, today=None):
+    """
+    Dias com conclusões e sequências de dias ativos, lidos do rollup diário.
+
+    `current_streak` conta os dias seguidos até hoje (ou até ontem, se hoje
+    ainda não houve conclusão); `longest_streak` é a maior sequência no intervalo.
+
+    Args:
+        character_id (int): ID do personagem.
+        days (int): Quantos dias para trás (incluindo hoje).
+        today (date, opcional): Dia de referência (UTC); padrão hoje.
+
+    Returns:
+        dict: {days: {data: missões}, current_streak, longest_streak}
+    """
+    today = today or _now().date()
+    since = today - timedelta(days=days - 1)
+    rows = db.session.execute(
+        select(CompletionDaily.day, CompletionDaily.missions)
+        .where(
+            CompletionDaily.character_id == character_id,
+            CompletionDaily.day >= since,
+            CompletionDaily.day <= today,
+            CompletionDaily.missions > 0
+        )
+        .order_by(CompletionDaily.day)
+    ).all()
+
+    longest = run = 0
+    previous = None
+    for day, _ in rows:
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    current = 0
+    if previous is not None and today - previous <= timedelta(days=1):
+        current = run
+
+    return {
+        "days": {day.isoformat(): missions for day, missions in rows},
+        "current_streak": current,
+        "longest_streak": longest,
+    }
+
+
+def compact_events(retention_days=DEFAULT_RETENTION_DAYS, daily_retention_days=None,
+                   batch_size=COMPACT_BATCH_SIZE, now=None):
+    """
+    Remove eventos brutos mais antigos que a retenção, em lotes com commit
+    próprio (para não segurar locks nem crescer o log de transações).
+
+    Os totais continuam nos rollups. Com `daily_retention_days`, linhas
+    diárias mais antigas também são removidas, restando só as semanais.
+
+    Args:
+        retention_days (int): Dias de eventos brutos mantidos.
+        daily_retention_days (int, opcional): Dias de rollup diário mantidos.
+        batch_size (int): Eventos removidos por transação.
+        now (datetime, opcional): Momento de referência (UTC).
+
+    Returns:
+        dict: Eventos e linhas diárias removidos.
+    """
+    now = now or _now()
+    cutoff = now - timedelta(days=retention_days)
+    report = {"events": 0, "daily_rows": 0}
+
+    while True:
+        ids = select(MissionCompletion.id).where(MissionCompletion.completed_at < cutoff).limit(batch_size)
+        deleted = db.session.execute(
+            delete(MissionCompletion)
+            .where(MissionCompletion.id.in_(ids.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        report["events"] += deleted
+        if deleted < batch_size:
+            break
+
+    if daily_retention_days is not None:
+        report["daily_rows"] = db.session.execute(
+            delete(CompletionDaily)
+            .where(CompletionDaily.day < (now - timedelta(days=daily_retention_days)).date())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+    return report
+
+
+completions_cli = AppGroup("completions", help="Log de conclusões de missões e seus rollups.")
+
+
+@completions_cli.command("compact")
+@click.option("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS, show_default=True,
+              help="Dias de eventos brutos mantidos.")
+@click.option("--daily-retention-days", type=int, default=None,
+              help="Se informado, remove também linhas diárias mais antigas (as semanais ficam).")
+@click.option("--batch-size", type=int, default=COMPACT_BATCH_SIZE, show_default=True)
+def compact_command(retention_days, daily_retention_days, batch_size):
+    """Remove eventos antigos do log, mantendo os rollups (em todos os shards)."""
+    reports = fan_out(lambda shard: compact_events(retention_days, daily_retention_days, max(batch_size, 1)))
+    report = {key: sum(shard_report[key] for shard_report in reports.values()) for key in ("events", "daily_rows")}
+    click.echo(f"removed {report['events']} events and {report['daily_rows']} daily rows")
@@ -0,0 +1,370 @@
+import logging
+import os
+import uuid
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, SingletonThreadPool, StaticPool
+
+load_dotenv()
+
+# Presets por ambiente; qualquer valor pode ser sobrescrito pelas variáveis de ENV_OVERRIDES
+PRESETS = {
+    "development": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 0,
+        "pgbouncer_transaction_mode": False,
+        "query_cache_size": 500,
+        "pool_class": "queue",
+        "default_database_uri": "sqlite:///character_data.db",
+    },
+    "production": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 10,
+        # Abaixo do timeout de conexões ociosas do pooler do Supabase
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 5000,
+        "pgbouncer_transaction_mode": False,
+        "query_cache_size": 1000,
+        "pool_class": "queue",
+        "default_database_uri": None,
+    },
+    "test": {
+        "pool_size": 2,
+        "max_overflow": 0,
+        "pool_timeout": 5,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 0,
+        "pgbouncer_transaction_mode": False,
+        "query_cache_size": 500,
+        "pool_class": "static",
+        "default_database_uri": "sqlite://",
+    },
+}
+
+ENV_OVERRIDES = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", int),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", "bool"),
+    "statement_timeout_ms": ("DB_STATEMENT_TIMEOUT_MS", int),
+    "pgbouncer_transaction_mode": ("DB_PGBOUNCER_TRANSACTION_MODE", "bool"),
+    "query_cache_size": ("DB_QUERY_CACHE_SIZE", int),
+    "pool_class": ("DB_POOL_CLASS", str),
+}
+
+POOL_CLASSES = {
+    "queue": QueuePool,
+    "null": NullPool,
+    "static": StaticPool,
+    "singleton": SingletonThreadPool,
+}
+
+# Equivalentes para o engine assíncrono (o QueuePool síncrono não serve ao asyncio)
+ASYNC_POOL_CLASSES = {
+    "queue": AsyncAdaptedQueuePool,
+    "null": NullPool,
+    "static": StaticPool,
+    "singleton": StaticPool,
+}
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def _parse_bool(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+REPLICA_BIND_PREFIX = "replica_"
+# O shard 0 é o banco padrão; os demais viram binds shard_1, shard_2...
+SHARD_BIND_PREFIX = "shard_"
+
+
+def _split_uris(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return [uri.strip() for uri in value or () if uri and uri.strip()]
+
+
+def load_database_settings(environment=None, environ=None, database_uri=None, replica_uris=None, shard_uris=None):
+    """
+    Monta as configurações de banco a partir do preset do ambiente e das
+    variáveis de ambiente (já carregadas do `.env`).
+
+    Args:
+        environment (str, opcional): 'development', 'production' ou 'test';
+            por padrão lê `APP_ENV` (e usa 'development' se ausente).
+        environ (dict, opcional): Variáveis de ambiente; padrão `os.environ`.
+        database_uri (str, opcional): URI explícita, com prioridade sobre o ambiente.
+        replica_uris (list | str, opcional): URIs das réplicas de leitura, com
+            prioridade sobre `SUPABASE_REPLICA_URLS` (separadas por vírgula).
+        shard_uris (list | str, opcional): URIs dos shards além do banco
+            padrão, com prioridade sobre `SUPABASE_SHARD_URLS`.
+
+    Returns:
+        dict: Configurações efetivas, incluindo 'environment', 'database_uri',
+            'replica_uris' e 'shard_uris'.
+    """
+    environ = os.environ if environ is None else environ
+    environment = environment or environ.get("APP_ENV", "development")
+    if environment not in PRESETS:
+        raise ValueError(f"Unknown APP_ENV '{environment}', expected one of {sorted(PRESETS)}")
+
+    settings = dict(PRESETS[environment])
+    for key, (variable, kind) in ENV_OVERRIDES.items():
+        raw = environ.get(variable)
+        if raw is None or raw == "":
+            continue
+        settings[key] = _parse_bool(raw) if kind == "bool" else kind(raw)
+
+    if settings["pool_class"] not in POOL_CLASSES:
+        raise ValueError(f"Unknown DB_POOL_CLASS '{settings['pool_class']}'")
+
+    default_database_uri = settings.pop("default_database_uri")
+    database_uri = database_uri or environ.get("SUPABASE_CONNECTION_URL") or default_database_uri
+    if not database_uri:
+        raise RuntimeError("SUPABASE_CONNECTION_URL must be set for the production environment")
+
+    settings["environment"] = environment
+    settings["database_uri"] = database_uri
+    settings["replica_uris"] = _split_uris(replica_uris or environ.get("SUPABASE_REPLICA_URLS"))
+    settings["shard_uris"] = _split_uris(shard_uris or environ.get("SUPABASE_SHARD_URLS"))
+    if settings["replica_uris"] and settings["shard_uris"]:
+        raise ValueError("Read replicas are not supported together with shards")
+    return settings
+
+
+def replica_binds(settings):
+    """
+    Chaves de `SQLALCHEMY_BINDS` das réplicas, na ordem configurada.
+
+    Args:
+        settings (dict): Resultado de `load_database_settings`.
+
+    Returns:
+        dict: {chave do bind: URI}, por exemplo {'replica_1': 'postgresql://...'}.
+    """
+    return {
+        f"{REPLICA_BIND_PREFIX}{i}": uri for i, uri in enumerate(settings.get("replica_uris", ()), 1)
+    }
+
+
+def shard_binds(settings):
+    """
+    Chaves de `SQLALCHEMY_BINDS` dos shards além do banco padrão (o shard 0).
+
+    A ordem define os nomes, então shards novos devem entrar no fim da lista.
+
+    Args:
+        settings (dict): Resultado de `load_database_settings`.
+
+    Returns:
+        dict: {chave do bind: URI}, por exemplo {'shard_1': 'postgresql://...'}.
+    """
+    return {
+        f"{SHARD_BIND_PREFIX}{i}": uri for i, uri in enumerate(settings.get("shard_uris", ()), 1)
+    }
+
+
+def engine_options(settings):
+    """
+    Converte as configurações em `SQLALCHEMY_ENGINE_OPTIONS`.
+
+    Opções de pool só valem para `QueuePool`. O statement_timeout vai como
+    parâmetro de conexão, exceto no modo de transaction pooling do PgBouncer,
+    que não repassa parâmetros de sessão: nesse caso é aplicado por transação
+    em `install_engine_hooks`.
+
+    Args:
+        settings (dict): Resultado de `load_database_settings`.
+
+    Returns:
+        dict: Argumentos para `create_engine`.
+    """
+    url = make_url(settings["database_uri"])
+    pool_class = POOL_CLASSES[settings["pool_class"]]
+    options = {
+        "poolclass": pool_class,
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "query_cache_size": settings["query_cache_size"],
+    }
+
+    if pool_class is QueuePool:
+        options.update(
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_recycle=settings["pool_recycle"],
+        )
+
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        if settings["statement_timeout_ms"] and not settings["pgbouncer_transaction_mode"]:
+            connect_args["options"] = f"-c statement_timeout={settings['statement_timeout_ms']}"
+        if settings["pgbouncer_transaction_mode"] and url.get_driver_name() == "psycopg":
+            # Prepared statements do servidor não sobrevivem à troca de conexão do PgBouncer
+            connect_args["prepare_threshold"] = None
+    elif url.get_backend_name() == "sqlite" and pool_class is StaticPool:
+        connect_args["check_same_thread"] = False
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def async_database_uri(database_uri):
+    """
+    Converte a URI do banco para o driver assíncrono equivalente
+    (asyncpg para PostgreSQL, aiosqlite para SQLite).
+
+    O asyncpg não entende `sslmode`; o valor vai no parâmetro `ssl`.
+
+    Args:
+        database_uri (str): URI usada pelo engine síncrono.
+
+    Returns:
+        str: URI para `create_async_engine`.
+    """
+    url = make_url(database_uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == "postgresql" and "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url.render_as_string(hide_password=False)
+
+
+def async_engine_options(settings):
+    """
+    Equivalente de `engine_options` para o engine assíncrono.
+
+    No asyncpg o statement_timeout vai em `server_settings`; no modo de
+    transaction pooling do PgBouncer o cache de prepared statements é
+    desligado e os nomes gerados são únicos, pois a conexão do servidor muda
+    a cada transação.
+
+    Args:
+        settings (dict): Resultado de `load_database_settings`.
+
+    Returns:
+        dict: Argumentos para `create_async_engine`.
+    """
+    url = make_url(settings["database_uri"])
+    pool_class = ASYNC_POOL_CLASSES[settings["pool_class"]]
+    options = {
+        "poolclass": pool_class,
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "query_cache_size": settings["query_cache_size"],
+    }
+
+    if pool_class is AsyncAdaptedQueuePool:
+        options.update(
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_recycle=settings["pool_recycle"],
+        )
+
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        if settings["statement_timeout_ms"] and not settings["pgbouncer_transaction_mode"]:
+            connect_args["server_settings"] = {"statement_timeout": str(settings["statement_timeout_ms"])}
+        if settings["pgbouncer_transaction_mode"]:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    elif url.get_backend_name() == "sqlite" and pool_class is StaticPool:
+        connect_args["check_same_thread"] = False
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def install_engine_hooks(engine, settings):
+    """
+    Registra no engine os ajustes que dependem de eventos de conexão.
+
+    Args:
+        engine (Engine): Engine criado pelo Flask-SQLAlchemy.
+        settings (dict): Resultado de `load_database_settings`.
+    """
+    timeout = settings["statement_timeout_ms"]
+    if timeout and settings["pgbouncer_transaction_mode"] and engine.dialect.name == "postgresql":
+        @event.listens_for(engine, "begin")
+        def _set_local_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+def describe_settings(settings):
+    """
+    Retorna as configurações efetivas com a senha da URL mascarada, para log.
+    """
+    described = dict(settings)
+    described["database_uri"] = make_url(settings["database_uri"]).render_as_string(hide_password=True)
+    for key in ("replica_uris", "shard_uris"):
+        described[key] = [make_url(uri).render_as_string(hide_password=True) for uri in settings.get(key, ())]
+    return described
+
+
+def init_database(app, db, environment=None):
+    """
+    Configura o app com as opções de banco do ambiente, inicializa o `db`,
+    instala os hooks do engine e registra no log as configurações efetivas.
+
+    Um `SQLALCHEMY_DATABASE_URI` já presente em `app.config` tem prioridade
+    sobre `SUPABASE_CONNECTION_URL`, e `DATABASE_REPLICA_URIS` sobre
+    `SUPABASE_REPLICA_URLS` e `SHARD_URIS` sobre `SUPABASE_SHARD_URLS`. Cada
+    réplica ou shard vira um bind (ver `replica_binds` e `shard_binds`) com
+    as mesmas opções de engine do banco padrão; o roteamento fica em
+    `db_routing` e `sharding`.
+
+    Args:
+        app (Flask): Aplicação.
+        db (SQLAlchemy): Extensão do Flask-SQLAlchemy.
+        environment (str, opcional): Preset a usar; padrão `APP_ENV` do config ou do ambiente.
+
+    Returns:
+        dict: Configurações efetivas.
+    """
+    settings = load_database_settings(
+        environment or app.config.get("APP_ENV"),
+        database_uri=app.config.get("SQLALCHEMY_DATABASE_URI"),
+        replica_uris=app.config.get("DATABASE_REPLICA_URIS"),
+        shard_uris=app.config.get("SHARD_URIS")
+    )
+    app.config["SQLALCHEMY_DATABASE_URI"] = settings["database_uri"]
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(settings)
+    app.config["DATABASE_SETTINGS"] = settings
+
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for key, uri in {**replica_binds(settings), **shard_binds(settings)}.items():
+        binds[key] = dict(engine_options(dict(settings, database_uri=uri)), url=uri)
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_engine_hooks(engine, settings)
+
+    # Sem nível configurado o logger herda WARNING do root e o log abaixo sumiria
+    if app.logger.level == logging.NOTSET:
+        app.logger.setLevel(logging.INFO)
+    app.logger.info("Database settings: %s", describe_settings(settings))
+    return settings
@@ -0,0 +1,255 @@
+from datetime import timedelta
+
+from sqlalchemy import case, func, or_, select, update
+
+from models import db, utc_today, Character, CharacterMission
+from services import XP_BY_DIFFICULTY, DEFAULT_XP
+
+
+def _xp_reward_case():
+    """
+    Monta o CASE que re-deriva o `xp_reward` a partir da dificuldade,
+    espelhando `get_xp_by_difficulty` dentro do próprio banco.
+    """
+    return case(XP_BY_DIFFICULTY, value=CharacterMission.difficulty, else_=DEFAULT_XP)
+
+
+def _in_range(stmt, key, lower_id, upper_id):
+    if lower_id is not None:
+        stmt = stmt.where(key >= lower_id)
+    if upper_id is not None:
+        stmt = stmt.where(key <= upper_id)
+    return stmt
+
+
+def _rollover_values(days):
+    """
+    Valores das missões após `days` viradas seguidas.
+
+    Na primeira virada, missões completadas ganham +1 de streak e as demais
+    voltam a 0; como todas ficam não completadas, qualquer virada a mais
+    zera o streak. O XP é recalculado pela dificuldade.
+    """
+    if days == 1:
+        streak = case(
+            (CharacterMission.completed == True, func.coalesce(CharacterMission.streak, 0) + 1),
+            else_=0
+        )
+    else:
+        streak = 0
+    return {"streak": streak, "xp_reward": _xp_reward_case(), "completed": False}
+
+
+# ---------------------------------------------------------------------------
+# Virada preguiçosa: aplicada a um personagem no primeiro acesso do dia
+# ---------------------------------------------------------------------------
+
+def rollover_gap(last_rollover_date, today=None):
+    """Viradas pendentes do personagem (0 se já está em dia)."""
+    return max(((today or utc_today()) - last_rollover_date).days, 0)
+
+
+def claim_rollover_statement(character_id, last_rollover_date, today):
+    """
+    UPDATE condicional que marca a virada do personagem como aplicada.
+
+    Só afeta a linha se `last_rollover_date` ainda for o valor lido, então
+    entre duas requisições simultâneas só uma aplica a virada. Retorna a
+    nova versão do personagem (nenhuma linha se outra requisição já aplicou).
+    """
+    return (
+        update(Character)
+        .where(Character.id == character_id, Character.last_rollover_date == last_rollover_date)
+        .values(last_rollover_date=today, version=Character.version + 1)
+        .returning(Character.version)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def character_rollover_statement(character_id, days):
+    """UPDATE das missões de um personagem após `days` viradas."""
+    return (
+        update(CharacterMission)
+        .where(CharacterMission.character_id == character_id)
+        .values(**_rollover_values(days))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def catch_up_character(character_id, last_rollover_date, today=None):
+    """
+    Aplica as viradas que o personagem perdeu desde `last_rollover_date`,
+    só às missões dele, e faz commit.
+
+    Chamada pelas rotas do personagem antes de ler ou escrever as missões,
+    então um personagem inativo não custa nada até voltar; uma ausência de
+    vários dias é aplicada de uma vez (ver `_rollover_values`).
+
+    Args:
+        character_id (int): ID do personagem.
+        last_rollover_date (date): Valor lido de `Character.last_rollover_date`.
+        today (date, opcional): Dia atual (UTC).
+
+    Returns:
+        int | None: Nova versão do personagem, ou None se não havia virada
+            pendente ou se outra requisição a aplicou.
+    """
+    today = today or utc_today()
+    days = rollover_gap(last_rollover_date, today)
+    if not days:
+        return None
+
+    version = db.session.execute(claim_rollover_statement(character_id, last_rollover_date, today)).scalar()
+    if version is None:
+        db.session.rollback()
+        return None
+    db.session.execute(character_rollover_statement(character_id, days))
+    db.session.commit()
+    return version
+
+
+# ---------------------------------------------------------------------------
+# Varredura: personagens que não foram acessados desde a última virada
+# ---------------------------------------------------------------------------
+
+def _pending_characters(run_date, lower_id=None, upper_id=None, *criteria):
+    """
+    Personagens do intervalo ainda não virados em `run_date` e com missões
+    que a virada altera (completadas ou com streak).
+
+    Um personagem sem nenhuma dessas missões já está no estado final de
+    qualquer sequência de viradas, então a varredura o ignora; se ele voltar,
+    `catch_up_character` aplica a virada no primeiro acesso.
+    """
+    with_state = _in_range(
+        select(CharacterMission.character_id)
+        .where(or_(CharacterMission.completed == True, CharacterMission.streak > 0)),
+        CharacterMission.character_id, lower_id, upper_id
+    )
+    return select(Character.id).where(
+        Character.id.in_(with_state), Character.last_rollover_date < run_date, *criteria
+    )
+
+
+def _count_outcomes(run_date, lower_id=None, upper_id=None):
+    """
+    Conta, antes do UPDATE, quantas missões dos personagens pendentes terão o
+    streak incrementado e quantas terão o streak zerado.
+
+    Returns:
+        tuple: (streaks incrementados, streaks zerados)
+    """
+    total, incremented = db.session.execute(
+        select(
+            func.count(CharacterMission.id),
+            func.coalesce(func.sum(case((
+                (CharacterMission.completed == True)
+                & (Character.last_rollover_date == run_date - timedelta(days=1)), 1
+            ), else_=0)), 0)
+        )
+        .join(Character, Character.id == CharacterMission.character_id)
+        .where(Character.id.in_(_pending_characters(run_date, lower_id, upper_id)))
+    ).one()
+    return incremented, total - incremented
+
+
+def rollover_range(lower_id=None, upper_id=None, run_date=None):
+    """
+    Aplica a virada de `run_date` a uma faixa de IDs de personagem, sem
+    fazer commit.
+
+    Só personagens pendentes (ver `_pending_characters`) são alterados, então
+    o custo acompanha os personagens ativos e não o total de missões. A
+    versão desses personagens é incrementada primeiro, o que também trava as
+    linhas até o commit: uma `catch_up_character` simultânea espera e depois
+    encontra a virada já aplicada.
+
+    Args:
+        lower_id (int, opcional): Menor ID de personagem incluído.
+        upper_id (int, opcional): Maior ID de personagem incluído.
+        run_date (date, opcional): Dia da virada; padrão hoje (UTC).
+
+    Returns:
+        tuple: (streaks incrementados, streaks zerados)
+    """
+    run_date = run_date or utc_today()
+    yesterday = run_date - timedelta(days=1)
+
+    locked = db.session.execute(
+        update(Character)
+        .where(Character.id.in_(_pending_characters(run_date, lower_id, upper_id)))
+        .values(version=Character.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not locked:
+        return 0, 0
+
+    incremented, reset = _count_outcomes(run_date, lower_id, upper_id)
+    # A data da última virada separa quem perdeu mais de um dia (streak zerado) de quem virou ontem
+    for criteria, days in (
+        (Character.last_rollover_date < yesterday, 2),
+        (Character.last_rollover_date == yesterday, 1),
+    ):
+        db.session.execute(
+            update(CharacterMission)
+            .where(CharacterMission.character_id.in_(_pending_characters(run_date, lower_id, upper_id, criteria)))
+            .values(**_rollover_values(days))
+            .execution_options(synchronize_session=False)
+        )
+
+    # Quem ficou sem missões completadas ou com streak já está no estado
+    # final e pode continuar com a data antiga (ver `_pending_characters`)
+    db.session.execute(
+        update(Character)
+        .where(Character.id.in_(_pending_characters(run_date, lower_id, upper_id)))
+        .values(last_rollover_date=run_date)
+        .execution_options(synchronize_session=False)
+    )
+    return incremented, reset
+
+
+def run_daily_update(chunk_size=None, run_date=None):
+    """
+    Varre os personagens não acessados desde a última virada e aplica a
+    virada às suas missões com UPDATEs em massa.
+
+    Personagens acessados no dia já foram virados por `catch_up_character`,
+    então a varredura é opcional: ela só adianta o trabalho dos demais.
+
+    Sem `chunk_size`, tudo roda em uma única transação. Com `chunk_size`, os
+    personagens são percorridos por faixas de ID e cada faixa é confirmada
+    separadamente, mantendo transações e locks curtos.
+
+    Args:
+        chunk_size (int, opcional): Quantidade de IDs de personagem por faixa.
+        run_date (date, opcional): Dia da virada; padrão hoje (UTC).
+
+    Returns:
+        dict: Contagem de missões por resultado
+            ('missions', 'streak_incremented', 'streak_reset', 'chunks').
+    """
+    summary = {"missions": 0, "streak_incremented": 0, "streak_reset": 0, "chunks": 0}
+
+    if not chunk_size:
+        ranges = [(None, None)]
+    else:
+        min_id, max_id = db.session.execute(
+            select(func.min(CharacterMission.character_id), func.max(CharacterMission.character_id))
+        ).one()
+        if min_id is None:
+            return summary
+        ranges = [
+            (lower, min(lower + chunk_size - 1, max_id))
+            for lower in range(min_id, max_id + 1, chunk_size)
+        ]
+
+    for lower_id, upper_id in ranges:
+        incremented, reset = rollover_range(lower_id, upper_id, run_date)
+        db.session.commit()
+
+        summary["streak_incremented"] += incremented
+        summary["streak_reset"] += reset
+        summary["missions"] += incremented + reset
+        summary["chunks"] += 1
+
+    return summary
@@ -0,0 +1,265 @@
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.sql.expression import UpdateBase
+
+DEFAULT_RETRY_SECONDS = 30
+DEFAULT_READ_YOUR_WRITES_SECONDS = 5
+
+# Marca de escrita recente: o cliente reenvia o cookie ou, sem cookies, o cabeçalho
+READ_YOUR_WRITES_COOKIE = "read_your_writes"
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+ROUTE_PRIMARY = "primary"
+ROUTE_REPLICA = "replica"
+
+# Chaves em `Session.info`
+_ROUTE = "db_route"
+_REPLICA = "db_replica"
+_PENDING_WRITE = "db_pending_write"
+_COMMITTED_WRITE = "db_committed_write"
+_PINNED = "db_pinned_bind"
+
+# Erros de um engine que tiram a réplica da rotação
+_REPLICA_ERRORS = (OperationalError, InterfaceError)
+
+
+class ReplicaRouter:
+    """
+    Escolhe a réplica de cada requisição de leitura, em round-robin entre as
+    saudáveis, e conta as decisões para o `/metrics`.
+
+    Uma réplica com erro de conexão fica fora da rotação por
+    `retry_seconds`; depois volta a receber requisições e a primeira que
+    falhar a tira de novo. Sem réplica saudável as leituras vão ao primário.
+
+    Attributes:
+        bind_keys (tuple): Chaves de `SQLALCHEMY_BINDS` das réplicas.
+        retry_seconds (float): Tempo fora da rotação após uma falha.
+        read_your_writes_seconds (float): Tempo em que um cliente que
+            escreveu lê do primário.
+    """
+
+    def __init__(self, bind_keys=(), retry_seconds=DEFAULT_RETRY_SECONDS,
+                 read_your_writes_seconds=DEFAULT_READ_YOUR_WRITES_SECONDS):
+        self._lock = threading.Lock()
+        self.configure(bind_keys, retry_seconds, read_your_writes_seconds)
+
+    def configure(self, bind_keys, retry_seconds=DEFAULT_RETRY_SECONDS,
+                  read_your_writes_seconds=DEFAULT_READ_YOUR_WRITES_SECONDS):
+        with self._lock:
+            self.bind_keys = tuple(bind_keys)
+            self.retry_seconds = retry_seconds
+            self.read_your_writes_seconds = read_your_writes_seconds
+            self._next = 0
+            self._down_until = {}
+            self._routes = {}
+            self._failures = dict.fromkeys(self.bind_keys, 0)
+            self._fallbacks = dict.fromkeys(self.bind_keys, 0)
+
+    @property
+    def enabled(self):
+        return bool(self.bind_keys)
+
+    def pick(self):
+        """
+        Returns:
+            str | None: Chave da próxima réplica saudável, ou None se não há.
+        """
+        now = time.monotonic()
+        with self._lock:
+            count = len(self.bind_keys)
+            for offset in range(count):
+                index = (self._next + offset) % count
+                key = self.bind_keys[index]
+                if self._down_until.get(key, 0) <= now:
+                    self._next = (index + 1) % count
+                    return key
+        return None
+
+    def mark_down(self, key):
+        with self._lock:
+            self._down_until[key] = time.monotonic() + self.retry_seconds
+            self._failures[key] = self._failures.get(key, 0) + 1
+
+    def is_down(self, key):
+        with self._lock:
+            return self._down_until.get(key, 0) > time.monotonic()
+
+    def record_route(self, route, reason):
+        with self._lock:
+            self._routes[(route, reason)] = self._routes.get((route, reason), 0) + 1
+
+    def record_fallback(self, key):
+        with self._lock:
+            self._fallbacks[key] = self._fallbacks.get(key, 0) + 1
+
+    def collect(self, lines):
+        """Acrescenta as métricas de roteamento (ver `MetricsRegistry.add_collector`)."""
+        from instrumentation import _counter, _labels
+
+        now = time.monotonic()
+        with self._lock:
+            routes = sorted(self._routes.items())
+            up = [(key, int(self._down_until.get(key, 0) <= now)) for key in self.bind_keys]
+            failures = sorted(self._failures.items())
+            fallbacks = sorted(self._fallbacks.items())
+
+        _counter(lines, "db_route_requests_total", "Read-only requests by chosen database route and reason.",
+                 [(_labels(route=route, reason=reason), count) for (route, reason), count in routes])
+        _counter(lines, "db_replica_up", "Whether the replica is in the read rotation.",
+                 [(_labels(bind=key), value) for key, value in up], kind="gauge")
+        _counter(lines, "db_replica_failures_total", "Errors that took the replica out of the rotation.",
+                 [(_labels(bind=key), count) for key, count in failures])
+        _counter(lines, "db_replica_fallbacks_total", "Requests retried on the primary after a replica error.",
+                 [(_labels(bind=key), count) for key, count in fallbacks])
+
+
+replica_router = ReplicaRouter()
+
+
+def _is_write(clause):
+    return isinstance(clause, UpdateBase) or getattr(clause, "_for_update_arg", None) is not None
+
+
+class RoutingSession(Session):
+    """
+    Sessão do Flask-SQLAlchemy que manda as leituras das rotas marcadas com
+    `replica_reads` para a réplica escolhida no início da requisição.
+
+    Qualquer escrita (flush do ORM, INSERT/UPDATE/DELETE ou SELECT ... FOR
+    UPDATE) vai ao primário e fixa nele o resto da requisição, então o que
+    a requisição escreveu (por exemplo a virada preguiçosa de um GET) ela
+    mesma lê. Sem a marca, tudo vai ao primário, como antes.
+
+    Uma sessão fixada com `pin_session` (o shard de um personagem) usa só
+    aquele bind.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _PINNED in self.info:
+            return self._db.engines[self.info[_PINNED]]
+        if bind is None and replica_router.enabled:
+            if self._flushing or _is_write(clause):
+                self.info[_PENDING_WRITE] = True
+                if self.info.get(_ROUTE) == ROUTE_REPLICA:
+                    self.info[_ROUTE] = ROUTE_PRIMARY
+                    replica_router.record_route(ROUTE_PRIMARY, "write")
+            elif self.info.get(_ROUTE) == ROUTE_REPLICA:
+                return self._db.engines[self.info[_REPLICA]]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def pin_session(session, bind_key):
+    """
+    Fixa todas as consultas da sessão em um bind (None é o banco padrão)
+    até a sessão ser descartada, no fim do contexto da aplicação.
+    """
+    session.info[_PINNED] = bind_key
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _confirm_write(session):
+    if session.info.pop(_PENDING_WRITE, False):
+        session.info[_COMMITTED_WRITE] = True
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_write(session):
+    session.info.pop(_PENDING_WRITE, None)
+
+
+def _recent_write():
+    value = request.headers.get(READ_YOUR_WRITES_HEADER) or request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    try:
+        return float(value) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+def replica_reads(view):
+    """
+    Marca uma rota só de leitura: em GET/HEAD, as consultas dela vão para uma
+    réplica.
+
+    Ficam no primário as requisições de um cliente que escreveu há menos de
+    `read_your_writes_seconds` (cookie ou cabeçalho `X-Read-Your-Writes`) e
+    as que chegam sem réplica saudável. Se a réplica falhar durante a rota,
+    ela sai da rotação e a rota é executada de novo no primário.
+
+    Deve ficar abaixo do `@bp.route`.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not replica_router.enabled or request.method not in ("GET", "HEAD"):
+            return view(*args, **kwargs)
+
+        session = current_app.extensions["sqlalchemy"].session
+        recent_write = _recent_write()
+        key = None if recent_write else replica_router.pick()
+        if key is None:
+            replica_router.record_route(ROUTE_PRIMARY, "read_your_writes" if recent_write else "no_replica")
+            return view(*args, **kwargs)
+
+        replica_router.record_route(ROUTE_REPLICA, "read")
+        session.info[_ROUTE] = ROUTE_REPLICA
+        session.info[_REPLICA] = key
+        try:
+            return view(*args, **kwargs)
+        except _REPLICA_ERRORS:
+            if session.info.get(_ROUTE) != ROUTE_REPLICA or not replica_router.is_down(key):
+                raise
+            session.rollback()
+            session.info[_ROUTE] = ROUTE_PRIMARY
+            replica_router.record_fallback(key)
+            return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _watch_replica(engine, key):
+    @event.listens_for(engine, "handle_error")
+    def _mark_replica_down(context):
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, _REPLICA_ERRORS):
+            replica_router.mark_down(key)
+
+
+def init_db_routing(app, db):
+    """
+    Liga o `replica_router` às réplicas configuradas em `init_database` e
+    registra a marca de leitura do primário após uma escrita.
+
+    Configurações lidas de `app.config`:
+        REPLICA_RETRY_SECONDS: tempo fora da rotação após uma falha.
+        READ_YOUR_WRITES_SECONDS: tempo em que um cliente que escreveu lê do primário.
+
+    Args:
+        app (Flask): Aplicação.
+        db (SQLAlchemy): Extensão do Flask-SQLAlchemy já inicializada.
+    """
+    from config import replica_binds
+
+    keys = list(replica_binds(app.config.get("DATABASE_SETTINGS", {})))
+    window = app.config.get("READ_YOUR_WRITES_SECONDS", DEFAULT_READ_YOUR_WRITES_SECONDS)
+    replica_router.configure(keys, app.config.get("REPLICA_RETRY_SECONDS", DEFAULT_RETRY_SECONDS), window)
+    if not keys:
+        return
+
+    with app.app_context():
+        for key in keys:
+            _watch_replica(db.engines[key], key)
+
+    @app.after_request
+    def _mark_read_your_writes(response):
+        # Só olha a sessão se a requisição abriu uma
+        if not db.session.registry.has() or not db.session.info.pop(_COMMITTED_WRITE, False):
+            return response
+        until = str(int(time.time() + window) + 1)
+        response.set_cookie(READ_YOUR_WRITES_COOKIE, until, max_age=window + 1, httponly=True, samesite="Lax")
+        response.headers[READ_YOUR_WRITES_HEADER] = until
+        return response
@@ -0,0 +1,30 @@
+import os
+
+# Configuração do gunicorn para os dois modos de execução:
+#   SERVER_MODE=wsgi (padrão): Flask em workers com threads (wsgi:app)
+#   SERVER_MODE=asgi: rotas assíncronas em workers do uvicorn (asgi:app)
+# Ambos usam `WEB_CONCURRENCY` processos; rode com `gunicorn -c gunicorn.conf.py`.
+server_mode = os.environ.get("SERVER_MODE", "wsgi")
+if server_mode not in ("wsgi", "asgi"):
+    raise RuntimeError(f"Unknown SERVER_MODE '{server_mode}', expected 'wsgi' or 'asgi'")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+if server_mode == "asgi":
+    wsgi_app = "asgi:app"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "wsgi:app"
+    worker_class = "gthread"
+    threads = int(os.environ.get("WEB_THREADS", "8"))
+
+# Cada worker cria o próprio engine e pool de conexões depois do fork
+preload_app = False
+timeout = int(os.environ.get("WEB_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", "5"))
+# Reciclar workers limita o crescimento de memória em processos longos
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("WEB_ACCESS_LOG") or None
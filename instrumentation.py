@@ -0,0 +1,349 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import Response, g, has_app_context, request
+from sqlalchemy import event
+
+# Limites (inclusivos) dos buckets; o último bucket (+Inf) é implícito
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+DEFAULT_SLOW_QUERY_MS = 200
+# Execuções do mesmo SQL em uma requisição a partir das quais ela é marcada como N+1
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos no formato do Prometheus.
+
+    Guarda só um contador por bucket, a soma e o total de observações:
+    a memória não cresce com o número de requisições.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Returns:
+            list: Pares (limite, contagem acumulada), terminando em '+Inf'.
+        """
+        total, result = 0, []
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class EndpointStats:
+    """Agregados de um (endpoint, método, status)."""
+
+    __slots__ = ("wall", "db", "statements", "rows", "n_plus_one")
+
+    def __init__(self):
+        self.wall = Histogram(DURATION_BUCKETS)
+        self.db = Histogram(DURATION_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.rows = 0
+        self.n_plus_one = 0
+
+
+class RequestStats:
+    """Medições da requisição em andamento, guardadas em `g`."""
+
+    __slots__ = ("start", "db_time", "statements", "rows", "status", "seen")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.status = 500
+        # Execuções por texto de SQL, para detectar N+1
+        self.seen = {}
+
+
+class MetricsRegistry:
+    """
+    Agregados por endpoint e do banco, exportados no formato texto do
+    Prometheus. Os valores são por processo.
+
+    Outros módulos acrescentam séries com `add_collector` (por exemplo o
+    roteamento de réplicas em `db_routing`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.db_statements = Histogram(DURATION_BUCKETS)
+        self._binds = {}
+        self.slow_statements = 0
+        self._collectors = []
+
+    def record_request(self, endpoint, method, stats, n_plus_one):
+        key = (endpoint, method, str(stats.status))
+        wall = time.perf_counter() - stats.start
+        with self._lock:
+            entry = self._endpoints.get(key)
+            if entry is None:
+                entry = self._endpoints[key] = EndpointStats()
+            entry.wall.observe(wall)
+            entry.db.observe(stats.db_time)
+            entry.statements.observe(stats.statements)
+            entry.rows += stats.rows
+            entry.n_plus_one += n_plus_one
+
+    def record_statement(self, elapsed, slow, bind="primary"):
+        with self._lock:
+            self.db_statements.observe(elapsed)
+            histogram = self._binds.get(bind)
+            if histogram is None:
+                histogram = self._binds[bind] = Histogram(DURATION_BUCKETS)
+            histogram.observe(elapsed)
+            if slow:
+                self.slow_statements += 1
+
+    def add_collector(self, collector):
+        """
+        Registra uma função `collector(lines)` que acrescenta linhas no formato
+        texto do Prometheus ao final de `render`.
+        """
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.db_statements = Histogram(DURATION_BUCKETS)
+            self._binds.clear()
+            self.slow_statements = 0
+
+    def render(self):
+        """
+        Returns:
+            str: Métricas no formato de exposição texto do Prometheus.
+        """
+        with self._lock:
+            endpoints = sorted(
+                (key, _copy_stats(entry)) for key, entry in self._endpoints.items()
+            )
+            db_statements = _copy_histogram(self.db_statements)
+            binds = sorted((bind, _copy_histogram(histogram)) for bind, histogram in self._binds.items())
+            slow_statements = self.slow_statements
+            collectors = list(self._collectors)
+
+        lines = []
+        labels = [(_labels(endpoint=e, method=m, status=s), entry) for (e, m, s), entry in endpoints]
+
+        _histogram(lines, "http_request_duration_seconds", "Wall time per request.",
+                   [(label, entry.wall) for label, entry in labels])
+        _histogram(lines, "http_request_db_seconds", "Time spent in SQL statements per request.",
+                   [(label, entry.db) for label, entry in labels])
+        _histogram(lines, "http_request_db_statements", "SQL statements executed per request.",
+                   [(label, entry.statements) for label, entry in labels])
+        _counter(lines, "http_request_db_rows_total", "Rows reported by the driver for the request statements.",
+                 [(label, entry.rows) for label, entry in labels])
+        _counter(lines, "http_request_n_plus_one_total",
+                 "Requests that repeated the same SQL statement enough times to suggest an N+1.",
+                 [(label, entry.n_plus_one) for label, entry in labels])
+        _histogram(lines, "db_statement_duration_seconds", "Duration of every SQL statement.",
+                   [("", db_statements)])
+        _histogram(lines, "db_bind_statement_duration_seconds", "Duration of SQL statements per database bind.",
+                   [(_labels(bind=bind), histogram) for bind, histogram in binds])
+        _counter(lines, "db_slow_statements_total", "SQL statements above the slow query threshold.",
+                 [("", slow_statements)])
+        for collector in collectors:
+            collector(lines)
+        return "\n".join(lines) + "\n"
+
+
+def _copy_histogram(histogram):
+    copy = Histogram(histogram.bounds)
+    copy.counts = list(histogram.counts)
+    copy.sum, copy.count = histogram.sum, histogram.count
+    return copy
+
+
+def _copy_stats(entry):
+    copy = EndpointStats()
+    copy.wall, copy.db, copy.statements = (
+        _copy_histogram(entry.wall), _copy_histogram(entry.db), _copy_histogram(entry.statements)
+    )
+    copy.rows, copy.n_plus_one = entry.rows, entry.n_plus_one
+    return copy
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _histogram(lines, name, help_text, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series:
+        prefix = labels + "," if labels else ""
+        for bound, count in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+        suffix = "{" + labels + "}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {histogram.sum}")
+        lines.append(f"{name}_count{suffix} {histogram.count}")
+
+
+def _counter(lines, name, help_text, series, kind="counter"):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in series:
+        suffix = "{" + labels + "}" if labels else ""
+        lines.append(f"{name}{suffix} {value}")
+
+
+metrics = MetricsRegistry()
+
+
+# Medição das rotas assíncronas (ver `async_api`), que não têm contexto do Flask
+request_stats = ContextVar("request_stats", default=None)
+
+
+def _current_stats():
+    stats = request_stats.get()
+    if stats is not None:
+        return stats
+    # Fora de uma requisição (CLI, workers em segundo plano) não há `g._request_stats`
+    return g.get("_request_stats") if has_app_context() else None
+
+
+def finish_request_stats(stats, endpoint, method, registry, n_plus_one_threshold, logger):
+    """
+    Conclui a medição de uma requisição: detecta N+1 e acumula no registro.
+
+    Args:
+        stats (RequestStats): Medição da requisição.
+        endpoint (str): Nome do endpoint.
+        method (str): Método HTTP.
+        registry (MetricsRegistry): Onde os agregados são acumulados.
+        n_plus_one_threshold (int): Repetições do mesmo SQL que marcam N+1.
+        logger (Logger): Log do aviso de N+1.
+    """
+    n_plus_one = 0
+    repeated = [(count, statement) for statement, count in stats.seen.items() if count >= n_plus_one_threshold]
+    if repeated:
+        n_plus_one = 1
+        count, statement = max(repeated)
+        logger.warning(
+            "Possible N+1 in %s %s: statement executed %d times: %s",
+            method, endpoint, count, " ".join(statement.split())[:300]
+        )
+    registry.record_request(endpoint, method, stats, n_plus_one)
+
+
+def instrument_engine(engine, registry, logger, slow_query_seconds, bind="primary"):
+    """
+    Registra no engine a medição de cada instrução SQL.
+
+    Para um engine assíncrono, passe `async_engine.sync_engine`.
+
+    Args:
+        engine (Engine): Engine a instrumentar.
+        registry (MetricsRegistry): Onde os agregados são acumulados.
+        logger (Logger): Log das consultas lentas.
+        slow_query_seconds (float): Instruções acima disso vão para o log.
+        bind (str): Rótulo do engine nas métricas por bind.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        slow = elapsed >= slow_query_seconds
+        registry.record_statement(elapsed, slow, bind)
+        if slow:
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:1000])
+
+        stats = _current_stats()
+        if stats is None:
+            return
+        stats.db_time += elapsed
+        stats.statements += 1
+        if cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+        stats.seen[statement] = stats.seen.get(statement, 0) + 1
+
+    @event.listens_for(engine, "handle_error")
+    def _discard_start_time(exception_context):
+        # Uma instrução que falhou não passa pelo after_cursor_execute
+        starts = exception_context.connection.info.get("query_start_time") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+
+def init_instrumentation(app, db, registry=metrics):
+    """
+    Registra os hooks de medição no app e no engine e a rota `/metrics`.
+
+    Por requisição são medidos o tempo total, o tempo e a quantidade de
+    instruções SQL e as linhas informadas pelo driver (`cursor.rowcount`;
+    o SQLite não informa linhas de SELECT). A medição é concluída no
+    `teardown_request`, então respostas em streaming com `stream_with_context`
+    incluem as consultas feitas durante o envio do corpo.
+
+    Configurações lidas de `app.config`:
+        SLOW_QUERY_MS: instruções acima disso são registradas no log.
+        N_PLUS_ONE_THRESHOLD: repetições do mesmo SQL que marcam a requisição como N+1.
+
+    Args:
+        app (Flask): Aplicação.
+        db (SQLAlchemy): Extensão do Flask-SQLAlchemy já inicializada.
+        registry (MetricsRegistry): Onde os agregados são acumulados.
+    """
+    slow_query_seconds = app.config.get("SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS) / 1000.0
+    n_plus_one_threshold = app.config.get("N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD)
+    logger = app.logger
+
+    @app.before_request
+    def _start_request_stats():
+        g._request_stats = RequestStats()
+
+    @app.after_request
+    def _record_status(response):
+        stats = g.get("_request_stats")
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request_stats(exc):
+        stats = g.pop("_request_stats", None)
+        if stats is None:
+            return
+        finish_request_stats(
+            stats, request.endpoint or "unmatched", request.method, registry, n_plus_one_threshold, logger
+        )
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            instrument_engine(engine, registry, logger, slow_query_seconds, bind=key or "primary")
+
+    def metrics_view():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
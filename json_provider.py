@@ -0,0 +1,199 @@
+import dataclasses
+import json
+from dataclasses import dataclass
+
+from flask.json.provider import DefaultJSONProvider, _default as flask_default
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - dependência opcional
+    msgspec = None
+
+
+# ---------------------------------------------------------------------------
+# Formatos das respostas
+#
+# Dataclasses com __slots__ são codificadas diretamente pelo orjson e pelo
+# msgspec, sem montar um dicionário por objeto. No fallback da stdlib viram
+# dicionários em `_default`.
+# ---------------------------------------------------------------------------
+
+@dataclass(slots=True)
+class AttributePayload:
+    """XP e nível de um atributo em `GET /character/<name>`."""
+    xp: int
+    level: int
+
+
+@dataclass(slots=True)
+class MissionPayload:
+    """Missão embutida em `GET /character/<name>`."""
+    title: str
+    xp_reward: int
+    difficulty: str
+    related_attributes: tuple
+    completed: bool
+    description: str
+
+
+@dataclass(slots=True)
+class CompactMissionPayload:
+    """Missão embutida em `GET /character/<name>?fields=compact` (sem `description`)."""
+    title: str
+    xp_reward: int
+    difficulty: str
+    related_attributes: tuple
+    completed: bool
+
+
+@dataclass(slots=True)
+class MissionRowPayload:
+    """Missão de `GET /character/<name>/missions`."""
+    id: int
+    title: str
+    description: str
+    xp_reward: int
+    difficulty: str
+    related_attributes: tuple
+    completed: bool
+    streak: int
+
+
+@dataclass(slots=True)
+class TemplatePayload:
+    """Template de `GET /missions/templates`."""
+    id: int
+    title: str
+    description: str
+    xp_reward: int
+    difficulty: str
+    related_attributes: tuple
+
+
+_PAYLOAD_FIELDS = {}
+
+
+def _default(o):
+    """
+    Converte os tipos que o encoder não conhece: formatos de resposta viram
+    dicionários rasos (sem a cópia profunda de `dataclasses.asdict`); o
+    resto segue as regras padrão do Flask (datas, Decimal, UUID...).
+    """
+    cls = type(o)
+    fields = _PAYLOAD_FIELDS.get(cls)
+    if fields is None and dataclasses.is_dataclass(cls):
+        fields = _PAYLOAD_FIELDS[cls] = tuple(field.name for field in dataclasses.fields(cls))
+    if fields is not None:
+        return {name: getattr(o, name) for name in fields}
+    return flask_default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Provider padrão do Flask, com os formatos de resposta convertidos em `_default`."""
+
+    default = staticmethod(_default)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provider que codifica com orjson ou msgspec, direto para bytes.
+
+    Respeita `sort_keys` e o modo compacto/indentado do Flask; `ensure_ascii`
+    não se aplica (a saída é sempre UTF-8) e `separators` é ignorado, pois a
+    saída já é compacta. Datas seguem o formato HTTP do Flask.
+    """
+
+    backend = None
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._msgspec_encoders = {}
+
+    def encode(self, obj, indent=False):
+        """
+        Returns:
+            bytes: `obj` em JSON.
+        """
+        if self.backend == "orjson":
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=option)
+
+        encoder = self._msgspec_encoders.get(self.sort_keys)
+        if encoder is None:
+            encoder = self._msgspec_encoders[self.sort_keys] = msgspec.json.Encoder(
+                enc_hook=_default, order="sorted" if self.sort_keys else None
+            )
+        data = encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if indent else data
+
+    def dumps(self, obj, **kwargs):
+        return self.encode(obj, indent=bool(kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if self.backend == "orjson":
+            return orjson.loads(s)
+        return msgspec.json.decode(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.encode(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+
+class OrjsonProvider(FastJSONProvider):
+    backend = "orjson"
+
+
+class MsgspecProvider(FastJSONProvider):
+    backend = "msgspec"
+
+
+PROVIDERS = {"orjson": OrjsonProvider, "msgspec": MsgspecProvider, "stdlib": StdlibJSONProvider}
+
+
+def available_backend():
+    """Melhor backend instalado: orjson, depois msgspec, depois a stdlib."""
+    if orjson is not None:
+        return "orjson"
+    if msgspec is not None:
+        return "msgspec"
+    return "stdlib"
+
+
+def init_json(app):
+    """
+    Instala o provider JSON no app.
+
+    `JSON_BACKEND` no config escolhe 'orjson', 'msgspec' ou 'stdlib'; por
+    padrão usa o melhor disponível.
+
+    Args:
+        app (Flask): Aplicação.
+
+    Returns:
+        str: Backend em uso.
+    """
+    backend = app.config.get("JSON_BACKEND") or available_backend()
+    if backend not in PROVIDERS:
+        raise ValueError(f"Unknown JSON_BACKEND '{backend}', expected one of {sorted(PROVIDERS)}")
+    if (backend == "orjson" and orjson is None) or (backend == "msgspec" and msgspec is None):
+        raise RuntimeError(f"JSON_BACKEND '{backend}' is not installed")
+    app.json = PROVIDERS[backend](app)
+    return backend
+
+
+# Usado fora de um app (CLI de importação/exportação, scripts)
+def dumps_line(obj):
+    """Serializa `obj` em JSON compacto e UTF-8, sem depender de um app."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
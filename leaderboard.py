@@ -0,0 +1,288 @@
+import heapq
+import itertools
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from sqlalchemy import event, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from models import db, Character, CharacterAttribute
+from sharding import fan_out
+
+# Colunas (XP, nível) de cada ranking disponível
+RANKINGS = {
+    "strength": (CharacterAttribute.strength_xp, CharacterAttribute.strength_level),
+    "discipline": (CharacterAttribute.discipline_xp, CharacterAttribute.discipline_level),
+    "health": (CharacterAttribute.health_xp, CharacterAttribute.health_level),
+    "intelligence": (CharacterAttribute.intelligence_xp, CharacterAttribute.intelligence_level),
+    "total": (CharacterAttribute.total_xp, CharacterAttribute.total_level),
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(xp, character_id, position, rank):
+    """
+    Monta o cursor opaco apontando para a última linha de uma página.
+
+    Além da chave de ordenação (xp, character_id), o cursor leva a posição e
+    o rank dessa linha, para que as páginas seguintes continuem a numeração
+    sem consultas extras.
+    """
+    return f"{xp}.{character_id}.{position}.{rank}"
+
+
+def decode_cursor(cursor):
+    """
+    Lê um cursor gerado por `encode_cursor`.
+
+    Returns:
+        tuple: (xp, character_id, posição, rank)
+
+    Raises:
+        ValueError: Se o cursor for inválido.
+    """
+    parts = cursor.split(".")
+    if len(parts) != 4:
+        raise ValueError("Invalid cursor")
+    return tuple(int(part) for part in parts)
+
+
+def leaderboard_statement(by, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Monta a consulta de uma página do ranking (ver `leaderboard_page`).
+
+    Returns:
+        tuple: (consulta, estado da numeração para `leaderboard_entries`)
+
+    Raises:
+        ValueError: Se o cursor for inválido.
+    """
+    xp_column, level_column = RANKINGS[by]
+    stmt = (
+        select(CharacterAttribute.character_id, Character.name, xp_column, level_column)
+        .join(Character, Character.id == CharacterAttribute.character_id)
+        .order_by(xp_column.desc(), CharacterAttribute.character_id.desc())
+        .limit(limit + 1)
+    )
+
+    state = (0, 0, None)
+    if cursor:
+        cursor_xp, cursor_id, position, rank = decode_cursor(cursor)
+        state = (position, rank, cursor_xp)
+        stmt = stmt.where(
+            tuple_(xp_column, CharacterAttribute.character_id) < tuple_(cursor_xp, cursor_id)
+        )
+    return stmt, state
+
+
+def leaderboard_entries(rows, limit, state):
+    """
+    Numera as linhas de `leaderboard_statement` e monta o próximo cursor.
+
+    Returns:
+        tuple: (entradas da página, cursor da próxima página ou None)
+    """
+    position, rank, previous_xp = state
+    has_more = len(rows) > limit
+
+    entries = []
+    for character_id, name, xp, level in rows[:limit]:
+        position += 1
+        if xp != previous_xp:
+            rank = position
+        previous_xp = xp
+        entries.append({
+            "rank": rank,
+            "character_id": character_id,
+            "name": name,
+            "xp": xp,
+            "level": level
+        })
+
+    next_cursor = None
+    if has_more and entries:
+        last = entries[-1]
+        next_cursor = encode_cursor(last["xp"], last["character_id"], position, rank)
+    return entries, next_cursor
+
+
+def leaderboard_page(by, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Retorna uma página do ranking usando paginação por keyset.
+
+    A página seguinte começa logo após a chave (xp, character_id) do cursor,
+    então o custo é o de uma busca no índice `(x_xp, character_id)`,
+    independentemente da profundidade no ranking. Empates recebem o mesmo
+    rank (ranking de competição: 1, 2, 2, 4).
+
+    Com shards, a mesma consulta roda em todos eles e as páginas, já
+    ordenadas, são intercaladas; o cursor continua válido porque os IDs dos
+    personagens são únicos entre os shards.
+
+    Args:
+        by (str): Ranking ('strength', 'discipline', 'health', 'intelligence' ou 'total').
+        limit (int): Tamanho da página.
+        cursor (str, opcional): Cursor devolvido pela página anterior.
+
+    Returns:
+        tuple: (entradas da página, cursor da próxima página ou None)
+    """
+    stmt, state = leaderboard_statement(by, limit, cursor)
+    pages = fan_out(lambda shard: db.session.execute(stmt).all())
+    rows = heapq.merge(*pages.values(), key=lambda row: (row[2] or 0, row[0]), reverse=True)
+    return leaderboard_entries(list(itertools.islice(rows, limit + 1)), limit, state)
+
+
+class RankIndex:
+    """
+    Índice em memória com o XP de todos os personagens de cada ranking,
+    ordenado, para responder "qual é o meu rank" com busca binária.
+
+    Só valores de XP maiores que zero são guardados: quem tem 0 XP nunca
+    está à frente de ninguém, então não altera o rank de ninguém. O índice é
+    carregado em segundo plano na primeira consulta e recarregado após o TTL
+    (para incorporar escritas feitas por outros processos); enquanto não está
+    pronto, `rank()` devolve None e o chamador usa um COUNT no banco.
+
+    Attributes:
+        ttl (float): Segundos até o índice de um ranking ser recarregado.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._values = {}
+        self._loaded_at = {}
+        self._loading = set()
+
+    def invalidate(self):
+        """Descarta todos os rankings carregados."""
+        with self._lock:
+            self._values.clear()
+            self._loaded_at.clear()
+
+    def _start_load(self, by, app):
+        def load():
+            try:
+                with app.app_context():
+                    xp_column, _ = RANKINGS[by]
+                    stmt = select(xp_column).where(xp_column > 0).order_by(xp_column)
+                    shards_values = fan_out(lambda shard: db.session.execute(stmt).scalars().all(), app=app)
+                    values = list(heapq.merge(*shards_values.values()))
+                    db.session.remove()
+                with self._lock:
+                    self._values[by] = values
+                    self._loaded_at[by] = time.monotonic()
+            finally:
+                with self._lock:
+                    self._loading.discard(by)
+
+        threading.Thread(target=load, name=f"rank-index-{by}", daemon=True).start()
+
+    def rank(self, by, xp, app=None):
+        """
+        Calcula o rank de um valor de XP (1 + quantidade de XP estritamente maior).
+
+        Args:
+            by (str): Ranking.
+            xp (int): XP do personagem.
+            app (Flask, opcional): App usado para carregar o índice em segundo plano.
+
+        Returns:
+            int | None: Rank, ou None se o índice ainda não estiver carregado.
+        """
+        with self._lock:
+            values = self._values.get(by)
+            loaded_at = self._loaded_at.get(by)
+            stale = loaded_at is None or time.monotonic() - loaded_at >= self.ttl
+            if stale and app is not None and by not in self._loading:
+                self._loading.add(by)
+                self._start_load(by, app)
+            if values is None:
+                return None
+            return len(values) - bisect_right(values, xp) + 1
+
+    def apply(self, by, old_xp, new_xp):
+        """
+        Move um personagem de `old_xp` para `new_xp` no índice, se carregado.
+        """
+        with self._lock:
+            values = self._values.get(by)
+            if values is None:
+                return
+            if old_xp and old_xp > 0:
+                i = bisect_left(values, old_xp)
+                if i < len(values) and values[i] == old_xp:
+                    values.pop(i)
+            if new_xp and new_xp > 0:
+                insort(values, new_xp)
+
+
+rank_index = RankIndex()
+
+
+def rank_statement(name, by):
+    """Consulta o XP e o nível do personagem no ranking."""
+    xp_column, level_column = RANKINGS[by]
+    return (
+        select(xp_column, level_column)
+        .join(Character, Character.id == CharacterAttribute.character_id)
+        .where(Character.name == name)
+    )
+
+
+def count_above_statement(by, xp):
+    """Conta quantos personagens têm XP maior que `xp` (rank sem o índice em memória)."""
+    xp_column, _ = RANKINGS[by]
+    return select(func.count()).select_from(CharacterAttribute).where(xp_column > (xp or 0))
+
+
+def rank_result(name, by, xp, level, rank, source):
+    return {"name": name, "by": by, "rank": rank, "xp": xp, "level": level, "source": source}
+
+
+def rank_of(name, by, app=None):
+    """
+    Calcula o rank de um personagem em um ranking.
+
+    Usa o `rank_index` em memória; se ele ainda não estiver carregado, conta
+    no banco (em todos os shards) quantos personagens têm XP maior.
+
+    Args:
+        name (str): Nome do personagem.
+        by (str): Ranking.
+        app (Flask, opcional): App para o carregamento do índice em segundo plano.
+
+    Returns:
+        dict | None: Rank, XP e nível do personagem, ou None se não existir.
+    """
+    row = db.session.execute(rank_statement(name, by)).one_or_none()
+    if row is None:
+        return None
+
+    xp, level = row
+    rank = rank_index.rank(by, xp or 0, app=app)
+    if rank is not None:
+        return rank_result(name, by, xp, level, rank, "index")
+    counts = fan_out(lambda shard: db.session.execute(count_above_statement(by, xp)).scalar())
+    return rank_result(name, by, xp, level, sum(counts.values()) + 1, "count")
+
+
+def record_xp_change(session, by, old_xp, new_xp):
+    """
+    Agenda a atualização do `rank_index` para depois do commit da sessão.
+    """
+    session.info.setdefault("rank_index_changes", []).append((by, old_xp, new_xp))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_rank_changes(session):
+    for by, old_xp, new_xp in session.info.pop("rank_index_changes", ()):
+        rank_index.apply(by, old_xp, new_xp)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rank_changes(session):
+    session.info.pop("rank_index_changes", None)
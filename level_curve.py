@@ -0,0 +1,152 @@
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+from sqlalchemy import case, literal
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional; o lote cai para Python puro
+    np = None
+
+# Limiares originais dos níveis 1 a 20
+BASE_THRESHOLDS = (
+    0, 100, 250, 450, 700, 1000, 1400, 1900, 2500, 3200,
+    4000, 4900, 5900, 7000, 8200, 9500, 10900, 12400, 14000, 15700
+)
+DEFAULT_MAX_LEVEL = 100
+DEFAULT_GAP_INCREASE = 100
+
+LevelBatch = namedtuple("LevelBatch", ["levels", "next_thresholds", "xp_to_next"])
+
+
+class LevelCurve:
+    """
+    Tabela de limiares de XP por nível, montada uma única vez.
+
+    Os níveis além da tabela base são gerados por fórmula: o intervalo entre
+    dois níveis cresce `gap_increase` XP a cada nível, continuando a
+    progressão da curva original (..., 1600, 1700, 1800, ...).
+
+    Attributes:
+        thresholds (tuple): XP mínimo de cada nível (índice 0 = nível 1).
+        max_level (int): Último nível da curva.
+    """
+
+    def __init__(self, max_level=DEFAULT_MAX_LEVEL, gap_increase=DEFAULT_GAP_INCREASE,
+                 base_thresholds=BASE_THRESHOLDS):
+        thresholds = list(base_thresholds[:max_level])
+        gap = thresholds[-1] - thresholds[-2] if len(thresholds) > 1 else gap_increase
+        while len(thresholds) < max_level:
+            gap += gap_increase
+            thresholds.append(thresholds[-1] + gap)
+
+        self.thresholds = tuple(thresholds)
+        self.max_level = len(self.thresholds)
+        self._array = np.asarray(self.thresholds, dtype=np.int64) if np is not None else None
+
+    def level_for(self, xp):
+        """
+        Calcula o nível atual e o XP necessário para o próximo nível.
+
+        Args:
+            xp (int): XP acumulado.
+
+        Returns:
+            tuple: (nível atual, XP do próximo nível ou None, XP restante até o próximo nível)
+        """
+        level = max(1, bisect_right(self.thresholds, xp))
+        if level < self.max_level:
+            next_threshold = self.thresholds[level]
+            return level, next_threshold, next_threshold - xp
+        return level, None, 0  # já está no nível máximo
+
+    def sql_level(self, xp_expression):
+        """
+        Monta uma expressão SQL que calcula o nível a partir de uma expressão de XP.
+
+        O CASE é aninhado como uma busca binária sobre os limiares, então o
+        banco avalia O(log n) comparações por linha. Serve para gravar o nível
+        no mesmo UPDATE que incrementa o XP.
+
+        Args:
+            xp_expression: Expressão SQLAlchemy com o XP (ex.: `coluna + :delta`).
+
+        Returns:
+            ColumnElement: Expressão inteira com o nível.
+        """
+        def build(low, high):
+            # Nível entre low e high (inclusive), com índices de nível começando em 1
+            if low == high:
+                return literal(low, literal_execute=True)
+            mid = (low + high + 1) // 2
+            return case(
+                (xp_expression >= literal(self.thresholds[mid - 1], literal_execute=True),
+                 build(mid, high)),
+                else_=build(low, mid - 1)
+            )
+
+        return build(1, self.max_level)
+
+    def batch(self, xp_values):
+        """
+        Calcula níveis para uma sequência de valores de XP de uma vez.
+
+        Com NumPy instalado o cálculo é vetorizado com `searchsorted` e os
+        campos do resultado são arrays; `next_thresholds` é um masked array
+        em que o nível máximo aparece mascarado (`.tolist()` devolve None).
+        Sem NumPy, os campos são listas.
+
+        Args:
+            xp_values (iterable): Valores de XP.
+
+        Returns:
+            LevelBatch: (levels, next_thresholds, xp_to_next)
+        """
+        if self._array is not None:
+            xp = np.asarray(xp_values, dtype=np.int64)
+            levels = np.maximum(np.searchsorted(self._array, xp, side="right"), 1)
+            at_max = levels >= self.max_level
+            next_raw = self._array[np.minimum(levels, self.max_level - 1)]
+            xp_to_next = np.where(at_max, 0, next_raw - xp)
+            return LevelBatch(levels, np.ma.masked_array(next_raw, mask=at_max), xp_to_next)
+
+        levels, next_thresholds, xp_to_next = [], [], []
+        for xp in xp_values:
+            level, next_threshold, remaining = self.level_for(xp)
+            levels.append(level)
+            next_thresholds.append(next_threshold)
+            xp_to_next.append(remaining)
+        return LevelBatch(levels, next_thresholds, xp_to_next)
+
+
+@lru_cache(maxsize=None)
+def get_curve(max_level=DEFAULT_MAX_LEVEL, gap_increase=DEFAULT_GAP_INCREASE):
+    """
+    Retorna a curva de níveis para a configuração dada, criando-a só na primeira vez.
+
+    Args:
+        max_level (int): Último nível da curva.
+        gap_increase (int): Crescimento do intervalo de XP a cada nível além da tabela base.
+
+    Returns:
+        LevelCurve: Curva memorizada.
+    """
+    return LevelCurve(max_level=max_level, gap_increase=gap_increase)
+
+
+DEFAULT_CURVE = get_curve()
+
+
+def levels_for_batch(xp_values, curve=None):
+    """
+    Atalho para `LevelCurve.batch` usando a curva padrão.
+
+    Args:
+        xp_values (iterable): Valores de XP.
+        curve (LevelCurve, opcional): Curva a usar; padrão `DEFAULT_CURVE`.
+
+    Returns:
+        LevelBatch: (levels, next_thresholds, xp_to_next)
+    """
+    return (curve or DEFAULT_CURVE).batch(xp_values)
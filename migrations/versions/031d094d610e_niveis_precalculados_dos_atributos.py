@@ -0,0 +1,91 @@
+"""Níveis pré-calculados dos atributos
+
+Revision ID: 031d094d610e
+Revises: 8e4667a18bcf
+Create Date: 2026-10-18 11:02:17.583120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '031d094d610e'
+down_revision = '8e4667a18bcf'
+branch_labels = None
+depends_on = None
+
+ATTRIBUTES = ('strength', 'discipline', 'health', 'intelligence')
+
+# Curva de níveis vigente nesta revisão, congelada aqui: mudanças futuras em
+# `level_curve` não alteram o que esta migração grava
+BASE_THRESHOLDS = (
+    0, 100, 250, 450, 700, 1000, 1400, 1900, 2500, 3200,
+    4000, 4900, 5900, 7000, 8200, 9500, 10900, 12400, 14000, 15700
+)
+MAX_LEVEL = 100
+GAP_INCREASE = 100
+
+
+def _thresholds():
+    thresholds = list(BASE_THRESHOLDS)
+    gap = thresholds[-1] - thresholds[-2]
+    while len(thresholds) < MAX_LEVEL:
+        gap += GAP_INCREASE
+        thresholds.append(thresholds[-1] + gap)
+    return thresholds
+
+
+def _sql_level(xp_expression, thresholds):
+    # CASE aninhado como busca binária sobre os limiares (níveis a partir de 1)
+    def build(low, high):
+        if low == high:
+            return sa.literal(low, literal_execute=True)
+        mid = (low + high + 1) // 2
+        return sa.case(
+            (xp_expression >= sa.literal(thresholds[mid - 1], literal_execute=True), build(mid, high)),
+            else_=build(low, mid - 1)
+        )
+
+    return build(1, len(thresholds))
+
+
+def upgrade():
+    with op.batch_alter_table('character_attributes', schema=None) as batch_op:
+        for attr in ATTRIBUTES:
+            batch_op.add_column(sa.Column(f'{attr}_level', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('total_level', sa.Integer(), nullable=False, server_default='4'))
+
+    # Preenche os níveis a partir do XP já acumulado, em um único UPDATE
+    character_attributes = sa.table(
+        'character_attributes',
+        *[sa.column(f'{attr}_xp', sa.Integer) for attr in ATTRIBUTES],
+        *[sa.column(f'{attr}_level', sa.Integer) for attr in ATTRIBUTES],
+        sa.column('total_level', sa.Integer)
+    )
+    thresholds = _thresholds()
+    levels = {
+        attr: _sql_level(sa.func.coalesce(character_attributes.c[f'{attr}_xp'], 0), thresholds)
+        for attr in ATTRIBUTES
+    }
+    op.execute(
+        character_attributes.update().values(
+            **{f'{attr}_level': level for attr, level in levels.items()},
+            total_level=sum(levels.values())
+        )
+    )
+
+    with op.batch_alter_table('character_attributes', schema=None) as batch_op:
+        for attr in ATTRIBUTES:
+            batch_op.create_index(f'ix_character_attributes_{attr}_level', [f'{attr}_level'])
+        batch_op.create_index('ix_character_attributes_total_level', ['total_level'])
+
+
+def downgrade():
+    with op.batch_alter_table('character_attributes', schema=None) as batch_op:
+        batch_op.drop_index('ix_character_attributes_total_level')
+        for attr in ATTRIBUTES:
+            batch_op.drop_index(f'ix_character_attributes_{attr}_level')
+        batch_op.drop_column('total_level')
+        for attr in ATTRIBUTES:
+            batch_op.drop_column(f'{attr}_level')
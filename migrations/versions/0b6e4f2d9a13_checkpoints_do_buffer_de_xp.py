@@ -0,0 +1,29 @@
+"""Checkpoints do buffer de XP
+
+Revision ID: 0b6e4f2d9a13
+Revises: f2c8d5a0b917
+Create Date: 2026-10-18 19:05:12.804377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e4f2d9a13'
+down_revision = 'f2c8d5a0b917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('xp_buffer_checkpoints',
+    sa.Column('buffer_id', sa.String(length=32), nullable=False),
+    sa.Column('last_seq', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('buffer_id')
+    )
+
+
+def downgrade():
+    op.drop_table('xp_buffer_checkpoints')
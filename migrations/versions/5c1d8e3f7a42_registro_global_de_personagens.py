@@ -0,0 +1,45 @@
+"""Registro global de personagens
+
+Revision ID: 5c1d8e3f7a42
+Revises: 0b6e4f2d9a13
+Create Date: 2026-10-18 21:14:37.521903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1d8e3f7a42'
+down_revision = '0b6e4f2d9a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('character_registry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('shard', sa.String(length=32), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    with op.batch_alter_table('character_registry', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_character_registry_shard'), ['shard'], unique=False)
+
+    # Personagens existentes ficam registrados no banco padrão (shard 0) com o mesmo
+    # ID, para que nomes já usados não possam ser reservados de novo com shards
+    op.execute("INSERT INTO character_registry (id, name, shard) SELECT id, name, 'shard_0' FROM characters")
+    if op.get_bind().dialect.name == 'postgresql':
+        # IDs inseridos explicitamente não avançam a sequência
+        op.execute(
+            "SELECT setval(pg_get_serial_sequence('character_registry', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM character_registry), 0) + 1, false)"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('character_registry', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_character_registry_shard'))
+
+    op.drop_table('character_registry')
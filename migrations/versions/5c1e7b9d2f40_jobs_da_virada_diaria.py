@@ -0,0 +1,55 @@
+"""Jobs da virada diária
+
+Revision ID: 5c1e7b9d2f40
+Revises: a94afcbce69b
+Create Date: 2026-10-18 13:05:48.117302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7b9d2f40'
+down_revision = 'a94afcbce69b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rollover_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_date')
+    )
+    with op.batch_alter_table('rollover_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rollover_jobs_status'), ['status'], unique=False)
+
+    op.create_table('rollover_partitions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('lower_id', sa.Integer(), nullable=False),
+    sa.Column('upper_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('missions', sa.Integer(), nullable=False),
+    sa.Column('streak_incremented', sa.Integer(), nullable=False),
+    sa.Column('streak_reset', sa.Integer(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['rollover_jobs.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job_id', 'lower_id', name='uq_rollover_partitions_job_id_lower_id')
+    )
+
+
+def downgrade():
+    op.drop_table('rollover_partitions')
+    with op.batch_alter_table('rollover_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_rollover_jobs_status'))
+
+    op.drop_table('rollover_jobs')
@@ -0,0 +1,49 @@
+"""Índices e title_key das missões
+
+Revision ID: 8e4667a18bcf
+Revises: 83d5cea448e6
+Create Date: 2026-10-18 10:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4667a18bcf'
+down_revision = '83d5cea448e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Títulos repetidos (sem diferenciar maiúsculas) no mesmo personagem impediriam
+    # o índice único; as cópias recebem o id no título em vez de serem apagadas,
+    # truncando o título para que o sufixo caiba em String(200)
+    op.execute("""
+        UPDATE character_missions
+        SET title = substr(title, 1, 200 - length(' (#' || id || ')')) || ' (#' || id || ')'
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM character_missions GROUP BY character_id, lower(title)
+        )
+    """)
+
+    with op.batch_alter_table('character_missions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(
+            'title_key', sa.String(length=200), sa.Computed('lower(title)', persisted=True)
+        ))
+        batch_op.create_index('ix_character_missions_character_id_completed', ['character_id', 'completed'])
+        batch_op.create_index('uq_character_missions_character_id_title_key', ['character_id', 'title_key'], unique=True)
+
+    with op.batch_alter_table('character_relics', schema=None) as batch_op:
+        batch_op.create_index('ix_character_relics_character_id', ['character_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('character_relics', schema=None) as batch_op:
+        batch_op.drop_index('ix_character_relics_character_id')
+
+    with op.batch_alter_table('character_missions', schema=None) as batch_op:
+        batch_op.drop_index('uq_character_missions_character_id_title_key')
+        batch_op.drop_index('ix_character_missions_character_id_completed')
+        batch_op.drop_column('title_key')
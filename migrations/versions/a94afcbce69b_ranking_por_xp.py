@@ -0,0 +1,45 @@
+"""Ranking por XP
+
+Revision ID: a94afcbce69b
+Revises: 031d094d610e
+Create Date: 2026-10-18 11:47:03.291655
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a94afcbce69b'
+down_revision = '031d094d610e'
+branch_labels = None
+depends_on = None
+
+ATTRIBUTES = ('strength', 'discipline', 'health', 'intelligence')
+
+
+def upgrade():
+    # XP nulo vira 0 para que a ordenação do ranking use os índices sem COALESCE
+    for attr in ATTRIBUTES:
+        op.execute(f"UPDATE character_attributes SET {attr}_xp = 0 WHERE {attr}_xp IS NULL")
+
+    with op.batch_alter_table('character_attributes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_xp', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute(
+        "UPDATE character_attributes SET total_xp = "
+        + " + ".join(f"{attr}_xp" for attr in ATTRIBUTES)
+    )
+
+    with op.batch_alter_table('character_attributes', schema=None) as batch_op:
+        for attr in ATTRIBUTES:
+            batch_op.create_index(f'ix_character_attributes_{attr}_rank', [f'{attr}_xp', 'character_id'])
+        batch_op.create_index('ix_character_attributes_total_rank', ['total_xp', 'character_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('character_attributes', schema=None) as batch_op:
+        batch_op.drop_index('ix_character_attributes_total_rank')
+        for attr in ATTRIBUTES:
+            batch_op.drop_index(f'ix_character_attributes_{attr}_rank')
+        batch_op.drop_column('total_xp')
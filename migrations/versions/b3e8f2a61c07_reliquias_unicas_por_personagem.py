@@ -0,0 +1,36 @@
+"""Relíquias únicas por personagem
+
+Revision ID: b3e8f2a61c07
+Revises: 5c1e7b9d2f40
+Create Date: 2026-10-18 14:21:37.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f2a61c07'
+down_revision = '5c1e7b9d2f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Relíquias repetidas no mesmo personagem impediriam o índice único; as
+    # cópias recebem o id no nome em vez de serem apagadas
+    op.execute("""
+        UPDATE character_relics
+        SET name = name || ' (#' || id || ')'
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM character_relics GROUP BY character_id, name
+        )
+    """)
+
+    with op.batch_alter_table('character_relics', schema=None) as batch_op:
+        batch_op.create_index('uq_character_relics_character_id_name', ['character_id', 'name'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('character_relics', schema=None) as batch_op:
+        batch_op.drop_index('uq_character_relics_character_id_name')
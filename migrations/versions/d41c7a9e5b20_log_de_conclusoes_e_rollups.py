@@ -0,0 +1,68 @@
+"""Log de conclusões e rollups
+
+Revision ID: d41c7a9e5b20
+Revises: b3e8f2a61c07
+Create Date: 2026-10-18 15:02:11.734920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41c7a9e5b20'
+down_revision = 'b3e8f2a61c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('mission_completions',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('character_id', sa.Integer(), nullable=False),
+    sa.Column('mission_id', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=False),
+    sa.Column('strength_xp', sa.Integer(), nullable=False),
+    sa.Column('discipline_xp', sa.Integer(), nullable=False),
+    sa.Column('health_xp', sa.Integer(), nullable=False),
+    sa.Column('intelligence_xp', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['character_id'], ['characters.id'], ),
+    sa.ForeignKeyConstraint(['mission_id'], ['character_missions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('mission_completions', schema=None) as batch_op:
+        batch_op.create_index('ix_mission_completions_character_id_completed_at', ['character_id', 'completed_at'])
+        batch_op.create_index('ix_mission_completions_completed_at', ['completed_at'])
+
+    op.create_table('completion_daily',
+    sa.Column('character_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('missions', sa.Integer(), nullable=False),
+    sa.Column('strength_xp', sa.Integer(), nullable=False),
+    sa.Column('discipline_xp', sa.Integer(), nullable=False),
+    sa.Column('health_xp', sa.Integer(), nullable=False),
+    sa.Column('intelligence_xp', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['character_id'], ['characters.id'], ),
+    sa.PrimaryKeyConstraint('character_id', 'day')
+    )
+    op.create_table('completion_weekly',
+    sa.Column('character_id', sa.Integer(), nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('missions', sa.Integer(), nullable=False),
+    sa.Column('strength_xp', sa.Integer(), nullable=False),
+    sa.Column('discipline_xp', sa.Integer(), nullable=False),
+    sa.Column('health_xp', sa.Integer(), nullable=False),
+    sa.Column('intelligence_xp', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['character_id'], ['characters.id'], ),
+    sa.PrimaryKeyConstraint('character_id', 'week_start')
+    )
+
+
+def downgrade():
+    op.drop_table('completion_weekly')
+    op.drop_table('completion_daily')
+    with op.batch_alter_table('mission_completions', schema=None) as batch_op:
+        batch_op.drop_index('ix_mission_completions_completed_at')
+        batch_op.drop_index('ix_mission_completions_character_id_completed_at')
+
+    op.drop_table('mission_completions')
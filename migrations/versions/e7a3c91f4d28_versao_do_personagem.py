@@ -0,0 +1,26 @@
+"""Versão do personagem
+
+Revision ID: e7a3c91f4d28
+Revises: d41c7a9e5b20
+Create Date: 2026-10-18 16:40:27.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c91f4d28'
+down_revision = 'd41c7a9e5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('characters', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('characters', schema=None) as batch_op:
+        batch_op.drop_column('version')
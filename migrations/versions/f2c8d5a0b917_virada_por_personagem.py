@@ -0,0 +1,36 @@
+"""Virada por personagem
+
+Revision ID: f2c8d5a0b917
+Revises: e7a3c91f4d28
+Create Date: 2026-10-18 17:52:40.561093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d5a0b917'
+down_revision = 'e7a3c91f4d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('characters', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_rollover_date', sa.Date(), nullable=True))
+
+    # A última virada global concluída vale para todos os personagens; sem
+    # nenhuma, assume-se que a virada de hoje já foi aplicada
+    op.execute(
+        "UPDATE characters SET last_rollover_date = COALESCE("
+        "(SELECT MAX(run_date) FROM rollover_jobs WHERE status = 'done'), CURRENT_DATE)"
+    )
+
+    with op.batch_alter_table('characters', schema=None) as batch_op:
+        batch_op.alter_column('last_rollover_date', existing_type=sa.Date(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('characters', schema=None) as batch_op:
+        batch_op.drop_column('last_rollover_date')
@@ -0,0 +1,307 @@
+from sqlalchemy import String, func, literal, or_, select, update
+
+from character_cache import bump_character_version
+from completion_log import record_completions
+from models import db, CharacterAttribute, CharacterMission
+from leaderboard import record_xp_change
+from relics import apply_bonuses, relic_bonuses, unlock_relics
+from services import ATTRIBUTE_LABELS, calculate_level_and_next
+from xp_buffer import buffer_attribute_xp, xp_buffer, xp_increment_values
+
+
+def attribute_progress(xp):
+    """
+    Monta o bloco de progresso de um atributo no formato de `attribute_progress`.
+
+    Args:
+        xp (int): XP atual do atributo.
+
+    Returns:
+        dict: XP, nível, XP restante e limiar do próximo nível.
+    """
+    level, next_threshold, xp_to_next = calculate_level_and_next(xp)
+    return {
+        "xp": xp,
+        "level": level,
+        "xp_to_next_level": xp_to_next,
+        "next_level_at": next_threshold
+    }
+
+
+def add_attribute_xp(character_id, xp_by_attribute):
+    """
+    Soma XP aos atributos do personagem com um único UPDATE relativo
+    (`x_xp = x_xp + delta`), sem ler os valores para o Python antes.
+
+    O mesmo UPDATE recalcula `x_level` de cada atributo alterado, ajusta
+    `total_level` pela diferença entre o nível novo e o antigo e soma o XP
+    em `total_xp`. As mudanças de XP são repassadas ao `rank_index` após o commit.
+
+    No modo write-behind (`XP_WRITE_BEHIND`) nada é escrito aqui: o XP vai
+    para o `xp_buffer` após o commit e o retorno soma os deltas pendentes
+    (ver `xp_buffer.buffer_attribute_xp`).
+
+    Args:
+        character_id (int): ID do personagem.
+        xp_by_attribute (dict): XP a somar por atributo ('strength', 'discipline', ...),
+            na ordem em que os atributos devem aparecer no resultado.
+
+    Returns:
+        tuple: (XP resultante de cada atributo atualizado, `total_xp` resultante),
+            vindos do RETURNING; ({}, None) se nada foi atualizado.
+    """
+    deltas = dict(xp_by_attribute)
+    if not deltas:
+        return {}, None
+    if xp_buffer.enabled:
+        return buffer_attribute_xp(character_id, deltas)
+
+    columns = [getattr(CharacterAttribute, f"{attr}_xp") for attr in deltas]
+    stmt = (
+        update(CharacterAttribute)
+        .where(CharacterAttribute.character_id == character_id)
+        .values(xp_increment_values(deltas))
+        .returning(*columns, CharacterAttribute.total_xp)
+        .execution_options(synchronize_session=False)
+    )
+    row = db.session.execute(stmt).one_or_none()
+    if row is None:
+        return {}, None
+
+    new_xp = dict(zip(deltas, row))
+    for attr, xp in new_xp.items():
+        record_xp_change(db.session, attr, xp - deltas[attr], xp)
+    total_xp = row[-1]
+    record_xp_change(db.session, "total", total_xp - sum(deltas.values()), total_xp)
+    return new_xp, total_xp
+
+
+def _mission_xp(mission):
+    """
+    Retorna o XP que a missão concede a cada atributo relacionado.
+
+    Args:
+        mission: Linha ou objeto com `xp_reward` e as flags dos atributos.
+
+    Returns:
+        dict: XP por atributo, na ordem da API.
+    """
+    return {
+        attr: mission.xp_reward or 0
+        for attr, _ in ATTRIBUTE_LABELS
+        if getattr(mission, attr)
+    }
+
+
+# Colunas devolvidas pelo RETURNING ao completar uma missão
+_COMPLETED_COLUMNS = (
+    CharacterMission.id,
+    CharacterMission.title,
+    CharacterMission.xp_reward,
+    CharacterMission.strength,
+    CharacterMission.discipline,
+    CharacterMission.health,
+    CharacterMission.intelligence,
+    CharacterMission.streak,
+)
+
+# Títulos por SELECT ao calcular as chaves no banco, abaixo do limite de colunas do SQLite
+TITLE_KEY_CHUNK = 500
+# Maior valor da coluna INTEGER `character_missions.id`
+MAX_MISSION_ID = 2 ** 31 - 1
+
+
+def database_title_keys(titles):
+    """
+    Calcula a chave de cada título com o `lower` do próprio banco, o mesmo da
+    coluna `title_key` (o do SQLite só trata ASCII e o do PostgreSQL difere do
+    Python em casos como 'ß' e 'İ').
+
+    Args:
+        titles (list): Títulos distintos.
+
+    Returns:
+        dict: {título: chave}.
+    """
+    keys = {}
+    for start in range(0, len(titles), TITLE_KEY_CHUNK):
+        chunk = titles[start:start + TITLE_KEY_CHUNK]
+        row = db.session.execute(select(*[func.lower(literal(title, String)) for title in chunk])).one()
+        keys.update(zip(chunk, row))
+    return keys
+
+
+def complete_mission_atomic(character_id, mission_title):
+    """
+    Completa uma missão pelo título sem ler e regravar valores no Python.
+
+    A missão é marcada com um UPDATE condicional (`completed = false` no
+    WHERE), então duas requisições simultâneas não completam a mesma missão
+    duas vezes; o XP é somado com `x_xp = x_xp + :xp`, então nenhuma
+    atualização se perde. Nenhum lock de linha fica aberto durante código Python.
+
+    Args:
+        character_id (int): ID do personagem.
+        mission_title (str): Título da missão (sem diferenciar maiúsculas).
+
+    O XP recebe os bônus das relíquias do personagem (ver `relics`); o
+    evento vai para o log de conclusões (ver `completion_log`), as relíquias
+    cujo limiar foi alcançado são desbloqueadas e a versão do personagem é
+    incrementada (ver `character_cache`), tudo na mesma transação.
+
+    Returns:
+        tuple | None: (título da missão, attribute_progress, relíquias
+            desbloqueadas), ou None se a missão não existir ou já estiver completada.
+    """
+    open_mission = (
+        select(CharacterMission.id)
+        .where(
+            CharacterMission.character_id == character_id,
+            CharacterMission.title_key == func.lower(mission_title),
+            CharacterMission.completed == False
+        )
+        .order_by(CharacterMission.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    mission = db.session.execute(
+        update(CharacterMission)
+        .where(CharacterMission.id == open_mission, CharacterMission.completed == False)
+        .values(completed=True)
+        .returning(*_COMPLETED_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+
+    if mission is None:
+        db.session.rollback()
+        return None
+
+    # Bônus das relíquias vêm do cache em memória; só uma falta no cache consulta o banco
+    bonuses = relic_bonuses.get(character_id)
+    xp = apply_bonuses(_mission_xp(mission), bonuses, mission.streak)
+    new_xp, total_xp = add_attribute_xp(character_id, xp)
+    record_completions(character_id, [(mission.id, xp)])
+    relics = unlock_relics(character_id, bonuses, dict(new_xp, total=total_xp, streak=mission.streak))
+    bump_character_version(character_id)
+    db.session.commit()
+
+    progress = {attr: attribute_progress(xp) for attr, xp in new_xp.items()}
+    return mission.title, progress, relics
+
+
+def complete_missions_batch(character_id, mission_titles=(), mission_ids=()):
+    """
+    Completa várias missões de um personagem com um commit só.
+
+    As missões são resolvidas com uma consulta `IN`, marcadas como completadas
+    em um único UPDATE condicional, o XP é somado por atributo em memória e
+    aplicado em um único UPDATE de `character_attributes`. Itens inválidos
+    viram erros individuais e não interrompem o lote.
+
+    Args:
+        character_id (int): ID do personagem.
+        mission_titles (iterable): Títulos das missões (sem diferenciar maiúsculas).
+        mission_ids (iterable): IDs das missões.
+
+    Returns:
+        tuple: (títulos completados, lista de erros por item, attribute_progress,
+            relíquias desbloqueadas)
+    """
+    errors = []
+    # Itens de tipo errado viram erros antes da consulta: um ID que não é inteiro
+    # faria o banco recusar o `IN` inteiro, e listas/objetos não são hasheáveis
+    valid_ids = []
+    for mission_id in mission_ids:
+        if isinstance(mission_id, int) and not isinstance(mission_id, bool):
+            valid_ids.append(mission_id)
+        else:
+            errors.append({"mission_id": mission_id, "error": "mission_id must be an integer"})
+    valid_titles = []
+    for title in mission_titles:
+        if isinstance(title, str):
+            valid_titles.append(title)
+        else:
+            errors.append({"mission_title": title, "error": "mission_title must be a string"})
+    mission_titles = list(dict.fromkeys(valid_titles))
+    mission_ids = list(dict.fromkeys(valid_ids))
+
+    title_keys = database_title_keys(mission_titles)
+
+    criteria = []
+    # IDs fora da faixa da coluna não existem e estourariam o parâmetro no PostgreSQL
+    searchable_ids = [mission_id for mission_id in mission_ids if 0 < mission_id <= MAX_MISSION_ID]
+    if searchable_ids:
+        criteria.append(CharacterMission.id.in_(searchable_ids))
+    if title_keys:
+        criteria.append(CharacterMission.title_key.in_(set(title_keys.values())))
+
+    candidates = db.session.execute(
+        select(CharacterMission.id, CharacterMission.title, CharacterMission.title_key, CharacterMission.completed)
+        .where(CharacterMission.character_id == character_id, or_(*criteria))
+        .order_by(CharacterMission.id)
+    ).all() if criteria else []
+
+    by_id = {row.id: row for row in candidates}
+    open_by_title = {}
+    for row in candidates:
+        if not row.completed:
+            open_by_title.setdefault(row.title_key, row)
+
+    targets = {}
+    for mission_id in mission_ids:
+        row = by_id.get(mission_id)
+        if row is None or row.completed:
+            errors.append({"mission_id": mission_id, "error": "Mission not found or already completed"})
+        else:
+            targets[row.id] = {"mission_id": mission_id}
+    for title in mission_titles:
+        row = open_by_title.get(title_keys.get(title))
+        if row is None:
+            errors.append({"mission_title": title, "error": "Mission not found or already completed"})
+        elif row.id in targets:
+            errors.append({"mission_title": title, "error": "Mission listed more than once"})
+        else:
+            targets[row.id] = {"mission_title": title}
+
+    completed_rows = []
+    if targets:
+        completed_rows = db.session.execute(
+            update(CharacterMission)
+            .where(CharacterMission.id.in_(list(targets)), CharacterMission.completed == False)
+            .values(completed=True)
+            .returning(*_COMPLETED_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    # Missões completadas por outra requisição entre a consulta e o UPDATE
+    completed_ids = {row.id for row in completed_rows}
+    for mission_id, item in targets.items():
+        if mission_id not in completed_ids:
+            errors.append(dict(item, error="Mission not found or already completed"))
+
+    bonuses = relic_bonuses.get(character_id) if completed_rows else None
+    xp_by_attribute = {}
+    completions = []
+    max_streak = 0
+    for row in completed_rows:
+        # O bônus de streak depende da missão, então é aplicado linha a linha
+        mission_xp = apply_bonuses(_mission_xp(row), bonuses, row.streak)
+        for attr, xp in mission_xp.items():
+            xp_by_attribute[attr] = xp_by_attribute.get(attr, 0) + xp
+        completions.append((row.id, mission_xp))
+        max_streak = max(max_streak, row.streak or 0)
+    # Mantém a ordem dos atributos usada pela API
+    xp_by_attribute = {
+        attr: xp_by_attribute[attr] for attr, _ in ATTRIBUTE_LABELS if attr in xp_by_attribute
+    }
+
+    new_xp, total_xp = add_attribute_xp(character_id, xp_by_attribute)
+    record_completions(character_id, completions)
+    relics = []
+    if completed_rows:
+        relics = unlock_relics(character_id, bonuses, dict(new_xp, total=total_xp, streak=max_streak))
+        bump_character_version(character_id)
+    db.session.commit()
+
+    progress = {attr: attribute_progress(xp) for attr, xp in new_xp.items()}
+    return [row.title for row in completed_rows], errors, progress, relics
@@ -0,0 +1,145 @@
+from flask import current_app
+from sqlalchemy import select
+
+from json_provider import MissionRowPayload
+from models import db, CharacterMission
+from services import ATTRIBUTE_LABELS, related_attributes
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+# Linhas buscadas por vez do cursor do banco durante o streaming
+FETCH_SIZE = 500
+
+# Aceita tanto o nome da coluna ('strength') quanto o nome exibido ('Força')
+ATTRIBUTE_FILTERS = dict(
+    [(attr, attr) for attr, _ in ATTRIBUTE_LABELS] + [(label, attr) for attr, label in ATTRIBUTE_LABELS]
+)
+
+LISTING_COLUMNS = (
+    CharacterMission.id,
+    CharacterMission.title,
+    CharacterMission.description,
+    CharacterMission.xp_reward,
+    CharacterMission.difficulty,
+    CharacterMission.strength,
+    CharacterMission.discipline,
+    CharacterMission.health,
+    CharacterMission.intelligence,
+    CharacterMission.completed,
+    CharacterMission.streak,
+)
+
+
+def missions_query(character_id, limit, after_id=None, completed=None, difficulty=None, attribute=None):
+    """
+    Monta a consulta de uma página de missões do personagem, ordenada por ID.
+
+    A paginação é por cursor: a página seguinte começa no primeiro ID maior
+    que `after_id`. Busca `limit + 1` linhas para saber se há próxima página.
+
+    Args:
+        character_id (int): ID do personagem.
+        limit (int): Tamanho da página.
+        after_id (int, opcional): Último ID da página anterior.
+        completed (bool, opcional): Filtra por missões completadas ou não.
+        difficulty (str, opcional): Filtra pela dificuldade.
+        attribute (str, opcional): Filtra por atributo relacionado ('strength' ...).
+
+    Returns:
+        Select: Consulta pronta para execução.
+    """
+    stmt = select(*LISTING_COLUMNS).where(CharacterMission.character_id == character_id)
+    if after_id is not None:
+        stmt = stmt.where(CharacterMission.id > after_id)
+    if completed is not None:
+        stmt = stmt.where(CharacterMission.completed == completed)
+    if difficulty is not None:
+        stmt = stmt.where(CharacterMission.difficulty == difficulty)
+    if attribute is not None:
+        stmt = stmt.where(getattr(CharacterMission, attribute) == True)
+    return stmt.order_by(CharacterMission.id).limit(limit + 1)
+
+
+def serialize_mission_row(row):
+    """
+    Converte uma linha da listagem no formato de missão da API.
+    """
+    return MissionRowPayload(
+        row.id,
+        row.title,
+        row.description,
+        row.xp_reward,
+        row.difficulty,
+        related_attributes(row.strength, row.discipline, row.health, row.intelligence),
+        row.completed,
+        row.streak
+    )
+
+
+def _page_rows(stmt, limit):
+    """
+    Percorre as linhas da página em lotes de `FETCH_SIZE`, sem materializar a
+    página inteira. Gera (linha, None) para cada missão e, por último,
+    (None, cursor da próxima página ou None).
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=FETCH_SIZE))
+    emitted, last_id = 0, None
+    for row in result:
+        if emitted == limit:
+            # A linha extra só indica que existe próxima página
+            result.close()
+            yield None, str(last_id)
+            return
+        emitted += 1
+        last_id = row.id
+        yield row, None
+    yield None, None
+
+
+def stream_json(stmt, limit):
+    """
+    Gera o corpo `{"missions": [...], "next_cursor": ...}` em pedaços.
+    """
+    dumps = current_app.json.dumps
+    yield '{"missions":['
+    first = True
+    for row, next_cursor in _page_rows(stmt, limit):
+        if row is None:
+            yield '],"next_cursor":' + dumps(next_cursor) + '}'
+            return
+        yield ('' if first else ',') + dumps(serialize_mission_row(row), separators=(",", ":"))
+        first = False
+
+
+def stream_ndjson(stmt, limit):
+    """
+    Gera uma missão por linha (NDJSON) e uma última linha com `next_cursor`.
+    """
+    dumps = current_app.json.dumps
+    for row, next_cursor in _page_rows(stmt, limit):
+        if row is None:
+            yield dumps({"next_cursor": next_cursor}, separators=(",", ":")) + "\n"
+            return
+        yield dumps(serialize_mission_row(row), separators=(",", ":")) + "\n"
+
+
+def first_missions(character_id, limit):
+    """
+    Carrega as primeiras missões do personagem para embutir em `GET /character/<name>`.
+
+    Returns:
+        tuple: (linhas das missões, cursor para continuar em `/missions` ou None)
+    """
+    return split_page(db.session.execute(missions_query(character_id, limit)).all(), limit)
+
+
+def split_page(rows, limit):
+    """
+    Separa as `limit + 1` linhas de `missions_query` em página e cursor.
+
+    Returns:
+        tuple: (linhas da página, cursor da próxima página ou None)
+    """
+    if len(rows) > limit:
+        return rows[:limit], str(rows[limit - 1].id)
+    return rows, None
@@ -1,6 +1,39 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from db_routing import RoutingSession
+
+# A sessão manda as leituras das rotas `replica_reads` às réplicas (ver `db_routing`)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def utc_today():
+    """Dia atual em UTC, o calendário da virada diária das missões."""
+    return datetime.now(timezone.utc).date()
+
+
+def dialect_insert(model, bind=None):
+    """
+    INSERT do dialeto em uso, com `on_conflict_do_nothing`/`on_conflict_do_update`.
+
+    Args:
+        model: Modelo (ou tabela) de destino.
+        bind (Engine | Connection, opcional): Onde o INSERT será executado;
+            padrão o bind da sessão.
+
+    Returns:
+        Insert: INSERT do PostgreSQL ou do SQLite.
+    """
+    dialect = (bind or db.session.get_bind()).dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"ON CONFLICT is not supported on '{dialect}'")
+    return insert(model)
+
 
 class Character(db.Model):
     """
@@ -9,6 +42,10 @@ class Character(db.Model):
     Attributes:
         id (int): Identificador único do personagem.
         name (str): Nome do personagem (deve ser único).
+        version (int): Incrementada a cada escrita que muda o payload do personagem
+            (base do ETag e das chaves do cache, ver `character_cache`).
+        last_rollover_date (date): Último dia cuja virada já foi aplicada às missões
+            do personagem (ver `daily_update.catch_up_character`).
         attributes (relationship): Relação com os atributos do personagem.
         missions (relationship): Relação com as missões do personagem.
     """
@@ -16,6 +53,8 @@ class Character(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    last_rollover_date = db.Column(db.Date, nullable=False, default=utc_today)
     
     # Relacionamentos
     attributes = db.relationship('CharacterAttribute', back_populates='character', uselist=False)
@@ -33,8 +72,25 @@ class CharacterAttribute(db.Model):
         discipline_xp (int): Experiência acumulada em Disciplina.
         health_xp (int): Experiência acumulada em Saúde.
         intelligence_xp (int): Experiência acumulada em Inteligência.
+        strength_level (int): Nível em Força, derivado de `strength_xp`.
+        discipline_level (int): Nível em Disciplina, derivado de `discipline_xp`.
+        health_level (int): Nível em Saúde, derivado de `health_xp`.
+        intelligence_level (int): Nível em Inteligência, derivado de `intelligence_xp`.
+        total_level (int): Soma dos níveis dos quatro atributos.
+        total_xp (int): Soma do XP dos quatro atributos, usada no ranking geral.
+
+    Os níveis são gravados no mesmo UPDATE que incrementa o XP
+    (ver `mission_completion.add_attribute_xp`).
     """
     __tablename__ = 'character_attributes'
+    # Índices (xp, character_id) sustentam a paginação por keyset do ranking
+    __table_args__ = (
+        db.Index('ix_character_attributes_strength_rank', 'strength_xp', 'character_id'),
+        db.Index('ix_character_attributes_discipline_rank', 'discipline_xp', 'character_id'),
+        db.Index('ix_character_attributes_health_rank', 'health_xp', 'character_id'),
+        db.Index('ix_character_attributes_intelligence_rank', 'intelligence_xp', 'character_id'),
+        db.Index('ix_character_attributes_total_rank', 'total_xp', 'character_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     character_id = db.Column(db.Integer, db.ForeignKey('characters.id'), unique=True, nullable=False)
@@ -42,6 +98,12 @@ class CharacterAttribute(db.Model):
     discipline_xp = db.Column(db.Integer, default=0)
     health_xp = db.Column(db.Integer, default=0)
     intelligence_xp = db.Column(db.Integer, default=0)
+    strength_level = db.Column(db.Integer, nullable=False, default=1, server_default='1', index=True)
+    discipline_level = db.Column(db.Integer, nullable=False, default=1, server_default='1', index=True)
+    health_level = db.Column(db.Integer, nullable=False, default=1, server_default='1', index=True)
+    intelligence_level = db.Column(db.Integer, nullable=False, default=1, server_default='1', index=True)
+    total_level = db.Column(db.Integer, nullable=False, default=4, server_default='4', index=True)
+    total_xp = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relacionamento
     character = db.relationship('Character', back_populates='attributes')
@@ -64,12 +126,19 @@ class CharacterMission(db.Model):
         intelligence (bool): Indica se a missão está relacionada à Inteligência.
         completed (bool): Indica se a missão foi completada.
         streak (int): Número de vezes consecutivas que a missão foi completada.
+        title_key (str): Título normalizado (minúsculo), gerado pelo banco; usado nas
+            buscas por título e na unicidade da missão por personagem.
     """
     __tablename__ = 'character_missions'
+    __table_args__ = (
+        db.Index('ix_character_missions_character_id_completed', 'character_id', 'completed'),
+        db.Index('uq_character_missions_character_id_title_key', 'character_id', 'title_key', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     character_id = db.Column(db.Integer, db.ForeignKey('characters.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
+    title_key = db.Column(db.String(200), db.Computed('lower(title)', persisted=True))
     description = db.Column(db.Text)
     xp_reward = db.Column(db.Integer, default=0)
     difficulty = db.Column(db.String(20), nullable=False, default='Fácil')
@@ -96,11 +165,17 @@ class CharacterRelic(db.Model):
         unlocked_at (datetime): Data e hora em que a relíquia foi desbloqueada.
         bonus_type (str): Tipo de bônus passivo associado (opcional).
         bonus_value (float): Valor do bônus (opcional, exemplo: 0.05 para +5% XP).
+
+    Os bônus são aplicados ao completar missões (ver `relics`); o nome é
+    único por personagem, para o desbloqueio não duplicar a relíquia.
     """
     __tablename__ = 'character_relics'
+    __table_args__ = (
+        db.Index('uq_character_relics_character_id_name', 'character_id', 'name', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    character_id = db.Column(db.Integer, db.ForeignKey('characters.id'), nullable=False)
+    character_id = db.Column(db.Integer, db.ForeignKey('characters.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     unlocked_at = db.Column(db.DateTime, nullable=False)
@@ -137,3 +212,197 @@ class MissionTemplate(db.Model):
     discipline = db.Column(db.Boolean, default=False)
     health = db.Column(db.Boolean, default=False)
     intelligence = db.Column(db.Boolean, default=False)
+
+
+class RolloverJob(db.Model):
+    """
+    Modelo para registrar a execução da virada diária das missões.
+
+    Existe no máximo um job por dia: reexecutar a virada do mesmo dia retoma
+    o job existente em vez de aplicar a virada de novo.
+
+    Attributes:
+        id (int): Identificador único do job.
+        run_date (date): Dia da virada (único).
+        status (str): 'pending', 'running', 'done' ou 'failed'.
+        error (str): Mensagem do último erro, se houver.
+        created_at (datetime): Data e hora em que o job foi enfileirado.
+        started_at (datetime): Data e hora do início da última execução.
+        finished_at (datetime): Data e hora da conclusão.
+        partitions (relationship): Partições (faixas de personagens) do job.
+    """
+    __tablename__ = 'rollover_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_date = db.Column(db.Date, unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Relacionamento
+    partitions = db.relationship('RolloverPartition', back_populates='job', order_by='RolloverPartition.lower_id')
+
+
+class RolloverPartition(db.Model):
+    """
+    Modelo para o checkpoint de uma partição da virada diária.
+
+    A partição cobre as missões dos personagens com `character_id` entre
+    `lower_id` e `upper_id` (inclusive; `upper_id` nulo significa sem limite).
+    Ela é marcada como 'done' na mesma transação que atualiza as missões.
+
+    Attributes:
+        id (int): Identificador único da partição.
+        job_id (int): ID do job (chave estrangeira).
+        lower_id (int): Menor `character_id` da partição.
+        upper_id (int): Maior `character_id` da partição, ou nulo.
+        status (str): 'pending' ou 'done'.
+        missions (int): Missões atualizadas.
+        streak_incremented (int): Missões que tiveram o streak incrementado.
+        streak_reset (int): Missões que tiveram o streak zerado.
+        finished_at (datetime): Data e hora da conclusão.
+    """
+    __tablename__ = 'rollover_partitions'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'lower_id', name='uq_rollover_partitions_job_id_lower_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('rollover_jobs.id'), nullable=False)
+    lower_id = db.Column(db.Integer, nullable=False)
+    upper_id = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    missions = db.Column(db.Integer, nullable=False, default=0)
+    streak_incremented = db.Column(db.Integer, nullable=False, default=0)
+    streak_reset = db.Column(db.Integer, nullable=False, default=0)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Relacionamento
+    job = db.relationship('RolloverJob', back_populates='partitions')
+
+
+class MissionCompletion(db.Model):
+    """
+    Evento de conclusão de uma missão (log só de inserção).
+
+    Gravado na mesma transação que completa a missão, com o XP efetivamente
+    concedido (já com os bônus de relíquias). `/daily-update` e
+    `/reset_missions` não alteram o log; eventos antigos são removidos por
+    `flask completions compact`, e os totais continuam nos rollups.
+
+    Attributes:
+        id (int): Identificador único do evento.
+        character_id (int): ID do personagem (chave estrangeira).
+        mission_id (int): ID da missão completada (chave estrangeira).
+        completed_at (datetime): Data e hora (UTC) da conclusão.
+        strength_xp (int): XP concedido em Força.
+        discipline_xp (int): XP concedido em Disciplina.
+        health_xp (int): XP concedido em Saúde.
+        intelligence_xp (int): XP concedido em Inteligência.
+    """
+    __tablename__ = 'mission_completions'
+    __table_args__ = (
+        db.Index('ix_mission_completions_character_id_completed_at', 'character_id', 'completed_at'),
+        db.Index('ix_mission_completions_completed_at', 'completed_at'),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    character_id = db.Column(db.Integer, db.ForeignKey('characters.id'), nullable=False)
+    mission_id = db.Column(db.Integer, db.ForeignKey('character_missions.id'), nullable=False)
+    completed_at = db.Column(db.DateTime, nullable=False)
+    strength_xp = db.Column(db.Integer, nullable=False, default=0)
+    discipline_xp = db.Column(db.Integer, nullable=False, default=0)
+    health_xp = db.Column(db.Integer, nullable=False, default=0)
+    intelligence_xp = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CompletionDaily(db.Model):
+    """
+    Totais diários (UTC) das conclusões de um personagem, mantidos de forma
+    incremental a cada conclusão (ver `completion_log`).
+
+    Attributes:
+        character_id (int): ID do personagem (chave estrangeira).
+        day (date): Dia.
+        missions (int): Missões completadas no dia.
+        strength_xp (int): XP ganho em Força no dia.
+        discipline_xp (int): XP ganho em Disciplina no dia.
+        health_xp (int): XP ganho em Saúde no dia.
+        intelligence_xp (int): XP ganho em Inteligência no dia.
+    """
+    __tablename__ = 'completion_daily'
+
+    character_id = db.Column(db.Integer, db.ForeignKey('characters.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    missions = db.Column(db.Integer, nullable=False, default=0)
+    strength_xp = db.Column(db.Integer, nullable=False, default=0)
+    discipline_xp = db.Column(db.Integer, nullable=False, default=0)
+    health_xp = db.Column(db.Integer, nullable=False, default=0)
+    intelligence_xp = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CompletionWeekly(db.Model):
+    """
+    Totais semanais (semanas começando na segunda-feira, UTC) das conclusões
+    de um personagem, mantidos como `CompletionDaily`.
+
+    Attributes:
+        character_id (int): ID do personagem (chave estrangeira).
+        week_start (date): Segunda-feira da semana.
+        missions (int): Missões completadas na semana.
+        strength_xp (int): XP ganho em Força na semana.
+        discipline_xp (int): XP ganho em Disciplina na semana.
+        health_xp (int): XP ganho em Saúde na semana.
+        intelligence_xp (int): XP ganho em Inteligência na semana.
+    """
+    __tablename__ = 'completion_weekly'
+
+    character_id = db.Column(db.Integer, db.ForeignKey('characters.id'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)
+    missions = db.Column(db.Integer, nullable=False, default=0)
+    strength_xp = db.Column(db.Integer, nullable=False, default=0)
+    discipline_xp = db.Column(db.Integer, nullable=False, default=0)
+    health_xp = db.Column(db.Integer, nullable=False, default=0)
+    intelligence_xp = db.Column(db.Integer, nullable=False, default=0)
+
+
+class XPBufferCheckpoint(db.Model):
+    """
+    Modelo para registrar até onde o arquivo de spill de um buffer de XP
+    (ver `xp_buffer`) já foi aplicado ao banco.
+
+    Cada flush grava o checkpoint na mesma transação dos UPDATEs de XP, então
+    a recuperação após uma queda reaplica só os registros posteriores.
+
+    Attributes:
+        buffer_id (str): Identificador do buffer (um por processo).
+        last_seq (int): Maior número de sequência já aplicado.
+        updated_at (datetime): Data e hora (UTC) do último flush.
+    """
+    __tablename__ = 'xp_buffer_checkpoints'
+
+    buffer_id = db.Column(db.String(32), primary_key=True)
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class CharacterRegistry(db.Model):
+    """
+    Modelo do registro global de personagens, usado quando o banco está
+    dividido em shards (ver `sharding`); só a tabela do shard padrão é usada.
+
+    O registro reserva o nome (único entre todos os shards) e o ID do
+    personagem, então um personagem mantém o ID ao mudar de shard.
+
+    Attributes:
+        id (int): ID global do personagem (o mesmo de `Character.id` no shard).
+        name (str): Nome do personagem.
+        shard (str): Shard onde o personagem está.
+    """
+    __tablename__ = 'character_registry'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    shard = db.Column(db.String(32), nullable=False, index=True)
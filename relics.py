@@ -0,0 +1,265 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from models import db, dialect_insert, CharacterRelic
+from services import ATTRIBUTE_LABELS
+
+ATTRIBUTES = tuple(attr for attr, _ in ATTRIBUTE_LABELS)
+_ATTRIBUTE_INDEX = {attr: i for i, attr in enumerate(ATTRIBUTES)}
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 10000
+# Dias de streak que contam no 'mission_streak_bonus'
+STREAK_BONUS_CAP = 30
+
+# Tipos de bônus reconhecidos:
+#   '<atributo>_xp_boost': soma `bonus_value` ao multiplicador do atributo (0.05 = +5%)
+#   'xp_boost': soma `bonus_value` ao multiplicador de todos os atributos
+#   'mission_streak_bonus': soma `bonus_value` por dia de streak da missão completada
+BONUS_TYPES = frozenset([f"{attr}_xp_boost" for attr in ATTRIBUTES] + ["xp_boost", "mission_streak_bonus"])
+
+# Bônus de um personagem já combinados: multiplicadores na ordem de ATTRIBUTES,
+# bônus por dia de streak e nomes das relíquias desbloqueadas
+RelicBonuses = namedtuple("RelicBonuses", ["multipliers", "streak_bonus", "unlocked"])
+NO_BONUSES = RelicBonuses((1.0,) * len(ATTRIBUTES), 0.0, frozenset())
+
+# Relíquia desbloqueada quando `metric` (um atributo, 'total' ou 'streak') chega a `threshold`
+RelicRule = namedtuple("RelicRule", ["name", "description", "metric", "threshold", "bonus_type", "bonus_value"])
+
+RELIC_RULES = (
+    RelicRule("Punhos de Ferro", "Alcançou 5.000 de XP em Força.", "strength", 5000, "strength_xp_boost", 0.05),
+    RelicRule("Pergaminho do Asceta", "Alcançou 5.000 de XP em Disciplina.", "discipline", 5000,
+              "discipline_xp_boost", 0.05),
+    RelicRule("Amuleto da Vitalidade", "Alcançou 5.000 de XP em Saúde.", "health", 5000, "health_xp_boost", 0.05),
+    RelicRule("Tomo do Sábio", "Alcançou 5.000 de XP em Inteligência.", "intelligence", 5000,
+              "intelligence_xp_boost", 0.05),
+    RelicRule("Coroa do Aventureiro", "Somou 50.000 de XP.", "total", 50000, "xp_boost", 0.05),
+    RelicRule("Chama da Constância", "Completou uma missão com 7 dias de streak.", "streak", 7,
+              "mission_streak_bonus", 0.01),
+    RelicRule("Brasa Eterna", "Completou uma missão com 30 dias de streak.", "streak", 30,
+              "mission_streak_bonus", 0.01),
+)
+
+
+def _index_rules(rules):
+    """Agrupa as regras por métrica, ordenadas pelo limiar: (limiares, regras)."""
+    by_metric = {}
+    for rule in sorted(rules, key=lambda r: r.threshold):
+        thresholds, ordered = by_metric.setdefault(rule.metric, ([], []))
+        thresholds.append(rule.threshold)
+        ordered.append(rule)
+    return by_metric
+
+
+_RULES_BY_METRIC = _index_rules(RELIC_RULES)
+
+
+def fold_bonuses(relics):
+    """
+    Combina as relíquias de um personagem em um vetor de multiplicadores.
+
+    Bônus do mesmo tipo se somam; tipos desconhecidos são ignorados.
+
+    Args:
+        relics (iterable): Tuplas (name, bonus_type, bonus_value).
+
+    Returns:
+        RelicBonuses: Multiplicadores por atributo, bônus de streak e nomes.
+    """
+    boosts = [0.0] * len(ATTRIBUTES)
+    common = 0.0
+    streak_bonus = 0.0
+    names = set()
+    for name, bonus_type, bonus_value in relics:
+        names.add(name)
+        value = bonus_value or 0.0
+        if bonus_type == "xp_boost":
+            common += value
+        elif bonus_type == "mission_streak_bonus":
+            streak_bonus += value
+        elif bonus_type in BONUS_TYPES:
+            boosts[_ATTRIBUTE_INDEX[bonus_type[:-len("_xp_boost")]]] += value
+    return RelicBonuses(tuple(1.0 + boost + common for boost in boosts), streak_bonus, frozenset(names))
+
+
+def apply_bonuses(xp_by_attribute, bonuses, streak=0):
+    """
+    Aplica os bônus ao XP de uma missão.
+
+    Args:
+        xp_by_attribute (dict): XP base por atributo.
+        bonuses (RelicBonuses): Bônus do personagem.
+        streak (int): Streak da missão completada.
+
+    Returns:
+        dict: XP com bônus (arredondado), na mesma ordem.
+    """
+    if bonuses.multipliers == NO_BONUSES.multipliers and not bonuses.streak_bonus:
+        return dict(xp_by_attribute)
+    extra = bonuses.streak_bonus * min(streak or 0, STREAK_BONUS_CAP)
+    return {
+        attr: int(round(xp * (bonuses.multipliers[_ATTRIBUTE_INDEX[attr]] + extra)))
+        for attr, xp in xp_by_attribute.items()
+    }
+
+
+def pending_unlocks(values, unlocked):
+    """
+    Regras cujo limiar foi alcançado e que o personagem ainda não desbloqueou.
+
+    Só olha os valores atuais (XP após a missão, streak da missão), então o
+    custo é uma busca binária por métrica, sem reler o histórico.
+
+    Args:
+        values (dict): Valor atual por métrica (atributos, 'total', 'streak').
+        unlocked (frozenset): Nomes das relíquias já desbloqueadas.
+
+    Returns:
+        list: Regras a desbloquear.
+    """
+    rules = []
+    for metric, value in values.items():
+        indexed = _RULES_BY_METRIC.get(metric)
+        if indexed is None or value is None:
+            continue
+        thresholds, ordered = indexed
+        rules.extend(rule for rule in ordered[:bisect_right(thresholds, value)] if rule.name not in unlocked)
+    return rules
+
+
+class RelicBonusCache:
+    """
+    Cache LRU em memória dos bônus combinados por personagem.
+
+    Uma leitura no cache não vai ao banco; uma falta carrega as relíquias do
+    personagem com uma consulta. Entradas são descartadas depois do commit de
+    qualquer alteração de relíquia do personagem (ver `_mark_bonuses_dirty`)
+    e, para mudanças feitas por outros processos, quando o TTL expira.
+
+    Attributes:
+        ttl (float): Segundos até uma entrada ser recarregada do banco.
+        max_entries (int): Personagens mantidos no cache.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Incrementado a cada invalidação; uma carga iniciada antes dela não é guardada
+        self._generation = 0
+
+    def get(self, character_id):
+        """
+        Retorna os bônus do personagem, carregando do banco na primeira vez.
+
+        Args:
+            character_id (int): ID do personagem.
+
+        Returns:
+            RelicBonuses: Bônus combinados.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(character_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(character_id)
+                return entry[0]
+            generation = self._generation
+
+        bonuses = fold_bonuses(db.session.execute(
+            select(CharacterRelic.name, CharacterRelic.bonus_type, CharacterRelic.bonus_value)
+            .where(CharacterRelic.character_id == character_id)
+        ))
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[character_id] = (bonuses, now)
+                self._entries.move_to_end(character_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return bonuses
+
+    def invalidate(self, character_ids=None):
+        """Descarta os bônus dos personagens indicados (ou de todos)."""
+        with self._lock:
+            self._generation += 1
+            if character_ids is None:
+                self._entries.clear()
+                return
+            for character_id in character_ids:
+                self._entries.pop(character_id, None)
+
+
+relic_bonuses = RelicBonusCache()
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def unlock_relics(character_id, bonuses, values):
+    """
+    Desbloqueia as relíquias cujo limiar foi alcançado, na transação atual.
+
+    O INSERT ignora relíquias já existentes (índice único por personagem e
+    nome), então duas requisições simultâneas não duplicam a relíquia. Se
+    alguma foi inserida, os bônus do personagem são descartados do cache
+    após o commit.
+
+    Args:
+        character_id (int): ID do personagem.
+        bonuses (RelicBonuses): Bônus atuais (com os nomes já desbloqueados).
+        values (dict): Valor atual por métrica (ver `pending_unlocks`).
+
+    Returns:
+        list: Nomes das relíquias desbloqueadas agora.
+    """
+    rules = pending_unlocks(values, bonuses.unlocked)
+    if not rules:
+        return []
+
+    unlocked_at = _now()
+    rows = [
+        {"character_id": character_id, "name": rule.name, "description": rule.description,
+         "unlocked_at": unlocked_at, "bonus_type": rule.bonus_type, "bonus_value": rule.bonus_value}
+        for rule in rules
+    ]
+    # Só as linhas de fato inseridas: com o cache defasado (outro processo ou
+    # requisição simultânea), a relíquia pode já existir e não é desbloqueada de novo
+    inserted = db.session.execute(
+        dialect_insert(CharacterRelic).values(rows)
+        .on_conflict_do_nothing(index_elements=["character_id", "name"])
+        .returning(CharacterRelic.name)
+    ).scalars().all()
+    if inserted:
+        db.session.info.setdefault("relic_bonuses_dirty", set()).add(character_id)
+    return [rule.name for rule in rules if rule.name in inserted]
+
+
+@event.listens_for(CharacterRelic, "after_insert")
+@event.listens_for(CharacterRelic, "after_update")
+@event.listens_for(CharacterRelic, "after_delete")
+def _mark_bonuses_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("relic_bonuses_dirty", set()).add(target.character_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Só invalida depois do commit, para outra requisição não recarregar o estado antigo
+    character_ids = session.info.pop("relic_bonuses_dirty", None)
+    if character_ids:
+        relic_bonuses.invalidate(character_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty_flag(session):
+    session.info.pop("relic_bonuses_dirty", None)
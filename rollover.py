@@ -0,0 +1,403 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from daily_update import rollover_range
+from models import db, CharacterMission, RolloverJob, RolloverPartition
+from sharding import shards, use_shard
+
+DEFAULT_PARTITIONS = 16
+MAX_PARTITIONS = 1024
+# Cada worker usa uma conexão do pool durante a partição
+DEFAULT_WORKERS = 4
+
+
+def _now():
+    """Data e hora atuais em UTC, sem fuso (como as demais colunas DateTime)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def today():
+    """Dia da virada: a data atual em UTC."""
+    return _now().date()
+
+
+def plan_partitions(partitions=DEFAULT_PARTITIONS):
+    """
+    Divide as missões em faixas de `character_id` de mesma largura.
+
+    A primeira faixa começa em 0 e a última fica aberta, para incluir
+    missões de personagens cujos IDs estejam fora do intervalo atual quando
+    o job for executado.
+
+    Args:
+        partitions (int): Quantidade desejada de faixas.
+
+    Returns:
+        list: Pares (lower_id, upper_id); vazio se não houver missões.
+    """
+    min_id, max_id = db.session.execute(
+        select(func.min(CharacterMission.character_id), func.max(CharacterMission.character_id))
+    ).one()
+    if min_id is None:
+        return []
+
+    size = max(-(-(max_id - min_id + 1) // partitions), 1)
+    bounds = [[lower, lower + size - 1] for lower in range(min_id, max_id + 1, size)]
+    bounds[0][0] = 0
+    bounds[-1][1] = None
+    return [tuple(bound) for bound in bounds]
+
+
+def enqueue_job(run_date=None, partitions=DEFAULT_PARTITIONS):
+    """
+    Cria o job da virada do dia com suas partições, ou retorna o existente.
+
+    A unicidade de `run_date` garante no máximo uma virada por dia; um job
+    que falhou volta para 'pending' e será retomado a partir das partições
+    ainda não concluídas.
+
+    Args:
+        run_date (date, opcional): Dia da virada; padrão `today()`.
+        partitions (int): Quantidade de partições de um job novo.
+
+    Returns:
+        RolloverJob: Job do dia.
+    """
+    run_date = run_date or today()
+    job = db.session.execute(
+        select(RolloverJob).where(RolloverJob.run_date == run_date)
+    ).scalar_one_or_none()
+
+    if job is None:
+        job = RolloverJob(run_date=run_date, status='pending', created_at=_now())
+        db.session.add(job)
+        try:
+            db.session.flush()
+            bounds = plan_partitions(partitions)
+            if bounds:
+                # Um único INSERT de várias linhas em vez de um por partição
+                db.session.execute(insert(RolloverPartition).values([
+                    {"job_id": job.id, "lower_id": lower_id, "upper_id": upper_id, "status": 'pending',
+                     "missions": 0, "streak_incremented": 0, "streak_reset": 0}
+                    for lower_id, upper_id in bounds
+                ]))
+            db.session.commit()
+        except IntegrityError:
+            # Outro processo criou o job do dia ao mesmo tempo
+            db.session.rollback()
+            job = db.session.execute(
+                select(RolloverJob).where(RolloverJob.run_date == run_date)
+            ).scalar_one()
+        return job
+
+    if job.status == 'failed':
+        job.status = 'pending'
+        db.session.commit()
+    return job
+
+
+def claim_job(job_id):
+    """
+    Passa o job de 'pending' para 'running' com um UPDATE condicional, para
+    que só um worker o execute.
+
+    Returns:
+        bool: True se este chamador ficou com o job.
+    """
+    claimed = db.session.execute(
+        update(RolloverJob)
+        .where(RolloverJob.id == job_id, RolloverJob.status == 'pending')
+        .values(status='running', started_at=_now(), error=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+
+def _run_partition(app, partition_id, shard=None):
+    """
+    Aplica a virada a uma partição em uma transação própria (e portanto em
+    uma conexão própria), marcando o checkpoint no mesmo commit.
+
+    Returns:
+        bool: False se a partição já tinha sido concluída por outro worker.
+    """
+    with app.app_context():
+        use_shard(shard)
+        try:
+            partition = db.session.get(RolloverPartition, partition_id)
+            # A marcação vem primeiro: um worker concorrente fica esperando o lock
+            # da linha e, após o commit deste, não encontra mais 'pending'
+            claimed = db.session.execute(
+                update(RolloverPartition)
+                .where(RolloverPartition.id == partition_id, RolloverPartition.status == 'pending')
+                .values(status='done', finished_at=_now())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not claimed:
+                db.session.rollback()
+                return False
+
+            incremented, reset = rollover_range(partition.lower_id, partition.upper_id, partition.job.run_date)
+            db.session.execute(
+                update(RolloverPartition)
+                .where(RolloverPartition.id == partition_id)
+                .values(missions=incremented + reset, streak_incremented=incremented, streak_reset=reset)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return True
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+
+def run_job(job_id, workers=DEFAULT_WORKERS, app=None, shard=None):
+    """
+    Executa as partições pendentes de um job em um pool de threads.
+
+    Partições já concluídas são puladas, então executar de novo um job
+    interrompido apenas termina o que faltou. No SQLite as partições rodam
+    em sequência, já que o banco aceita um único escritor por vez.
+
+    Com shards, cada shard tem os próprios jobs, com as missões dele; a
+    sessão atual já deve estar fixada em `shard`.
+
+    Args:
+        job_id (int): ID do job.
+        workers (int): Partições processadas em paralelo.
+        app (Flask, opcional): Aplicação; padrão o `current_app`.
+        shard (str, opcional): Shard do job.
+
+    Returns:
+        dict: Situação final do job (ver `job_status`).
+    """
+    app = app or current_app._get_current_object()
+    db.session.execute(
+        update(RolloverJob)
+        .where(RolloverJob.id == job_id)
+        .values(status='running', started_at=func.coalesce(RolloverJob.started_at, _now()), error=None)
+        .execution_options(synchronize_session=False)
+    )
+    pending = db.session.execute(
+        select(RolloverPartition.id)
+        .where(RolloverPartition.job_id == job_id, RolloverPartition.status == 'pending')
+        .order_by(RolloverPartition.lower_id)
+    ).scalars().all()
+    db.session.commit()
+
+    if db.session.get_bind().dialect.name == 'sqlite':
+        workers = 1
+
+    errors = []
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix=f"rollover-{job_id}") as pool:
+            futures = [pool.submit(_run_partition, app, partition_id, shard) for partition_id in pending]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(str(e))
+
+    values = {"status": 'done', "finished_at": _now()}
+    if errors:
+        values = {"status": 'failed', "error": errors[0] + (f" (+{len(errors) - 1} more)" if len(errors) > 1 else "")}
+    db.session.execute(
+        update(RolloverJob)
+        .where(RolloverJob.id == job_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return job_status(job_id)
+
+
+def process_job(app, job_id, workers=DEFAULT_WORKERS, shard=None):
+    """
+    Reivindica e executa um job pendente, em um contexto de aplicação próprio.
+
+    Returns:
+        dict | None: Situação final do job, ou None se outro worker ficou com ele.
+    """
+    with app.app_context():
+        use_shard(shard)
+        try:
+            if not claim_job(job_id):
+                return None
+            return run_job(job_id, workers=workers, app=app, shard=shard)
+        except Exception as e:
+            db.session.rollback()
+            db.session.execute(
+                update(RolloverJob)
+                .where(RolloverJob.id == job_id)
+                .values(status='failed', error=str(e))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            raise
+        finally:
+            db.session.remove()
+
+
+def job_status(job_id):
+    """
+    Resume um job e o progresso das suas partições.
+
+    Returns:
+        dict | None: Situação do job, ou None se não existir.
+    """
+    job = db.session.get(RolloverJob, job_id)
+    if job is None:
+        return None
+
+    total, done, missions, incremented, reset = db.session.execute(
+        select(
+            func.count(RolloverPartition.id),
+            func.coalesce(func.sum(case((RolloverPartition.status == 'done', 1), else_=0)), 0),
+            func.coalesce(func.sum(RolloverPartition.missions), 0),
+            func.coalesce(func.sum(RolloverPartition.streak_incremented), 0),
+            func.coalesce(func.sum(RolloverPartition.streak_reset), 0)
+        ).where(RolloverPartition.job_id == job_id)
+    ).one()
+
+    return {
+        "id": job.id,
+        "run_date": job.run_date.isoformat(),
+        "status": job.status,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "partitions": {"total": total, "done": done},
+        "summary": {"missions": missions, "streak_incremented": incremented, "streak_reset": reset}
+    }
+
+
+class RolloverWorker:
+    """
+    Thread em segundo plano que executa, um por vez, os jobs enfileirados
+    pelo endpoint HTTP no próprio processo da aplicação.
+
+    A thread é criada no primeiro `submit`. Submeter o mesmo job duas vezes
+    é inofensivo: `claim_job` garante uma única execução.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, app, job_id, workers=DEFAULT_WORKERS, shard=None):
+        """Enfileira um job (do `shard`, com shards) para execução em segundo plano."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="rollover-worker", daemon=True)
+                self._thread.start()
+        self._queue.put((app, job_id, workers, shard))
+
+    def _run(self):
+        while True:
+            app, job_id, workers, shard = self._queue.get()
+            try:
+                process_job(app, job_id, workers, shard)
+            except Exception:
+                app.logger.exception("Rollover job %s failed", job_id)
+            finally:
+                self._queue.task_done()
+
+
+rollover_worker = RolloverWorker()
+
+
+# ---------------------------------------------------------------------------
+# CLI: flask rollover run / worker / status
+# ---------------------------------------------------------------------------
+
+rollover_cli = AppGroup("rollover", help="Virada diária das missões, particionada e retomável.")
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def _use_cli_shard(shard):
+    if shard is not None and shard not in shards.shards:
+        raise click.BadParameter(f"expected one of {', '.join(shards.shards)}", param_hint="--shard")
+    use_shard(shard)
+
+
+_shard_option = click.option("--shard", default=None, help="Shard do job (com SHARD_URIS); padrão o banco padrão.")
+
+
+@rollover_cli.command("run")
+@click.option("--date", "run_date", default=None, help="Dia da virada (AAAA-MM-DD); padrão hoje (UTC).")
+@click.option("--partitions", type=click.IntRange(1, MAX_PARTITIONS), default=DEFAULT_PARTITIONS, show_default=True,
+              help="Partições de um job novo.")
+@click.option("--workers", type=click.IntRange(1), default=DEFAULT_WORKERS, show_default=True)
+@_shard_option
+def run_command(run_date, partitions, workers, shard):
+    """Executa (ou retoma) a virada do dia neste processo."""
+    _use_cli_shard(shard)
+    job = enqueue_job(_parse_date(run_date), partitions=partitions)
+    if job.status == 'done':
+        click.echo(f"Rollover for {job.run_date.isoformat()} already done", err=True)
+        status = job_status(job.id)
+    else:
+        status = run_job(job.id, workers=workers, shard=shard)
+    click.echo(json.dumps(status, indent=2))
+    if status["status"] != 'done':
+        raise SystemExit(1)
+
+
+@rollover_cli.command("worker")
+@click.option("--interval", type=float, default=10.0, show_default=True,
+              help="Segundos entre as buscas por jobs pendentes.")
+@click.option("--workers", type=click.IntRange(1), default=DEFAULT_WORKERS, show_default=True)
+@click.option("--once", is_flag=True, help="Processa os jobs pendentes e sai.")
+def worker_command(interval, workers, once):
+    """Processa os jobs enfileirados pelo endpoint HTTP (ROLLOVER_WORKER=external), em todos os shards."""
+    app = current_app._get_current_object()
+    while True:
+        for shard in shards.shards:
+            with app.app_context():
+                use_shard(shard)
+                job_ids = db.session.execute(
+                    select(RolloverJob.id).where(RolloverJob.status == 'pending').order_by(RolloverJob.id)
+                ).scalars().all()
+                db.session.remove()
+            for job_id in job_ids:
+                try:
+                    status = process_job(app, job_id, workers, shard)
+                    if status is not None:
+                        click.echo(json.dumps(dict(status, shard=shard)))
+                except Exception as e:
+                    click.echo(f"Rollover job {job_id} on {shard} failed: {e}", err=True)
+        if once:
+            return
+        time.sleep(interval)
+
+
+@rollover_cli.command("status")
+@click.option("--date", "run_date", default=None, help="Dia da virada (AAAA-MM-DD); padrão hoje (UTC).")
+@_shard_option
+def status_command(run_date, shard):
+    """Mostra a situação do job de um dia."""
+    _use_cli_shard(shard)
+    job_id = db.session.execute(
+        select(RolloverJob.id).where(RolloverJob.run_date == (_parse_date(run_date) or today()))
+    ).scalar_one_or_none()
+    if job_id is None:
+        raise click.ClickException("No rollover job for this date")
+    click.echo(json.dumps(job_status(job_id), indent=2))
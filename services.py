@@ -1,35 +1,31 @@
+from functools import lru_cache
+
 from flask import jsonify
 
+from level_curve import DEFAULT_CURVE
+
+# Pares (prefixo da coluna, nome exibido) dos atributos, na ordem da API
+ATTRIBUTE_LABELS = (
+    ("strength", "Força"),
+    ("discipline", "Disciplina"),
+    ("health", "Saúde"),
+    ("intelligence", "Inteligência"),
+)
+
 def calculate_level_and_next(xp):
     """
     Calcula o nível atual e a quantidade de XP necessária para o próximo nível.
 
+    A tabela de limiares é montada uma vez em `level_curve` e a busca é
+    binária; use `level_curve.levels_for_batch` para muitos valores de XP.
+
     Args:
         xp (int): XP atual do personagem.
 
     Returns:
         tuple: (nível atual, XP necessário para o próximo nível, XP restante até o próximo nível)
     """
-    LEVEL_THRESHOLDS = [
-        0, 100, 250, 450, 700, 1000, 1400, 1900, 2500, 3200,
-        4000, 4900, 5900, 7000, 8200, 9500, 10900, 12400, 14000, 15700
-    ]
-
-    level = 1
-    for i, threshold in enumerate(LEVEL_THRESHOLDS):
-        if xp >= threshold:
-            level = i + 1
-        else:
-            break
-
-    if level < len(LEVEL_THRESHOLDS):
-        next_threshold = LEVEL_THRESHOLDS[level]
-        xp_to_next = next_threshold - xp
-    else:
-        next_threshold = None
-        xp_to_next = 0  # já está no nível máximo
-
-    return level, next_threshold, xp_to_next
+    return DEFAULT_CURVE.level_for(xp)
 
 def _build_cors_preflight_response():
     """
@@ -44,6 +40,14 @@ def _build_cors_preflight_response():
     response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
     return response
 
+# XP por dificuldade; também usado para montar o CASE das atualizações em massa
+XP_BY_DIFFICULTY = {
+    "Fácil": 30,
+    "Médio": 50,
+    "Difícil": 70
+}
+DEFAULT_XP = 30
+
 def get_xp_by_difficulty(difficulty):
     """
     Retorna o XP correspondente à dificuldade da missão.
@@ -54,9 +58,23 @@ def get_xp_by_difficulty(difficulty):
     Returns:
         int: XP correspondente.
     """
-    xp_values = {
-        "Fácil": 30,
-        "Médio": 50,
-        "Difícil": 70
-    }
-    return xp_values.get(difficulty, 30)
+    return XP_BY_DIFFICULTY.get(difficulty, DEFAULT_XP)
+
+@lru_cache(maxsize=None)
+def related_attributes(strength, discipline, health, intelligence):
+    """
+    Retorna os nomes dos atributos relacionados a uma missão a partir das flags.
+
+    Há poucas combinações possíveis de flags, então o resultado é memorizado.
+
+    Args:
+        strength (bool): Missão relacionada à Força.
+        discipline (bool): Missão relacionada à Disciplina.
+        health (bool): Missão relacionada à Saúde.
+        intelligence (bool): Missão relacionada à Inteligência.
+
+    Returns:
+        tuple: Nomes dos atributos relacionados, na ordem da API.
+    """
+    flags = (strength, discipline, health, intelligence)
+    return tuple(label for (_, label), flag in zip(ATTRIBUTE_LABELS, flags) if flag)
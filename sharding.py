@@ -0,0 +1,599 @@
+import hashlib
+import json
+import queue
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, text, update
+
+from db_routing import pin_session
+from models import (
+    db, dialect_insert, Character, CharacterAttribute, CharacterMission, CharacterRegistry, CharacterRelic,
+    CompletionDaily, CompletionWeekly, MissionCompletion, MissionTemplate
+)
+
+# O banco padrão (SQLALCHEMY_DATABASE_URI) é sempre o shard 0
+DEFAULT_SHARD = "shard_0"
+DEFAULT_VNODES = 128
+DEFAULT_FANOUT_WORKERS = 8
+REBALANCE_BATCH_SIZE = 500
+# Itens por shard aguardando o consumidor em `fan_out_iter`
+FANOUT_BUFFER_SIZE = 4
+
+# Tabelas com as linhas de um personagem, na ordem de inserção (pais primeiro)
+CHARACTER_TABLES = (
+    Character.__table__, CharacterAttribute.__table__, CharacterMission.__table__, CharacterRelic.__table__,
+    MissionCompletion.__table__, CompletionDaily.__table__, CompletionWeekly.__table__,
+)
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Anel de hashing consistente dos nomes de personagem nos shards.
+
+    Cada shard ocupa `vnodes` pontos do anel e um nome pertence ao primeiro
+    ponto a partir do seu hash. Ao acrescentar um shard, só cerca de 1/N dos
+    nomes muda de dono, e todos vão para o shard novo.
+    """
+
+    def __init__(self, shards, vnodes=DEFAULT_VNODES):
+        points = sorted((_hash(f"{shard}#{i}"), shard) for shard in shards for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, name):
+        if not self._owners:
+            return DEFAULT_SHARD
+        return self._owners[bisect_right(self._hashes, _hash(name)) % len(self._owners)]
+
+
+class ShardMap:
+    """
+    Shards configurados e o anel que distribui os personagens entre eles.
+
+    Attributes:
+        shards (tuple): Nomes dos shards, começando por `DEFAULT_SHARD`.
+        ring (HashRing): Anel dos nomes.
+        lookup (bool): Durante um rebalanceamento, consulta o registro em vez
+            de confiar só no anel (ver `locate`).
+        registry_checked (bool): Se `reserve_characters` já confirmou que o
+            registro cobre os personagens do shard padrão.
+    """
+
+    def __init__(self):
+        self.configure((DEFAULT_SHARD,))
+
+    def configure(self, shards, vnodes=DEFAULT_VNODES, lookup=False):
+        self.shards = tuple(shards)
+        self.ring = HashRing(self.shards, vnodes)
+        self.lookup = lookup
+        self.registry_checked = False
+
+    @property
+    def enabled(self):
+        return len(self.shards) > 1
+
+    def owner(self, name):
+        """Shard do personagem segundo o anel."""
+        return self.ring.shard_for(name)
+
+    def locate(self, name):
+        """
+        Shard onde o personagem está.
+
+        Fora de um rebalanceamento é o dono no anel, sem consulta. Com
+        `lookup`, o registro é consultado (uma busca pelo nome no shard
+        padrão), pois personagens ainda não movidos estão fora do dono.
+        """
+        if self.lookup:
+            with engine_for(DEFAULT_SHARD).connect() as conn:
+                shard = conn.execute(
+                    select(CharacterRegistry.shard).where(CharacterRegistry.name == name)
+                ).scalar()
+            if shard in self.shards:
+                return shard
+        return self.owner(name)
+
+
+shards = ShardMap()
+
+
+def bind_key(shard):
+    """Chave do bind do Flask-SQLAlchemy de um shard (None para o shard padrão)."""
+    return None if shard == DEFAULT_SHARD else shard
+
+
+def engine_for(shard):
+    return db.engines[bind_key(shard)]
+
+
+def use_shard(shard):
+    """Fixa a sessão atual no shard (None não altera a sessão)."""
+    if shard is not None:
+        pin_session(db.session, bind_key(shard))
+
+
+# ---------------------------------------------------------------------------
+# Registro global: nomes únicos e IDs que não mudam ao trocar de shard
+# ---------------------------------------------------------------------------
+
+def reserve_characters(names):
+    """
+    Reserva nomes no registro global, cada um no seu dono no anel.
+
+    Na primeira reserva do processo, confere que nenhum personagem do shard
+    padrão está fora do registro (o nome dele seria aceito de novo).
+
+    Args:
+        names (list): Nomes dos personagens a criar.
+
+    Returns:
+        dict: {nome: ID} só dos nomes reservados agora; nomes já usados em
+            qualquer shard ficam de fora.
+
+    Raises:
+        RuntimeError: Se há personagens fora do registro (rode `flask shards init`).
+    """
+    if not names:
+        return {}
+    if not shards.registry_checked:
+        missing = unregistered_characters()
+        if missing:
+            raise RuntimeError(
+                f"{missing} characters are missing from character_registry; run `flask shards init` first"
+            )
+        shards.registry_checked = True
+    with engine_for(DEFAULT_SHARD).begin() as conn:
+        stmt = (
+            dialect_insert(CharacterRegistry, bind=conn)
+            .values([{"name": name, "shard": shards.owner(name)} for name in names])
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(CharacterRegistry.id, CharacterRegistry.name)
+        )
+        return {name: character_id for character_id, name in conn.execute(stmt)}
+
+
+def release_characters(character_ids):
+    """Desfaz reservas de `reserve_characters` cujos personagens não foram criados."""
+    character_ids = list(character_ids)
+    if not character_ids:
+        return
+    with engine_for(DEFAULT_SHARD).begin() as conn:
+        conn.execute(delete(CharacterRegistry).where(CharacterRegistry.id.in_(character_ids)))
+
+
+def sync_registry(batch_size=REBALANCE_BATCH_SIZE):
+    """
+    Registra os personagens que ainda não estão no registro (por exemplo os
+    criados antes da divisão em shards), com o shard onde estão.
+
+    Returns:
+        int: Personagens registrados.
+    """
+    registered = 0
+    with engine_for(DEFAULT_SHARD).connect() as directory:
+        for shard in shards.shards:
+            last_id = 0
+            while True:
+                with engine_for(shard).connect() as conn:
+                    rows = conn.execute(
+                        select(Character.id, Character.name)
+                        .where(Character.id > last_id).order_by(Character.id).limit(batch_size)
+                    ).all()
+                if not rows:
+                    break
+                registered += directory.execute(
+                    dialect_insert(CharacterRegistry, bind=directory)
+                    .values([{"id": row.id, "name": row.name, "shard": shard} for row in rows])
+                    .on_conflict_do_nothing()
+                ).rowcount
+                directory.commit()
+                last_id = rows[-1].id
+
+        if directory.dialect.name == "postgresql":
+            # IDs inseridos explicitamente não avançam a sequência
+            directory.execute(text(
+                "SELECT setval(pg_get_serial_sequence('character_registry', 'id'), "
+                "GREATEST((SELECT MAX(id) FROM character_registry), 1))"
+            ))
+            directory.commit()
+    return registered
+
+
+def unregistered_characters():
+    """
+    Personagens do shard padrão ausentes do registro: criados sem shards
+    depois da migração do registro e ainda não registrados por `sync_registry`.
+
+    Returns:
+        int: Quantidade de personagens sem registro.
+    """
+    with engine_for(DEFAULT_SHARD).connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(Character).where(
+                ~select(CharacterRegistry.id).where(CharacterRegistry.name == Character.name).exists()
+            )
+        ).scalar()
+
+
+def sync_templates():
+    """
+    Copia o catálogo de templates do shard padrão, com os mesmos IDs, para
+    os demais shards, substituindo o que houver neles.
+
+    Templates são escritos só no shard padrão; as rotas de personagem leem
+    a cópia do próprio shard.
+
+    Returns:
+        int: Templates copiados para cada shard.
+    """
+    templates = MissionTemplate.__table__
+    with engine_for(DEFAULT_SHARD).connect() as conn:
+        rows = [dict(row) for row in conn.execute(select(templates)).mappings()]
+    for shard in shards.shards[1:]:
+        with engine_for(shard).begin() as conn:
+            conn.execute(delete(templates))
+            if rows:
+                conn.execute(insert(templates), rows)
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Operações em todos os shards
+# ---------------------------------------------------------------------------
+
+def _run_on_shard(app, shard, fn):
+    with app.app_context():
+        use_shard(shard)
+        try:
+            return fn(shard)
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+
+def fan_out(fn, app=None, workers=None):
+    """
+    Executa `fn(shard)` em todos os shards, em paralelo em um pool de threads.
+
+    Cada chamada tem um contexto de aplicação próprio, com `db.session`
+    fixada no shard; o commit fica com `fn`. Sem shards, `fn` roda uma vez
+    no contexto atual.
+
+    Args:
+        fn (callable): Recebe o nome do shard.
+        app (Flask, opcional): Aplicação; padrão o `current_app`.
+        workers (int, opcional): Threads; padrão `SHARD_FANOUT_WORKERS`.
+
+    Returns:
+        dict: {shard: resultado de `fn`}.
+
+    Raises:
+        Exception: A primeira exceção de um shard (os outros shards já
+            podem ter feito commit).
+    """
+    if not shards.enabled:
+        return {DEFAULT_SHARD: fn(DEFAULT_SHARD)}
+
+    app = app or current_app._get_current_object()
+    workers = workers or app.config.get("SHARD_FANOUT_WORKERS", DEFAULT_FANOUT_WORKERS)
+    with ThreadPoolExecutor(max_workers=min(workers, len(shards.shards)), thread_name_prefix="shard") as pool:
+        results = pool.map(lambda shard: _run_on_shard(app, shard, fn), shards.shards)
+        return dict(zip(shards.shards, results))
+
+
+def fan_out_iter(fn, app=None):
+    """
+    Como `fan_out`, para geradores: `fn(shard)` é percorrido em paralelo em
+    todos os shards e os itens são entregues conforme chegam, sem ordem
+    entre shards.
+
+    A fila é limitada, então um consumidor lento (uma resposta em streaming)
+    segura os shards; se o consumidor para, os shards também param.
+
+    Yields:
+        Itens produzidos por `fn` nos shards.
+    """
+    if not shards.enabled:
+        yield from fn(DEFAULT_SHARD)
+        return
+
+    app = app or current_app._get_current_object()
+    items = queue.Queue(maxsize=FANOUT_BUFFER_SIZE * len(shards.shards))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(shard):
+        def drain(shard):
+            for item in fn(shard):
+                if not put(("item", item)):
+                    return
+        try:
+            _run_on_shard(app, shard, drain)
+        except Exception as e:
+            put(("error", e))
+        finally:
+            put(("done", shard))
+
+    for shard in shards.shards:
+        threading.Thread(target=produce, args=(shard,), name=f"fan-out-{shard}", daemon=True).start()
+
+    remaining = len(shards.shards)
+    try:
+        while remaining:
+            kind, value = items.get()
+            if kind == "item":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                remaining -= 1
+    finally:
+        stop.set()
+
+
+# ---------------------------------------------------------------------------
+# Rebalanceamento: move personagens para o dono no anel, com o app no ar
+# ---------------------------------------------------------------------------
+
+def _owner_column(table):
+    return table.c.id if table is Character.__table__ else table.c.character_id
+
+
+def _delete_character(conn, character_id):
+    for table in reversed(CHARACTER_TABLES):
+        conn.execute(delete(table).where(_owner_column(table) == character_id))
+
+
+def _insertable(table, row, keep_id):
+    return {
+        column.name: row[column.name] for column in table.c
+        if column.computed is None and (keep_id or column.name != "id")
+    }
+
+
+def _insert_character(conn, rows):
+    """
+    Insere as linhas lidas por `move_character`. O personagem mantém o ID;
+    as linhas filhas com ID próprio ganham IDs novos no shard de destino.
+    """
+    characters, missions, completions = Character.__table__, CharacterMission.__table__, MissionCompletion.__table__
+    mission_ids = {}
+    for table in CHARACTER_TABLES:
+        if not rows[table]:
+            continue
+        keep_id = table is characters or "id" not in table.c
+        values = [_insertable(table, row, keep_id) for row in rows[table]]
+        if table is missions:
+            new_ids = conn.execute(
+                insert(missions).returning(missions.c.id, sort_by_parameter_order=True), values
+            ).scalars().all()
+            mission_ids = dict(zip((row["id"] for row in rows[table]), new_ids))
+            continue
+        if table is completions:
+            for value in values:
+                value["mission_id"] = mission_ids[value["mission_id"]]
+        conn.execute(insert(table), values)
+
+
+def _registry_shard(conn, character_id):
+    return conn.execute(select(CharacterRegistry.shard).where(CharacterRegistry.id == character_id)).scalar()
+
+
+def _set_registry_shard(conn, character_id, shard):
+    conn.execute(update(CharacterRegistry).where(CharacterRegistry.id == character_id).values(shard=shard))
+
+
+def move_character(character_id, source, target):
+    """
+    Move um personagem e todas as suas linhas de `source` para `target`.
+
+    1. No source, incrementa a versão do personagem: o lock da linha segura
+       as escritas concorrentes (todas incrementam a versão) até o passo 4.
+    2. Copia as linhas para o target e faz commit.
+    3. Aponta o registro para o target: daí em diante, com
+       SHARD_REBALANCING, as requisições do personagem vão ao target.
+    4. Apaga as linhas do source e faz commit, liberando o lock.
+
+    Quando o source ou o target é o shard padrão, o registro é atualizado na
+    mesma transação dele. Um movimento interrompido pode ser repetido: se o
+    registro ainda aponta para o source, a cópia no target é refeita; se já
+    aponta para o target, só falta apagar o source. Escritas que esperavam
+    o lock não encontram mais o personagem no source e falham; as
+    requisições seguintes já vão ao target.
+
+    Args:
+        character_id (int): ID do personagem.
+        source (str): Shard onde o personagem está.
+        target (str): Shard de destino.
+
+    Returns:
+        bool: False se o personagem não estava mais no source.
+    """
+    characters = Character.__table__
+    with engine_for(source).connect() as src:
+        locked = src.execute(
+            update(characters).where(characters.c.id == character_id).values(version=characters.c.version + 1)
+        ).rowcount
+        if not locked:
+            src.rollback()
+            return False
+
+        if source == DEFAULT_SHARD:
+            located = _registry_shard(src, character_id)
+        else:
+            with engine_for(DEFAULT_SHARD).connect() as directory:
+                located = _registry_shard(directory, character_id)
+
+        if located != target:
+            rows = {
+                table: src.execute(select(table).where(_owner_column(table) == character_id)).mappings().all()
+                for table in CHARACTER_TABLES
+            }
+            with engine_for(target).begin() as dst:
+                _delete_character(dst, character_id)
+                _insert_character(dst, rows)
+                if target == DEFAULT_SHARD:
+                    _set_registry_shard(dst, character_id, target)
+            if source == DEFAULT_SHARD:
+                _set_registry_shard(src, character_id, target)
+            elif target != DEFAULT_SHARD:
+                with engine_for(DEFAULT_SHARD).begin() as directory:
+                    _set_registry_shard(directory, character_id, target)
+
+        _delete_character(src, character_id)
+        src.commit()
+    return True
+
+
+def rebalance_shard(shard, dry_run=False, batch_size=REBALANCE_BATCH_SIZE):
+    """
+    Move para o dono no anel os personagens de um shard que pertencem a outro.
+
+    Returns:
+        dict: Personagens verificados, fora do lugar, movidos e com falha.
+    """
+    report = {"checked": 0, "misplaced": 0, "moved": 0, "failed": 0}
+    last_id = 0
+    while True:
+        with engine_for(shard).connect() as conn:
+            rows = conn.execute(
+                select(Character.id, Character.name)
+                .where(Character.id > last_id).order_by(Character.id).limit(batch_size)
+            ).all()
+        if not rows:
+            return report
+        for character_id, name in rows:
+            report["checked"] += 1
+            owner = shards.owner(name)
+            if owner == shard:
+                continue
+            report["misplaced"] += 1
+            if dry_run:
+                continue
+            try:
+                report["moved"] += move_character(character_id, shard, owner)
+            except Exception:
+                current_app.logger.exception("Moving character %s from %s to %s failed", character_id, shard, owner)
+                report["failed"] += 1
+        last_id = rows[-1].id
+
+
+def shard_status():
+    """
+    Returns:
+        dict: {shard: {'characters': n, 'misplaced': n}} segundo o anel atual.
+    """
+    def count(shard):
+        with engine_for(shard).connect() as conn:
+            names = conn.execute(select(Character.name)).scalars()
+            total = misplaced = 0
+            for name in names:
+                total += 1
+                misplaced += shards.owner(name) != shard
+        return {"characters": total, "misplaced": misplaced}
+    return fan_out(count)
+
+
+def init_sharding(app, db):
+    """
+    Configura o `shards` a partir dos binds criados em `init_database` e fixa
+    cada requisição com `<name>` na URL no shard do personagem.
+
+    Configurações lidas de `app.config`:
+        SHARD_VNODES: pontos de cada shard no anel (o mesmo em todos os processos).
+        SHARD_REBALANCING: consulta o registro para achar o shard de cada
+            personagem; ligado enquanto `flask shards rebalance` move personagens.
+        SHARD_FANOUT_WORKERS: threads das operações em todos os shards.
+
+    Args:
+        app (Flask): Aplicação.
+        db (SQLAlchemy): Extensão do Flask-SQLAlchemy já inicializada.
+    """
+    from config import shard_binds
+
+    names = (DEFAULT_SHARD, *shard_binds(app.config.get("DATABASE_SETTINGS", {})))
+    shards.configure(
+        names, vnodes=app.config.get("SHARD_VNODES", DEFAULT_VNODES),
+        lookup=app.config.get("SHARD_REBALANCING", False)
+    )
+    if not shards.enabled:
+        return
+    # O buffer agrupa o XP de todos os personagens em um flush e um checkpoint por processo
+    if app.config.get("XP_WRITE_BEHIND", False):
+        raise RuntimeError("XP_WRITE_BEHIND is not supported with SHARD_URIS")
+
+    @app.before_request
+    def _use_character_shard():
+        name = (request.view_args or {}).get("name")
+        if name is not None:
+            use_shard(shards.locate(name))
+
+
+# ---------------------------------------------------------------------------
+# CLI: flask shards init / status / rebalance / sync-templates
+# ---------------------------------------------------------------------------
+
+shards_cli = AppGroup("shards", help="Divisão dos personagens em shards e rebalanceamento.")
+
+
+@shards_cli.command("init")
+def init_command():
+    """
+    Prepara os shards: registra os personagens existentes e copia os templates.
+
+    Cada shard precisa das migrações (`flask db upgrade` com
+    SUPABASE_CONNECTION_URL apontando para ele). Rode antes de ligar os
+    shards nos processos da API e depois use `flask shards rebalance`.
+    """
+    registered = sync_registry()
+    templates = sync_templates()
+    click.echo(f"registered {registered} characters, copied {templates} templates to {len(shards.shards) - 1} shards")
+
+
+@shards_cli.command("sync-templates")
+def sync_templates_command():
+    """Copia os templates do shard padrão para os demais."""
+    click.echo(f"copied {sync_templates()} templates to {len(shards.shards) - 1} shards")
+
+
+@shards_cli.command("status")
+def status_command():
+    """Personagens por shard e quantos estão fora do dono no anel."""
+    click.echo(json.dumps(shard_status(), indent=2))
+
+
+@shards_cli.command("rebalance")
+@click.option("--dry-run", is_flag=True, help="Só conta os personagens fora do lugar.")
+@click.option("--batch-size", type=click.IntRange(1), default=REBALANCE_BATCH_SIZE, show_default=True)
+def rebalance_command(dry_run, batch_size):
+    """
+    Move os personagens para o dono no anel, um por vez, com a API no ar.
+
+    Enquanto houver personagens fora do lugar, os processos da API precisam
+    de SHARD_REBALANCING=True para localizá-los pelo registro.
+    """
+    # No SQLite, movimentos em paralelo esperariam uns pelos locks de arquivo dos outros
+    workers = 1 if engine_for(DEFAULT_SHARD).dialect.name == "sqlite" else None
+    reports = fan_out(lambda shard: rebalance_shard(shard, dry_run=dry_run, batch_size=batch_size), workers=workers)
+    click.echo(json.dumps(reports, indent=2))
+    if any(report["failed"] for report in reports.values()):
+        raise SystemExit(1)
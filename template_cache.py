@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from json_provider import TemplatePayload
+from models import MissionTemplate
+from services import related_attributes
+
+DEFAULT_TTL_SECONDS = 300
+
+# Dados do template necessários para criar uma missão, sem objetos ORM presos à sessão
+CachedTemplate = namedtuple(
+    "CachedTemplate",
+    ["id", "title", "description", "difficulty", "strength", "discipline", "health", "intelligence"]
+)
+
+
+class TemplateCatalog:
+    """
+    Cache em memória do catálogo de missões pré-definidas.
+
+    Guarda o JSON já serializado de `GET /missions/templates`, o ETag desse
+    corpo e um mapa id → template. É recarregado quando o TTL expira ou quando
+    `invalidate()` é chamado (automaticamente ao gravar um `MissionTemplate`
+    pelo ORM).
+
+    Attributes:
+        ttl (float): Segundos até o catálogo ser recarregado do banco.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._body = None
+        self._etag = None
+        self._by_id = {}
+        self._loaded_at = None
+
+    def invalidate(self):
+        """Descarta o catálogo; a próxima leitura recarrega do banco."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _is_fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+
+            by_id = {}
+            payload = []
+            for t in MissionTemplate.query.order_by(MissionTemplate.id):
+                by_id[t.id] = CachedTemplate(
+                    t.id, t.title, t.description, t.difficulty,
+                    t.strength, t.discipline, t.health, t.intelligence
+                )
+                payload.append(TemplatePayload(
+                    t.id, t.title, t.description, t.xp_reward, t.difficulty,
+                    related_attributes(t.strength, t.discipline, t.health, t.intelligence)
+                ))
+
+            body = current_app.json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            self._body = body
+            self._etag = hashlib.sha1(body).hexdigest()
+            self._by_id = by_id
+            self._loaded_at = time.monotonic()
+
+    def serialized(self):
+        """
+        Retorna o catálogo serializado.
+
+        Returns:
+            tuple: (corpo JSON em bytes, ETag)
+        """
+        self._ensure_loaded()
+        return self._body, self._etag
+
+    def etag(self):
+        """Retorna o ETag atual do catálogo, recarregando se necessário."""
+        self._ensure_loaded()
+        return self._etag
+
+    def get(self, template_id):
+        """
+        Busca um template pelo ID sem ir ao banco.
+
+        Args:
+            template_id (int | str): ID do template.
+
+        Returns:
+            CachedTemplate | None: Template encontrado.
+        """
+        try:
+            template_id = int(template_id)
+        except (TypeError, ValueError):
+            return None
+        self._ensure_loaded()
+        return self._by_id.get(template_id)
+
+
+template_catalog = TemplateCatalog()
+
+
+@event.listens_for(MissionTemplate, "after_insert")
+@event.listens_for(MissionTemplate, "after_update")
+@event.listens_for(MissionTemplate, "after_delete")
+def _mark_catalog_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["template_catalog_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Só invalida depois do commit, para outra requisição não recarregar o estado antigo
+    if session.info.pop("template_catalog_dirty", False):
+        template_catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty_flag(session):
+    session.info.pop("template_catalog_dirty", None)
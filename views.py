@@ -1,69 +1,196 @@
+import io
 from datetime import datetime
-from flask import Flask, request, jsonify
-from models import db, Character, CharacterAttribute, CharacterMission, MissionTemplate
-from sqlalchemy import func
-from services import calculate_level_and_next, _build_cors_preflight_response, get_xp_by_difficulty
-from flask_cors import CORS
-from flask_migrate import Migrate
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
-
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SUPABASE_CONNECTION_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
-migrate = Migrate(app, db)
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
+from models import db, Character, CharacterAttribute, CharacterMission
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from services import _build_cors_preflight_response, get_xp_by_difficulty
+from rollover import DEFAULT_PARTITIONS, DEFAULT_WORKERS, MAX_PARTITIONS, enqueue_job, job_status, rollover_worker
+from character_snapshot import load_character_snapshot, serialize_character
+from character_cache import (
+    bump_character_version, bump_versions_for, character_cache, character_etag, payload_variant, version_statement
+)
+from mission_completion import complete_mission_atomic, complete_missions_batch
+from daily_update import catch_up_character, rollover_gap
+from completion_log import MAX_HISTORY_DAYS, streak_calendar, xp_history
+from template_cache import template_catalog
+from xp_buffer import xp_buffer
+from db_routing import replica_reads
+from sharding import DEFAULT_SHARD, fan_out, release_characters, reserve_characters, shards, use_shard
+from bulk_io import BATCH_SIZE as BULK_BATCH_SIZE, READERS, WRITERS, import_records, iter_export_records
+from leaderboard import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RANKINGS, leaderboard_page, rank_of
+from mission_listing import (
+    ATTRIBUTE_FILTERS, DEFAULT_PAGE_SIZE as LISTING_PAGE_SIZE, MAX_PAGE_SIZE as LISTING_MAX_PAGE_SIZE,
+    first_missions, missions_query, stream_json, stream_ndjson
+)
+
+bp = Blueprint('api', __name__)
+
+def _rolled_over_character_id(name):
+    # ID do personagem, aplicando antes as viradas pendentes às missões dele
+    row = db.session.execute(
+        select(Character.id, Character.last_rollover_date).where(Character.name == name)
+    ).one_or_none()
+    if row is None:
+        return None
+    catch_up_character(row.id, row.last_rollover_date)
+    return row.id
+
+def _reset_completed(shard):
+    # Reseta as missões concluídas de um shard (ver `sharding.fan_out`)
+    bump_versions_for(select(CharacterMission.character_id).where(CharacterMission.completed == True))
+    updated_count = db.session.query(CharacterMission).filter_by(completed=True).update(
+        {'completed': False},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return updated_count
+
+def _enqueue_rollover(shard, partitions):
+    # Enfileira a virada de um shard; cada shard tem os próprios jobs
+    config = current_app.config
+    job = enqueue_job(partitions=partitions)
+    # Com ROLLOVER_WORKER=external, o job fica para `flask rollover worker`
+    if job.status == 'pending' and config.get('ROLLOVER_WORKER', 'thread') == 'thread':
+        rollover_worker.submit(
+            current_app._get_current_object(), job.id,
+            workers=config.get('ROLLOVER_WORKERS', DEFAULT_WORKERS), shard=shard
+        )
+    return job_status(job.id)
 
-@app.route('/')
+@bp.route('/')
 def home():
     return "RPG Habits API is running"
 
-@app.route('/character/<string:name>', methods=['GET', 'OPTIONS'])
+@bp.route('/character/<string:name>', methods=['GET', 'OPTIONS'])
+@replica_reads
 def get_character(name):
     if request.method == 'OPTIONS':
         return _build_cors_preflight_response()
 
-    character = Character.query.filter_by(name=name).first()
+    compact = request.args.get('fields') == 'compact'
+    omit_missions = request.args.get('missions') == 'none'
+    missions_limit = request.args.get('missions_limit', type=int)
+    if missions_limit is not None:
+        missions_limit = min(max(missions_limit, 1), LISTING_MAX_PAGE_SIZE)
+    variant = payload_variant(compact, omit_missions, missions_limit)
+
+    # Só a versão (índice único do nome) decide o 304 e a chave do cache
+    current = db.session.execute(version_statement(name)).one_or_none()
+    if current is None:
+        return jsonify({"error": "Character not found"}), 404
+    if rollover_gap(current.last_rollover_date):
+        # Escrita: vai ao primário e fixa nele o resto da requisição (ver `RoutingSession`)
+        catch_up_character(current.id, current.last_rollover_date)
+        current = db.session.execute(version_statement(name)).one()
+
+    # XP de conclusões ainda no buffer write-behind deste processo: a versão já
+    # mudou, mas outro processo pode ter guardado essa versão sem esse XP, então
+    # nem o 304 nem o cache compartilhado servem (e o corpo não é guardado)
+    pending = xp_buffer.view(current.id)
+
+    etag = character_etag(current.id, current.version, variant)
+    if not pending and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    body = None if pending else character_cache.get(name, current.version, variant)
+    if body is not None:
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        return response
+
+    character = load_character_snapshot(
+        name, compact=compact, include_missions=not omit_missions and missions_limit is None
+    )
     if not character:
         return jsonify({"error": "Character not found"}), 404
 
     if not character.attributes:
         return jsonify({"error": "Character attributes not found"}), 404
 
+    attribute_xp = None
+    if pending:
+        attribute_xp, _ = pending.merge(db.session.execute(pending.statement()).one())
+
+    if omit_missions:
+        data = serialize_character(character, compact=compact, missions=(), attribute_xp=attribute_xp)
+        del data["missions"]
+    elif missions_limit is not None:
+        missions, next_cursor = first_missions(character.id, missions_limit)
+        data = serialize_character(character, compact=compact, missions=missions, attribute_xp=attribute_xp)
+        data["missions_next_cursor"] = next_cursor
+    else:
+        data = serialize_character(character, compact=compact, attribute_xp=attribute_xp)
+
+    # O snapshot pode ser de uma versão mais nova que a consultada acima
+    body = current_app.json.response(data).get_data()
+    if not pending:
+        character_cache.set(name, character.version, variant, body)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(character_etag(character.id, character.version, variant))
+    return response
+
+@bp.route('/character/<string:name>/missions', methods=['GET'])
+@replica_reads
+def list_character_missions(name):
+    character_id = _rolled_over_character_id(name)
+    if character_id is None:
+        return jsonify({"error": "Character not found"}), 404
+
+    limit = min(max(request.args.get('limit', LISTING_PAGE_SIZE, type=int), 1), LISTING_MAX_PAGE_SIZE)
+    after_id = request.args.get('cursor', type=int)
+
+    completed = request.args.get('completed')
+    if completed is not None:
+        completed = completed.lower() in ('1', 'true', 'yes')
+
+    attribute = request.args.get('attribute')
+    if attribute is not None:
+        if attribute not in ATTRIBUTE_FILTERS:
+            return jsonify({"error": "Invalid attribute"}), 400
+        attribute = ATTRIBUTE_FILTERS[attribute]
+
+    stmt = missions_query(
+        character_id, limit, after_id=after_id, completed=completed,
+        difficulty=request.args.get('difficulty'), attribute=attribute
+    )
+
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(stream_ndjson(stmt, limit)), mimetype='application/x-ndjson')
+    return Response(stream_with_context(stream_json(stmt, limit)), mimetype='application/json')
+
+@bp.route('/character/<string:name>/history', methods=['GET'])
+@replica_reads
+def get_character_history(name):
+    character_id = db.session.query(Character.id).filter_by(name=name).scalar()
+    if character_id is None:
+        return jsonify({"error": "Character not found"}), 404
+
+    period = request.args.get('period', 'day')
+    if period not in ('day', 'week'):
+        return jsonify({"error": "Invalid period, expected 'day' or 'week'"}), 400
+    days = min(max(request.args.get('days', 30, type=int), 1), MAX_HISTORY_DAYS)
+
+    # Lido dos rollups diário/semanal, sem varrer o log de conclusões
     return jsonify({
-        "name": character.name,
-        "attributes": {
-            "Força": {"xp": character.attributes.strength_xp},
-            "Disciplina": {"xp": character.attributes.discipline_xp},
-            "Saúde": {"xp": character.attributes.health_xp},
-            "Inteligência": {"xp": character.attributes.intelligence_xp},
-        },
-        "missions": [
-            {
-                "title": mission.title,
-                "description": mission.description,
-                "xp_reward": mission.xp_reward,
-                "difficulty": mission.difficulty,
-                "related_attributes": [
-                    attr for attr, flag in [
-                        ("Força", mission.strength),
-                        ("Disciplina", mission.discipline),
-                        ("Saúde", mission.health),
-                        ("Inteligência", mission.intelligence)
-                    ] if flag
-                ],
-                "completed": mission.completed
-            }
-            for mission in character.missions
-        ]
+        "period": period,
+        "days": days,
+        "entries": xp_history(character_id, period=period, days=days)
     })
 
-@app.route('/character', methods=['POST', 'OPTIONS'])
+@bp.route('/character/<string:name>/calendar', methods=['GET'])
+@replica_reads
+def get_character_calendar(name):
+    character_id = db.session.query(Character.id).filter_by(name=name).scalar()
+    if character_id is None:
+        return jsonify({"error": "Character not found"}), 404
+
+    days = min(max(request.args.get('days', 90, type=int), 1), MAX_HISTORY_DAYS)
+    return jsonify(streak_calendar(character_id, days=days))
+
+@bp.route('/character', methods=['POST', 'OPTIONS'])
 def create_character():
     if request.method == 'OPTIONS':
         return _build_cors_preflight_response()
@@ -74,11 +201,19 @@ def create_character():
     if not name:
         return jsonify({"error": "Missing name"}), 400
 
-    if Character.query.filter_by(name=name).first():
+    if not shards.enabled and Character.query.filter_by(name=name).first():
         return jsonify({"error": "Character name already exists"}), 400
 
+    reserved = {}
     try:
-        character = Character(name=name)
+        # Com shards, o registro global garante o nome único e fornece o ID
+        if shards.enabled:
+            reserved = reserve_characters([name])
+            if name not in reserved:
+                return jsonify({"error": "Character name already exists"}), 400
+            use_shard(shards.owner(name))
+
+        character = Character(id=reserved.get(name), name=name)
         attributes = CharacterAttribute(character=character)
         db.session.add(character)
         db.session.add(attributes)
@@ -91,31 +226,57 @@ def create_character():
 
     except Exception as e:
         db.session.rollback()
+        release_characters(reserved.values())
         return jsonify({"error": str(e)}), 500
 
-@app.route('/missions/templates', methods=['GET'])
+@bp.route('/missions/templates', methods=['GET'])
+@replica_reads
 def list_mission_templates():
-    templates = MissionTemplate.query.all()
-    return jsonify([
-        {
-            "id": t.id,
-            "title": t.title,
-            "description": t.description,
-            "xp_reward": t.xp_reward,
-            "difficulty": t.difficulty,
-            "related_attributes": [
-                attr for attr, flag in [
-                    ("Força", t.strength),
-                    ("Disciplina", t.discipline),
-                    ("Saúde", t.health),
-                    ("Inteligência", t.intelligence)
-                ] if flag
-            ]
-        }
-        for t in templates
-    ])
+    etag = template_catalog.etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    body, etag = template_catalog.serialized()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+@bp.route('/leaderboard', methods=['GET'])
+@replica_reads
+def get_leaderboard():
+    by = request.args.get('by', 'total')
+    if by not in RANKINGS:
+        return jsonify({"error": f"Invalid ranking, expected one of {sorted(RANKINGS)}"}), 400
+
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
 
-@app.route('/character/<string:name>/mission', methods=['POST'])
+    try:
+        entries, next_cursor = leaderboard_page(by, limit=limit, cursor=request.args.get('cursor'))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    return jsonify({
+        "by": by,
+        "entries": entries,
+        "next_cursor": next_cursor
+    })
+
+@bp.route('/leaderboard/rank/<string:name>', methods=['GET'])
+@replica_reads
+def get_leaderboard_rank(name):
+    by = request.args.get('by', 'total')
+    if by not in RANKINGS:
+        return jsonify({"error": f"Invalid ranking, expected one of {sorted(RANKINGS)}"}), 400
+
+    result = rank_of(name, by, app=current_app._get_current_object())
+    if result is None:
+        return jsonify({"error": "Character not found"}), 404
+
+    return jsonify(result)
+
+@bp.route('/character/<string:name>/mission', methods=['POST'])
 def add_mission(name):
     data = request.get_json()
     title = data.get("title")
@@ -130,6 +291,7 @@ def add_mission(name):
     character = Character.query.filter_by(name=name).first()
     if not character:
         return jsonify({"error": "Character not found"}), 404
+    catch_up_character(character.id, character.last_rollover_date)
 
     try:
         mission = CharacterMission(
@@ -145,15 +307,20 @@ def add_mission(name):
         )
 
         db.session.add(mission)
+        bump_character_version(character.id)
         db.session.commit()
 
         return jsonify({"message": "Mission added successfully"}), 201
 
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Character already has this mission"}), 400
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/character/<string:name>/mission/template', methods=['POST'])
+@bp.route('/character/<string:name>/mission/template', methods=['POST'])
 def add_mission_from_template(name):
     data = request.get_json()
     template_id = data.get("template_id")
@@ -164,12 +331,16 @@ def add_mission_from_template(name):
     character = Character.query.filter_by(name=name).first()
     if not character:
         return jsonify({"error": "Character not found"}), 404
+    catch_up_character(character.id, character.last_rollover_date)
 
-    template = MissionTemplate.query.get(template_id)
+    template = template_catalog.get(template_id)
     if not template:
         return jsonify({"error": "Mission template not found"}), 404
 
-    existing_mission = CharacterMission.query.filter_by(character_id=character.id, title=template.title).first()
+    existing_mission = db.session.query(CharacterMission.id).filter(
+        CharacterMission.character_id == character.id,
+        CharacterMission.title_key == func.lower(template.title)
+    ).first()
     if existing_mission:
         return jsonify({"error": "Character already has this mission"}), 400
 
@@ -188,15 +359,20 @@ def add_mission_from_template(name):
             intelligence=template.intelligence
         )
         db.session.add(mission)
+        bump_character_version(character.id)
         db.session.commit()
 
         return jsonify({"message": "Mission added successfully"}), 201
 
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Character already has this mission"}), 400
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/character/<string:name>/complete_mission', methods=['POST'])
+@bp.route('/character/<string:name>/complete_mission', methods=['POST'])
 def complete_mission(name):
     data = request.get_json()
     mission_title = data.get("mission_title")
@@ -204,69 +380,91 @@ def complete_mission(name):
     if not mission_title:
         return jsonify({"error": "Missing mission_title"}), 400
 
-    character = Character.query.filter_by(name=name).first()
-    if not character:
+    character_id = _rolled_over_character_id(name)
+    if character_id is None:
         return jsonify({"error": "Character not found"}), 404
 
-    mission = CharacterMission.query.filter(
-        CharacterMission.character_id == character.id,
-        func.lower(CharacterMission.title) == func.lower(mission_title),
-        CharacterMission.completed == False
-    ).first()
+    try:
+        result = complete_mission_atomic(character_id, mission_title)
+        if result is None:
+            return jsonify({"error": "Mission not found or already completed"}), 404
+
+        title, progress, relics = result
+        return jsonify({
+            "message": f"Missão '{title}' completada!",
+            "attribute_progress": progress,
+            "relics_unlocked": relics
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
 
-    if not mission:
-        return jsonify({"error": "Mission not found or already completed"}), 404
+@bp.route('/character/<string:name>/complete_missions', methods=['POST'])
+def complete_missions(name):
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    mission_titles = data.get("mission_titles", [])
+    mission_ids = data.get("mission_ids", [])
+
+    if not isinstance(mission_titles, list) or not isinstance(mission_ids, list):
+        return jsonify({"error": "mission_titles and mission_ids must be lists"}), 400
+    if not mission_titles and not mission_ids:
+        return jsonify({"error": "Missing mission_titles or mission_ids"}), 400
+
+    character_id = _rolled_over_character_id(name)
+    if character_id is None:
+        return jsonify({"error": "Character not found"}), 404
 
     try:
-        attributes = character.attributes
-        xp = mission.xp_reward
+        completed, errors, progress, relics = complete_missions_batch(
+            character_id, mission_titles=mission_titles, mission_ids=mission_ids
+        )
 
-        response_data = {
-            "message": f"Missão '{mission.title}' completada!",
-            "attribute_progress": {}
-        }
+        return jsonify({
+            "message": f"{len(completed)} missões completadas!",
+            "completed": completed,
+            "errors": errors,
+            "attribute_progress": progress,
+            "relics_unlocked": relics
+        })
 
-        
-        def update_attribute(attr_name):
-            attr_xp = getattr(attributes, f"{attr_name}_xp") or 0  # força 0 se for None
-            attr_xp += xp
-            setattr(attributes, f"{attr_name}_xp", attr_xp)
-
-            level, next_threshold, xp_to_next = calculate_level_and_next(attr_xp)
-
-            response_data["attribute_progress"][attr_name] = {
-                "xp": attr_xp,
-                "level": level,
-                "xp_to_next_level": xp_to_next,
-                "next_level_at": next_threshold
-            }
-
-        if mission.strength:
-            update_attribute("strength")
-        if mission.discipline:
-            update_attribute("discipline")
-        if mission.health:
-            update_attribute("health")
-        if mission.intelligence:
-            update_attribute("intelligence")
-
-        mission.completed = True
-        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify(response_data)
+@bp.route('/bulk/import', methods=['POST'])
+def bulk_import():
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in READERS:
+        return jsonify({"error": f"Invalid format, expected one of {sorted(READERS)}"}), 400
+
+    batch_size = min(max(request.args.get('batch_size', BULK_BATCH_SIZE, type=int), 1), 10000)
+
+    try:
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        report = import_records(READERS[fmt](lines), batch_size=batch_size)
+        return jsonify(report), 200
 
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/reset_missions', methods=['POST'])
+@bp.route('/bulk/export', methods=['GET'])
+@replica_reads
+def bulk_export():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in WRITERS:
+        return jsonify({"error": f"Invalid format, expected one of {sorted(WRITERS)}"}), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(WRITERS[fmt](iter_export_records())), mimetype=mimetype)
+
+@bp.route('/reset_missions', methods=['POST'])
 def reset_all_missions():
     try:
-        updated_count = db.session.query(CharacterMission).filter_by(completed=True).update(
-            {'completed': False},
-            synchronize_session=False
-        )
-        db.session.commit()
+        updated_count = sum(fan_out(_reset_completed).values())
 
         return jsonify({
             "message": f"Missões resetadas com sucesso! {updated_count} missões foram reiniciadas.",
@@ -277,36 +475,53 @@ def reset_all_missions():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/daily-update', methods=['POST'])
+@bp.route('/daily-update', methods=['POST'])
 def check_missions():
-    missions = CharacterMission.query.all()
-    results = []
-
-    for mission in missions:
-        if mission.completed:
-            mission.streak += 1
-        else:
-            mission.streak = 0
-
-        mission.xp_reward = get_xp_by_difficulty(mission.difficulty)
-        mission.completed = False
-
-        results.append({
-            'mission_id': mission.id,
-            'mission_title': mission.title,
-            'xp_reward': mission.xp_reward,
-            'current_streak': mission.streak
-        })
+    # Só enfileira a virada; o andamento é consultado em GET /daily-update/<job_id>.
+    # Chamadas repetidas no mesmo dia retornam o mesmo job. Personagens acessados
+    # já viram no primeiro acesso do dia, então o job só varre os que sobraram
+    # Com shards, cada shard recebe o próprio job e a resposta traz um por shard
+    config = current_app.config
+    partitions = request.args.get('partitions', config.get('ROLLOVER_PARTITIONS', DEFAULT_PARTITIONS), type=int)
+    partitions = min(max(partitions, 1), MAX_PARTITIONS)
 
-    db.session.commit()
+    try:
+        jobs = fan_out(lambda shard: _enqueue_rollover(shard, partitions))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
 
-    return jsonify({
-        'status': 'success',
-        'message': 'Missions checked, streaks and XP updated',
-        'missions': results
-    }), 200
-
-if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if all(status['status'] == 'done' for status in jobs.values()):
+        response = {'status': 'success', 'message': 'Daily update already done'}
+        code = 200
+    else:
+        response = {'status': 'accepted', 'message': 'Daily update enqueued'}
+        code = 202
+
+    if not shards.enabled:
+        status = jobs[DEFAULT_SHARD]
+        response['job'] = status
+        if code == 202:
+            response['status_url'] = url_for('api.daily_update_status', job_id=status['id'])
+        return jsonify(response), code
+
+    response['jobs'] = jobs
+    if code == 202:
+        response['status_urls'] = {
+            shard: url_for('api.daily_update_status', job_id=status['id'], shard=shard)
+            for shard, status in jobs.items()
+        }
+    return jsonify(response), code
+
+@bp.route('/daily-update/<int:job_id>', methods=['GET'])
+def daily_update_status(job_id):
+    shard = request.args.get('shard')
+    if shard is not None:
+        if shard not in shards.shards:
+            return jsonify({"error": "Shard not found"}), 404
+        use_shard(shard)
+
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status), 200
@@ -0,0 +1,4 @@
+from app import create_app
+
+# Ponto de entrada para servidores WSGI, por exemplo: gunicorn wsgi:app
+app = create_app()
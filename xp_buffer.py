@@ -0,0 +1,547 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+from leaderboard import record_xp_change
+from level_curve import DEFAULT_CURVE
+from models import db, dialect_insert, Character, CharacterAttribute, XPBufferCheckpoint
+from services import ATTRIBUTE_LABELS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - dependência opcional (só em sistemas POSIX)
+    fcntl = None
+
+ATTRIBUTES = tuple(attr for attr, _ in ATTRIBUTE_LABELS)
+
+DEFAULT_FLUSH_SECONDS = 1.0
+# Personagens com XP pendente que disparam um flush antes do intervalo
+DEFAULT_MAX_CHARACTERS = 500
+# O spill é truncado depois de um flush completo quando passa deste tamanho
+DEFAULT_MAX_SPILL_BYTES = 16 * 1024 * 1024
+# IDs por instrução nos UPDATEs e SELECTs com IN
+ID_CHUNK = 1000
+
+SPILL_PREFIX = "xp-"
+SPILL_SUFFIX = ".log"
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def xp_increment_values(deltas):
+    """
+    Valores do UPDATE relativo de `character_attributes` (`x_xp = x_xp + delta`).
+
+    Cada atributo alterado tem o nível recalculado na mesma instrução;
+    `total_level` muda pela diferença entre o nível novo e o antigo e
+    `total_xp` recebe a soma dos deltas.
+
+    Args:
+        deltas (dict): Delta por atributo, como inteiro ou parâmetro (`bindparam`).
+
+    Returns:
+        dict: Valores por coluna para `update(...).values()`.
+    """
+    values = {}
+    total_level = CharacterAttribute.total_level
+    for attr, xp in deltas.items():
+        column = getattr(CharacterAttribute, f"{attr}_xp")
+        level_column = getattr(CharacterAttribute, f"{attr}_level")
+        new_xp = func.coalesce(column, 0) + xp
+        new_level = DEFAULT_CURVE.sql_level(new_xp)
+        values[column] = new_xp
+        values[level_column] = new_level
+        total_level = total_level + (new_level - level_column)
+    values[CharacterAttribute.total_level] = total_level
+    values[CharacterAttribute.total_xp] = func.coalesce(CharacterAttribute.total_xp, 0) + sum(deltas.values())
+    return values
+
+
+def _increment_statement(attributes):
+    """UPDATE com um parâmetro de delta por atributo, executado uma vez por personagem (executemany)."""
+    return (
+        update(CharacterAttribute.__table__)
+        .where(CharacterAttribute.character_id == bindparam("b_character_id"))
+        .values(xp_increment_values({attr: bindparam(f"b_{attr}") for attr in attributes}))
+    )
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), ID_CHUNK):
+        yield ids[start:start + ID_CHUNK]
+
+
+def apply_xp_deltas(buffer_id, batch, last_seq):
+    """
+    Aplica deltas de XP acumulados e grava o checkpoint do buffer, na
+    transação atual (o commit fica com quem chama).
+
+    Os personagens são agrupados pelos atributos alterados, então um lote
+    vira poucas instruções UPDATE executadas em modo executemany. A versão
+    dos personagens é incrementada (invalida ETag e cache de
+    `GET /character/<name>`) e as mudanças vão para o `rank_index` após o commit.
+
+    Args:
+        buffer_id (str): Identificador do buffer dono do spill.
+        batch (dict): Deltas por personagem: {character_id: {atributo: xp}}.
+        last_seq (int): Maior sequência do spill incluída no lote.
+    """
+    by_shape = {}
+    for character_id, deltas in batch.items():
+        shape = tuple(attr for attr in ATTRIBUTES if deltas.get(attr))
+        if shape:
+            by_shape.setdefault(shape, []).append(character_id)
+
+    for shape, character_ids in by_shape.items():
+        db.session.execute(_increment_statement(shape), [
+            dict({"b_character_id": character_id}, **{f"b_{attr}": batch[character_id][attr] for attr in shape})
+            for character_id in character_ids
+        ])
+
+    character_ids = sorted(cid for ids in by_shape.values() for cid in ids)
+    xp_columns = [getattr(CharacterAttribute, f"{attr}_xp") for attr in ATTRIBUTES]
+    for chunk in _chunks(character_ids):
+        db.session.execute(
+            update(Character)
+            .where(Character.id.in_(chunk))
+            .values(version=Character.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        rows = db.session.execute(
+            select(CharacterAttribute.character_id, *xp_columns, CharacterAttribute.total_xp)
+            .where(CharacterAttribute.character_id.in_(chunk))
+        )
+        for row in rows:
+            deltas = batch[row.character_id]
+            for attr, xp in zip(ATTRIBUTES, row[1:]):
+                if deltas.get(attr):
+                    record_xp_change(db.session, attr, xp - deltas[attr], xp)
+            record_xp_change(db.session, "total", row.total_xp - sum(deltas.values()), row.total_xp)
+
+    stmt = dialect_insert(XPBufferCheckpoint).values(buffer_id=buffer_id, last_seq=last_seq, updated_at=_now())
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["buffer_id"],
+        set_={"last_seq": stmt.excluded.last_seq, "updated_at": stmt.excluded.updated_at}
+    ))
+
+
+def current_xp_statement(character_id, buffer_id):
+    """
+    XP atual do personagem no banco junto com o checkpoint do buffer, lidos
+    na mesma instrução (portanto no mesmo snapshot).
+    """
+    applied = select(XPBufferCheckpoint.last_seq).where(XPBufferCheckpoint.buffer_id == buffer_id).scalar_subquery()
+    return select(
+        *[getattr(CharacterAttribute, f"{attr}_xp") for attr in ATTRIBUTES],
+        CharacterAttribute.total_xp,
+        func.coalesce(applied, 0).label("applied_seq")
+    ).where(CharacterAttribute.character_id == character_id)
+
+
+class PendingXP:
+    """
+    XP de um personagem ainda no buffer, fotografado antes da leitura do banco.
+
+    O lote em flush e os deltas pendentes só são somados se o checkpoint
+    lido junto com o XP (ver `current_xp_statement`) ainda não os cobre, então
+    a soma fica correta mesmo se um flush terminar no meio da leitura.
+    """
+
+    __slots__ = ("buffer_id", "character_id", "pending", "pending_seq", "in_flight", "in_flight_seq")
+
+    def __init__(self, buffer_id, character_id, pending=None, pending_seq=0, in_flight=None, in_flight_seq=0):
+        self.buffer_id = buffer_id
+        self.character_id = character_id
+        self.pending = pending
+        self.pending_seq = pending_seq
+        self.in_flight = in_flight
+        self.in_flight_seq = in_flight_seq
+
+    def __bool__(self):
+        return bool(self.pending or self.in_flight)
+
+    def statement(self):
+        return current_xp_statement(self.character_id, self.buffer_id)
+
+    def merge(self, row):
+        """
+        Args:
+            row: Linha de `statement()`.
+
+        Returns:
+            tuple: (XP por atributo, `total_xp`) com os deltas ainda não aplicados.
+        """
+        xp = {attr: getattr(row, f"{attr}_xp") or 0 for attr in ATTRIBUTES}
+        total_xp = row.total_xp or 0
+        for deltas, seq in ((self.in_flight, self.in_flight_seq), (self.pending, self.pending_seq)):
+            if deltas and row.applied_seq < seq:
+                for attr, delta in deltas.items():
+                    xp[attr] += delta
+                    total_xp += delta
+        return xp, total_xp
+
+
+class XPWriteBuffer:
+    """
+    Buffer write-behind do XP das conclusões de missão, por processo.
+
+    Cada conclusão confirmada vira uma linha no arquivo de spill (append-only,
+    com `fsync` opcional) e um delta somado em memória por personagem e
+    atributo. Uma thread aplica os deltas acumulados a cada
+    `flush_seconds` (ou antes, ao passar de `max_characters` personagens) com
+    `apply_xp_deltas`, trocando um UPDATE por conclusão na linha quente de
+    `character_attributes` por poucos UPDATEs em lote.
+
+    O spill tem o nome `xp-<buffer_id>.log` e fica travado (flock) enquanto o
+    processo vive; `recover_spill_files` reaplica os arquivos de processos
+    que caíram a partir do checkpoint gravado em cada flush.
+
+    Attributes:
+        enabled (bool): Se o modo write-behind está ativo.
+        buffer_id (str): Identificador deste processo (definido ao abrir o spill).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.buffer_id = None
+        self.directory = None
+        self.flush_seconds = DEFAULT_FLUSH_SECONDS
+        self.max_characters = DEFAULT_MAX_CHARACTERS
+        self.max_spill_bytes = DEFAULT_MAX_SPILL_BYTES
+        self.fsync = True
+        self._app = None
+        self._lock = threading.Lock()
+        # Um flush por vez (a thread, `close` ou a CLI)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._path = None
+        self._seq = 0
+        self._pending = {}
+        # Lote em flush: (deltas por personagem, última sequência incluída)
+        self._in_flight = None
+
+    def configure(self, app, directory, flush_seconds=DEFAULT_FLUSH_SECONDS, max_characters=DEFAULT_MAX_CHARACTERS,
+                  max_spill_bytes=DEFAULT_MAX_SPILL_BYTES, fsync=True):
+        self._app = app
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.max_characters = max_characters
+        self.max_spill_bytes = max_spill_bytes
+        self.fsync = fsync
+        self.enabled = True
+
+    def _open_spill(self):
+        # Chamado com o lock; o arquivo só existe no processo que recebe conclusões
+        # (depois de um fork, cada worker abre o seu)
+        os.makedirs(self.directory, exist_ok=True)
+        buffer_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, f"{SPILL_PREFIX}{buffer_id}{SPILL_SUFFIX}")
+        # Travado antes de ganhar o nome final, para a recuperação nunca tomar um spill vivo
+        fd = os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(path + ".tmp", path)
+        self.buffer_id, self._fd, self._path, self._seq = buffer_id, fd, path, 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="xp-buffer", daemon=True)
+            self._thread.start()
+
+    def add(self, character_id, deltas):
+        """
+        Registra o XP de uma conclusão já confirmada no banco.
+
+        Args:
+            character_id (int): ID do personagem.
+            deltas (dict): XP por atributo.
+        """
+        with self._lock:
+            if self._fd is None:
+                self._open_spill()
+                atexit.register(self.close)
+            self._seq += 1
+            record = {"seq": self._seq, "character_id": character_id, "xp": deltas}
+            os.write(self._fd, json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+            pending = self._pending.setdefault(character_id, {})
+            for attr, xp in deltas.items():
+                pending[attr] = pending.get(attr, 0) + xp
+            full = len(self._pending) >= self.max_characters
+            self._ensure_thread()
+            fd = self._fd
+        if self.fsync:
+            # Fora do lock: escritas concorrentes aproveitam o mesmo fsync
+            os.fsync(fd)
+        if full:
+            self._wake.set()
+
+    def stage(self, session, character_id, deltas):
+        """Agenda `add` para depois do commit da sessão (descartado no rollback)."""
+        session.info.setdefault("xp_buffer_staged", []).append((character_id, deltas))
+
+    def view(self, character_id):
+        """
+        Fotografa o XP pendente do personagem; deve ser chamado antes da
+        leitura do banco (ver `PendingXP`).
+
+        Returns:
+            PendingXP: Deltas ainda não aplicados (falso se não houver nenhum).
+        """
+        with self._lock:
+            pending = self._pending.get(character_id)
+            in_flight, in_flight_seq = None, 0
+            if self._in_flight is not None:
+                in_flight, in_flight_seq = self._in_flight[0].get(character_id), self._in_flight[1]
+            return PendingXP(
+                self.buffer_id, character_id, dict(pending) if pending else None, self._seq,
+                dict(in_flight) if in_flight else None, in_flight_seq
+            )
+
+    def flush(self):
+        """
+        Aplica os deltas pendentes ao banco; precisa de um contexto de aplicação.
+
+        Em caso de erro o lote volta para os pendentes e a exceção é propagada.
+
+        Returns:
+            int: Personagens atualizados.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, last_seq = self._pending, self._seq
+                self._pending = {}
+                self._in_flight = (batch, last_seq)
+            try:
+                apply_xp_deltas(self.buffer_id, batch, last_seq)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    for character_id, deltas in batch.items():
+                        pending = self._pending.setdefault(character_id, {})
+                        for attr, xp in deltas.items():
+                            pending[attr] = pending.get(attr, 0) + xp
+                    self._in_flight = None
+                raise
+
+            with self._lock:
+                self._in_flight = None
+                # Tudo o que está no spill já foi aplicado: o arquivo pode recomeçar vazio
+                if not self._pending and os.fstat(self._fd).st_size > self.max_spill_bytes:
+                    os.ftruncate(self._fd, 0)
+            return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    self._app.logger.exception("XP buffer flush failed")
+                finally:
+                    db.session.remove()
+
+    def close(self):
+        """
+        Aplica o que falta e remove o spill (usado no encerramento do processo).
+
+        Se o flush falhar, o spill fica para `recover_spill_files`.
+        """
+        if self._fd is None or self._app is None:
+            return
+        with self._app.app_context():
+            try:
+                self.flush()
+                with self._lock:
+                    if self._pending:
+                        return
+                    os.unlink(self._path)
+                    os.close(self._fd)
+                    self._fd = None
+                db.session.execute(delete(XPBufferCheckpoint).where(XPBufferCheckpoint.buffer_id == self.buffer_id))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self._app.logger.exception("XP buffer was not fully flushed; the spill file will be replayed")
+            finally:
+                db.session.remove()
+
+
+xp_buffer = XPWriteBuffer()
+
+
+def buffer_attribute_xp(character_id, xp_by_attribute):
+    """
+    Versão write-behind de `mission_completion.add_attribute_xp`: lê o XP
+    atual (banco + pendentes), agenda os deltas no buffer para depois do
+    commit e não escreve em `character_attributes`.
+
+    Returns:
+        tuple: (XP resultante de cada atributo informado, `total_xp` resultante);
+            ({}, None) se o personagem não tiver atributos.
+    """
+    pending = xp_buffer.view(character_id)
+    row = db.session.execute(pending.statement()).one_or_none()
+    if row is None:
+        return {}, None
+
+    xp, total_xp = pending.merge(row)
+    xp_buffer.stage(db.session, character_id, dict(xp_by_attribute))
+    new_xp = {attr: xp[attr] + delta for attr, delta in xp_by_attribute.items()}
+    return new_xp, total_xp + sum(xp_by_attribute.values())
+
+
+@event.listens_for(Session, "after_commit")
+def _add_staged_after_commit(session):
+    # Só entra no buffer (e no spill) o XP de conclusões efetivamente confirmadas
+    for character_id, deltas in session.info.pop("xp_buffer_staged", ()):
+        xp_buffer.add(character_id, deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_staged(session):
+    session.info.pop("xp_buffer_staged", None)
+
+
+def _read_spill(fd, applied_seq):
+    """
+    Lê os registros de um spill posteriores a `applied_seq`, somados por
+    personagem. Uma última linha incompleta (queda no meio da escrita) é ignorada.
+
+    Returns:
+        tuple: (deltas por personagem, maior sequência lida, registros lidos)
+    """
+    with os.fdopen(os.dup(fd), "rb") as spill:
+        spill.seek(0)
+        batch, last_seq, records = {}, applied_seq, 0
+        for line in spill:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record["seq"] <= applied_seq:
+                continue
+            pending = batch.setdefault(record["character_id"], {})
+            for attr, xp in record["xp"].items():
+                pending[attr] = pending.get(attr, 0) + xp
+            last_seq = max(last_seq, record["seq"])
+            records += 1
+    return batch, last_seq, records
+
+
+def recover_spill_files(directory):
+    """
+    Reaplica os spills deixados por processos que caíram antes do flush.
+
+    Spills ainda travados por um processo vivo são ignorados. Só os
+    registros posteriores ao checkpoint do buffer são aplicados, então
+    rodar a recuperação de novo (ou cair no meio dela) não duplica XP.
+
+    Args:
+        directory (str): Diretório dos spills.
+
+    Returns:
+        dict: Arquivos recuperados, registros reaplicados e personagens afetados.
+    """
+    report = {"files": 0, "records": 0, "characters": 0}
+    for path in sorted(glob.glob(os.path.join(directory, f"{SPILL_PREFIX}*{SPILL_SUFFIX}"))):
+        buffer_id = os.path.basename(path)[len(SPILL_PREFIX):-len(SPILL_SUFFIX)]
+        if buffer_id == xp_buffer.buffer_id:
+            continue
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+            applied_seq = db.session.execute(
+                select(XPBufferCheckpoint.last_seq).where(XPBufferCheckpoint.buffer_id == buffer_id)
+            ).scalar() or 0
+            batch, last_seq, records = _read_spill(fd, applied_seq)
+            if batch:
+                apply_xp_deltas(buffer_id, batch, last_seq)
+                db.session.commit()
+            # O checkpoint só é removido depois do arquivo: uma queda entre os dois
+            # deixa um checkpoint órfão, nunca um spill sem checkpoint
+            os.unlink(path)
+            db.session.execute(delete(XPBufferCheckpoint).where(XPBufferCheckpoint.buffer_id == buffer_id))
+            db.session.commit()
+        finally:
+            os.close(fd)
+        report["files"] += 1
+        report["records"] += records
+        report["characters"] += len(batch)
+    return report
+
+
+def spill_directory(app):
+    return app.config.get("XP_BUFFER_DIR") or os.path.join(app.instance_path, "xp_buffer")
+
+
+def init_xp_buffer(app):
+    """
+    Configura o `xp_buffer` a partir de `app.config`:
+
+        XP_WRITE_BEHIND: ativa o modo write-behind (padrão False).
+        XP_BUFFER_DIR: diretório dos spills (padrão `<instance_path>/xp_buffer`).
+        XP_BUFFER_FLUSH_SECONDS: intervalo entre flushes.
+        XP_BUFFER_MAX_CHARACTERS: personagens pendentes que antecipam o flush.
+        XP_BUFFER_FSYNC: `fsync` a cada conclusão (padrão True).
+        XP_BUFFER_RECOVER: reaplica spills órfãos ao iniciar (padrão: fora da CLI).
+
+    Args:
+        app (Flask): Aplicação.
+    """
+    if not app.config.get("XP_WRITE_BEHIND", False):
+        return
+
+    directory = spill_directory(app)
+    xp_buffer.configure(
+        app, directory,
+        flush_seconds=app.config.get("XP_BUFFER_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS),
+        max_characters=app.config.get("XP_BUFFER_MAX_CHARACTERS", DEFAULT_MAX_CHARACTERS),
+        max_spill_bytes=app.config.get("XP_BUFFER_MAX_SPILL_BYTES", DEFAULT_MAX_SPILL_BYTES),
+        fsync=app.config.get("XP_BUFFER_FSYNC", True)
+    )
+    # Na CLI (por exemplo `flask db upgrade`) as tabelas podem ainda não existir
+    if app.config.get("XP_BUFFER_RECOVER", click.get_current_context(silent=True) is None):
+        with app.app_context():
+            report = recover_spill_files(directory)
+            if report["files"]:
+                app.logger.warning(
+                    "Replayed %d XP records from %d spill files", report["records"], report["files"]
+                )
+
+
+xp_buffer_cli = AppGroup("xp-buffer", help="Buffer write-behind do XP das conclusões.")
+
+
+@xp_buffer_cli.command("recover")
+@click.option("--dir", "directory", default=None, help="Diretório dos spills; padrão XP_BUFFER_DIR.")
+def recover_command(directory):
+    """Reaplica os spills de processos que caíram antes do flush."""
+    report = recover_spill_files(directory or spill_directory(current_app))
+    click.echo(f"replayed {report['records']} records for {report['characters']} characters "
+               f"from {report['files']} files")